@@ -10,7 +10,26 @@ from scipy.signal import find_peaks
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import matplotlib.animation as animation
-import colorsys
+from matplotlib.colors import to_rgba
+from note_renderer import NoteRenderer, draw_piano_keyboard
+from note_particles import NoteParticles, KIND_NOTE, KIND_BEAT
+import background_analysis
+from background_analysis import BackgroundAnalysis, STAGE_NAMES
+from analysis_sidecar import AnalysisSidecar
+from event_timeline import EventTimeline
+from render_timeline import RenderTimeline
+
+# 动画帧间隔（毫秒，约 60 FPS）
+FRAME_INTERVAL = 16
+
+# 音符速度按原 33ms 一帧定义，换算到实际帧间隔，保持下落速度不变
+SPEED_SCALE = FRAME_INTERVAL / 33.0
+
+# 每隔多少帧生成一个随机音符（约 0.5 秒）
+NOTE_SPAWN_FRAMES = 30
+
+# 轮询后台分析结果的间隔（毫秒）
+ANALYSIS_POLL_INTERVAL = 100
 
 class AdvancedMusicVisualizer:
     def __init__(self, root):
@@ -27,6 +46,12 @@ class AdvancedMusicVisualizer:
         self.current_position = 0
         self.audio_data = None
         
+        # 后台分析任务
+        self.analysis = None
+        
+        # 分析结果缓存，再次打开同一文件时直接读取
+        self.sidecar = AnalysisSidecar()
+        
         # 可视化参数
         self.visualization_mode = "falling_notes"  # falling_notes, spectrum, waveform
         self.color_scheme = "rainbow"  # rainbow, frequency_based, mood_based
@@ -99,6 +124,21 @@ class AdvancedMusicVisualizer:
         )
         self.stop_btn.pack(side=tk.LEFT, padx=5)
         
+        # 取消分析按钮
+        self.cancel_btn = tk.Button(
+            left_controls,
+            text="取消分析",
+            command=self.cancel_analysis,
+            font=("Arial", 12),
+            bg="#FF9800",
+            fg="white",
+            relief="flat",
+            padx=15,
+            pady=8,
+            state=tk.DISABLED
+        )
+        self.cancel_btn.pack(side=tk.LEFT, padx=5)
+        
         # 右侧设置面板
         right_controls = tk.Frame(control_panel, bg="black")
         right_controls.pack(side=tk.RIGHT)
@@ -153,6 +193,13 @@ class AdvancedMusicVisualizer:
         self.key_label = tk.Label(self.info_frame, text="", fg="white", bg="black")
         self.key_label.pack(side=tk.LEFT, padx=10)
         
+        # 分析进度
+        self.progress_bar = ttk.Progressbar(self.info_frame, length=200, maximum=1.0)
+        self.progress_bar.pack(side=tk.RIGHT, padx=10)
+        
+        self.progress_label = tk.Label(self.info_frame, text="", fg="white", bg="black")
+        self.progress_label.pack(side=tk.RIGHT, padx=10)
+        
         # 可视化画布
         self.canvas_frame = tk.Frame(self.root, bg="black")
         self.canvas_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
@@ -174,9 +221,19 @@ class AdvancedMusicVisualizer:
         self.draw_piano_keyboard()
         
         # 音符和效果列表
-        self.notes = []
+        self.notes = NoteParticles()
         self.effects = []
         
+        # 音符渲染器（键盘保留在背景中，只重绘音符集合）
+        self.note_renderer = NoteRenderer(self.ax)
+        
+        # 频谱、波形等模式的常驻动态图形及其所属模式
+        self.mode_artists = []
+        self.mode_artists_owner = None
+        
+        # 按渲染帧预先烘焙的可视化数据
+        self.render_timeline = None
+        
         # 动画
         self.ani = None
         
@@ -187,24 +244,7 @@ class AdvancedMusicVisualizer:
         
     def draw_piano_keyboard(self):
         """绘制钢琴键盘"""
-        # 白键
-        white_keys = [0, 2, 4, 5, 7, 9, 11, 12, 14, 16, 17, 19, 21, 23, 24, 26, 28, 29, 31, 33, 35, 36, 38, 40, 41, 43, 45, 47, 48, 50, 52, 53, 55, 57, 59, 60, 62, 64, 65, 67, 69, 71, 72, 74, 76, 77, 79, 81, 83, 84, 86, 88]
-        
-        for key in white_keys:
-            if key <= 88:
-                x = key
-                rect = plt.Rectangle((x-0.4, 0), 0.8, 20, facecolor='white', edgecolor='black', linewidth=1)
-                self.ax.add_patch(rect)
-        
-        # 黑键
-        black_keys = [1, 3, 6, 8, 10, 13, 15, 18, 20, 22, 25, 27, 30, 32, 34, 37, 39, 42, 44, 46, 49, 51, 54, 56, 58, 61, 63, 66, 68, 70, 73, 75, 78, 80, 82, 85, 87]
-        
-        for key in black_keys:
-            if key <= 88:
-                x = key
-                rect = plt.Rectangle((x-0.25, 12), 0.5, 8, facecolor='black', edgecolor='white', linewidth=1)
-                self.ax.add_patch(rect)
-        
+        draw_piano_keyboard(self.ax)
         self.canvas.draw()
         
     def upload_music(self):
@@ -222,69 +262,118 @@ class AdvancedMusicVisualizer:
         
         if file_path:
             try:
+                # 换文件时先停止播放和上一次分析
+                if self.is_playing:
+                    self.stop_music()
                 self.audio_file = file_path
                 self.file_label.config(text=f"已选择: {os.path.basename(file_path)}")
                 
-                # 分析音频
+                # 在后台分析音频，解码完成后即可播放
                 self.analyze_audio()
                 
-                # 启用播放按钮
-                self.play_btn.config(state=tk.NORMAL)
-                self.stop_btn.config(state=tk.NORMAL)
-                
             except Exception as e:
                 messagebox.showerror("错误", f"无法加载音频文件: {str(e)}")
                 
     def analyze_audio(self):
-        """分析音频文件"""
-        try:
-            # 显示加载提示
-            self.file_label.config(text="正在分析音频...")
-            self.root.update()
-            
-            # 加载音频
-            self.y, self.sr = librosa.load(self.audio_file, sr=None)
-            
-            # 获取音频长度
-            duration = librosa.get_duration(y=self.y, sr=self.sr)
-            
-            # 提取节拍
-            tempo, beats = librosa.beat.beat_track(y=self.y, sr=self.sr)
+        """在后台线程中分析音频文件"""
+        if self.analysis:
+            self.analysis.cancel()
             
-            # 提取调性
-            key = librosa.feature.key_mode(y=self.y, sr=self.sr)
-            
-            # 提取起始点
-            self.onset_frames = librosa.onset.onset_detect(y=self.y, sr=self.sr)
-            
-            # 提取色度图
-            self.chromagram = librosa.feature.chroma_cqt(y=self.y, sr=self.sr)
-            
-            # 提取MFCC特征
-            self.mfcc = librosa.feature.mfcc(y=self.y, sr=self.sr)
+        # 清空上一个文件的结果
+        self.y = None
+        self.sr = None
+        self.audio_data = {}
+        self.beat_timeline = None
+        self.render_timeline = None
+        self.onset_frames = None
+        self.chromagram = None
+        self.mfcc = None
+        self.duration_label.config(text="")
+        self.tempo_label.config(text="")
+        self.key_label.config(text="")
+        self.play_btn.config(state=tk.DISABLED)
+        self.stop_btn.config(state=tk.DISABLED)
+        self.cancel_btn.config(state=tk.NORMAL)
+        
+        self.file_label.config(text="正在分析音频...")
+        self.analysis = BackgroundAnalysis(self.audio_file, sidecar=self.sidecar).start()
+        self.root.after(ANALYSIS_POLL_INTERVAL, self.poll_analysis, self.analysis)
+        
+    def cancel_analysis(self):
+        """取消后台分析"""
+        if self.analysis:
+            self.analysis.cancel()
+            self.cancel_btn.config(state=tk.DISABLED)
+            self.progress_label.config(text="正在取消...")
             
-            # 存储分析结果
-            self.audio_data = {
-                'duration': duration,
-                'tempo': tempo,
-                'beats': beats,
-                'key': key,
-                'onset_frames': self.onset_frames,
-                'chromagram': self.chromagram,
-                'mfcc': self.mfcc
-            }
+    def poll_analysis(self, analysis):
+        """取出后台分析的进度与阶段结果"""
+        # 已被新的分析任务替换
+        if analysis is not self.analysis:
+            return
             
-            # 更新信息显示
-            self.duration_label.config(text=f"时长: {duration:.2f}秒")
-            self.tempo_label.config(text=f"节拍: {tempo:.1f} BPM")
-            self.key_label.config(text=f"调性: {key}")
+        for event in analysis.poll():
+            kind = event[0]
+            if kind == background_analysis.EVENT_PROGRESS:
+                _, stage, progress = event
+                self.progress_bar['value'] = progress
+                self.progress_label.config(text=f"{STAGE_NAMES.get(stage, stage)}...")
+            elif kind == background_analysis.EVENT_AUDIO:
+                _, self.sr, duration = event
+                self.render_timeline = RenderTimeline(duration, self.sr, FRAME_INTERVAL / 1000.0)
+                # 解码完成（或命中缓存）即可播放，其余特征完成后陆续生效
+                self.play_btn.config(state=tk.NORMAL)
+                self.stop_btn.config(state=tk.NORMAL)
+            elif kind == background_analysis.EVENT_SIGNAL:
+                self.y = event[1]
+            elif kind == background_analysis.EVENT_FEATURES:
+                self.apply_features(event[2])
+            else:
+                self.finish_analysis(event)
+                return
+                
+        self.root.after(ANALYSIS_POLL_INTERVAL, self.poll_analysis, analysis)
+        
+    def apply_features(self, features):
+        """合并一个阶段的分析结果"""
+        self.audio_data.update(features)
+        self.onset_frames = self.audio_data.get('onset_frames')
+        self.chromagram = self.audio_data.get('chromagram')
+        self.mfcc = self.audio_data.get('mfcc')
+        
+        # 色度与 MFCC 到达后烘焙到渲染时间线
+        if 'chromagram' in features:
+            self.render_timeline.set_chromagram(features['chromagram'])
+        if 'mfcc' in features:
+            self.render_timeline.set_mfcc(features['mfcc'])
+        
+        # 节拍时间只换算一次，播放时按游标消费
+        if 'beats' in features:
+            self.beat_timeline = EventTimeline(librosa.frames_to_time(features['beats'], sr=self.sr))
+        
+        # 更新信息显示
+        if 'duration' in features:
+            self.duration_label.config(text=f"时长: {features['duration']:.2f}秒")
+        if 'tempo' in features:
+            self.tempo_label.config(text=f"节拍: {features['tempo']:.1f} BPM")
+        if 'key' in features:
+            self.key_label.config(text=f"调性: {features['key']}")
             
+    def finish_analysis(self, event):
+        """后台分析结束（完成、取消或失败）"""
+        kind = event[0]
+        self.analysis = None
+        self.cancel_btn.config(state=tk.DISABLED)
+        
+        if kind == background_analysis.EVENT_DONE:
+            self.progress_label.config(text="分析完成")
             self.file_label.config(text=f"已选择: {os.path.basename(self.audio_file)}")
-            
-            messagebox.showinfo("成功", f"音频分析完成！\n时长: {duration:.2f}秒\n节拍: {tempo:.1f} BPM")
-            
-        except Exception as e:
-            messagebox.showerror("错误", f"音频分析失败: {str(e)}")
+        elif kind == background_analysis.EVENT_CANCELLED:
+            self.progress_label.config(text="已取消分析")
+            self.file_label.config(text=f"已选择: {os.path.basename(self.audio_file)}（分析未完成）")
+        else:
+            self.progress_label.config(text="")
+            messagebox.showerror("错误", f"音频分析失败: {event[1]}")
             self.file_label.config(text="分析失败")
             
     def change_visualization_mode(self, event=None):
@@ -300,10 +389,33 @@ class AdvancedMusicVisualizer:
         """清除可视化效果"""
         self.notes.clear()
         self.effects.clear()
-        self.ax.clear()
-        self.draw_piano_keyboard()
+        # 只移除动态图形，保留键盘与坐标轴设置
+        self.note_renderer.clear()
+        self.set_mode_artists([])
         self.canvas.draw()
         
+    def set_mode_artists(self, artists, owner=None):
+        """替换当前模式的动态图形"""
+        for artist in self.mode_artists:
+            artist.remove()
+        for artist in artists:
+            artist.set_animated(True)
+        self.mode_artists = artists
+        self.mode_artists_owner = owner
+        
+    def persistent_mode_artists(self, mode, factory):
+        """返回模式的常驻图形，切换到该模式后首次调用时创建"""
+        if self.mode_artists_owner != mode:
+            self.set_mode_artists(factory(), owner=mode)
+        return self.mode_artists
+        
+    def current_tick(self, current_time):
+        """当前时间对应的渲染帧，色度尚未就绪或超出音频长度时返回 None"""
+        if self.render_timeline is None:
+            return None
+        tick = self.render_timeline.tick(current_time)
+        return tick if self.render_timeline.has_chroma(tick) else None
+        
     def toggle_play(self):
         """播放/暂停音乐"""
         if not self.is_playing:
@@ -319,6 +431,10 @@ class AdvancedMusicVisualizer:
             self.is_playing = True
             self.play_btn.config(text="暂停")
             
+            # 从头播放，节拍游标回到起点
+            if self.beat_timeline:
+                self.beat_timeline.seek(0.0)
+            
             # 开始可视化动画
             self.start_visualization()
             
@@ -356,14 +472,15 @@ class AdvancedMusicVisualizer:
         self.ani = animation.FuncAnimation(
             self.fig, 
             self.update_visualization, 
-            interval=33,  # 30 FPS
-            blit=False
+            interval=FRAME_INTERVAL,
+            blit=True,
+            cache_frame_data=False
         )
         
     def update_visualization(self, frame):
         """更新可视化效果"""
         if not self.is_playing:
-            return
+            return []
             
         # 获取当前播放位置
         current_time = pygame.mixer.music.get_pos() / 1000.0
@@ -378,22 +495,18 @@ class AdvancedMusicVisualizer:
         elif self.visualization_mode == "piano_roll":
             self.update_piano_roll_visualization(current_time, frame)
             
-        # 重绘画布
-        self.canvas.draw()
+        # 只返回动态图形，由动画在缓存的背景上重绘
+        return self.note_renderer.artists() + self.mode_artists
         
     def update_falling_notes(self, current_time, frame):
         """更新落下的音符效果"""
-        # 根据节拍生成音符
-        if self.audio_data and 'beats' in self.audio_data:
-            beat_times = librosa.frames_to_time(self.audio_data['beats'], sr=self.sr)
-            if len(beat_times) > 0:
-                # 找到最近的节拍
-                beat_idx = np.argmin(np.abs(beat_times - current_time))
-                if abs(beat_times[beat_idx] - current_time) < 0.1:  # 在节拍附近
-                    self.generate_beat_note(current_time)
+        # 每个到期的节拍生成一个音符
+        if self.beat_timeline:
+            for beat_time in self.beat_timeline.due(current_time):
+                self.generate_beat_note(beat_time)
         
         # 随机生成音符
-        if frame % 15 == 0:
+        if frame % NOTE_SPAWN_FRAMES == 0:
             self.generate_random_note(current_time)
             
         # 更新音符位置
@@ -402,129 +515,64 @@ class AdvancedMusicVisualizer:
     def generate_beat_note(self, current_time):
         """根据节拍生成音符"""
         # 使用色度图信息生成音符
-        if self.chromagram is not None:
-            current_frame = int(current_time * self.sr / 512)  # 假设hop_length=512
-            if current_frame < self.chromagram.shape[1]:
-                chroma = self.chromagram[:, current_frame]
-                # 找到最强的音符
-                note_idx = np.argmax(chroma)
-                key_position = note_idx * 7  # 映射到钢琴键
-                
-                note = {
-                    'x': key_position,
-                    'y': 100,
-                    'color': self.get_note_color(note_idx, current_time),
-                    'size': 1.0,
-                    'speed': 2.5,
-                    'type': 'beat'
-                }
-                self.notes.append(note)
+        tick = self.current_tick(current_time)
+        if tick is not None:
+            chroma = self.render_timeline.chroma[tick]
+            # 找到最强的音符
+            note_idx = np.argmax(chroma)
+            key_position = note_idx * 7  # 映射到钢琴键
+            
+            self.notes.spawn(
+                x=key_position,
+                y=100,
+                speed=2.5,
+                size=1.0,
+                rgba=to_rgba(self.get_note_color(note_idx, current_time)),
+                kind=KIND_BEAT
+            )
                 
     def generate_random_note(self, current_time):
         """生成随机音符"""
         key_position = np.random.randint(0, 88)
         
-        note = {
-            'x': key_position,
-            'y': 100,
-            'color': self.get_note_color(key_position, current_time),
-            'size': np.random.uniform(0.3, 0.8),
-            'speed': np.random.uniform(1, 3),
-            'type': 'random'
-        }
-        
-        self.notes.append(note)
+        self.notes.spawn(
+            x=key_position,
+            y=100,
+            speed=np.random.uniform(1, 3),
+            size=np.random.uniform(0.3, 0.8),
+            rgba=to_rgba(self.get_note_color(key_position, current_time)),
+            kind=KIND_NOTE
+        )
         
     def get_note_color(self, note_idx, current_time):
         """根据音符和时间获取颜色"""
-        if self.color_scheme == "rainbow":
-            hue = (note_idx / 88.0 + current_time * 0.1) % 1.0
-            return colorsys.hsv_to_rgb(hue, 0.8, 0.9)
-        elif self.color_scheme == "frequency_based":
-            # 根据频率映射颜色
-            freq = librosa.midi_to_freq(note_idx + 21)  # 21是A0的MIDI音高
-            hue = (np.log10(freq) - np.log10(27.5)) / (np.log10(4186) - np.log10(27.5))
-            hue = np.clip(hue, 0, 1)
-            return colorsys.hsv_to_rgb(hue, 0.8, 0.9)
-        else:  # mood_based
-            # 根据MFCC特征映射颜色
-            if self.mfcc is not None:
-                current_frame = int(current_time * self.sr / 512)
-                if current_frame < self.mfcc.shape[1]:
-                    mfcc_val = self.mfcc[0, current_frame]  # 使用第一个MFCC系数
-                    hue = (mfcc_val + 20) / 40  # 归一化到0-1
-                    hue = np.clip(hue, 0, 1)
-                    return colorsys.hsv_to_rgb(hue, 0.8, 0.9)
-            
-            return colorsys.hsv_to_rgb(0.5, 0.8, 0.9)  # 默认蓝色
+        return self.render_timeline.note_color(self.color_scheme, note_idx, current_time)
             
     def update_notes(self):
         """更新音符位置"""
-        # 清除之前的音符
-        for artist in self.ax.texts + self.ax.patches:
-            if hasattr(artist, '_note'):
-                artist.remove()
-                
-        # 更新音符位置
-        notes_to_remove = []
-        for note in self.notes:
-            note['y'] -= note['speed']
-            
-            # 绘制音符
-            if note['type'] == 'beat':
-                # 节拍音符使用星形
-                star = self.draw_star(note['x'], note['y'], note['size'], note['color'])
-                star._note = True
-                self.ax.add_patch(star)
-            else:
-                # 普通音符使用圆形
-                circle = plt.Circle((note['x'], note['y']), note['size'], 
-                                  color=note['color'], alpha=0.8)
-                circle._note = True
-                self.ax.add_patch(circle)
+        # 整体下落并释放到达键盘的音符
+        visible = self.notes.step(SPEED_SCALE)
             
-            # 如果音符到达键盘，标记为删除
-            if note['y'] <= 20:
-                notes_to_remove.append(note)
-                
-        # 删除到达键盘的音符
-        for note in notes_to_remove:
-            self.notes.remove(note)
-            
-        # 限制音符数量
-        if len(self.notes) > 100:
-            self.notes = self.notes[-100:]
-            
-    def draw_star(self, x, y, size, color):
-        """绘制星形"""
-        angles = np.linspace(0, 2*np.pi, 10, endpoint=False)
-        star_x = x + size * np.cos(angles[::2])
-        star_y = y + size * np.sin(angles[::2])
-        
-        star = plt.Polygon(list(zip(star_x, star_y)), color=color, alpha=0.9)
-        return star
+        # 节拍音符为星形、普通音符为圆形，统一由渲染器的集合绘制
+        self.note_renderer.update_particles(self.notes, visible)
         
     def update_spectrum_visualization(self, current_time, frame):
         """更新频谱可视化"""
-        if self.audio_data and 'chromagram' in self.audio_data:
-            current_frame = int(current_time * self.sr / 512)
-            if current_frame < self.chromagram.shape[1]:
-                chroma = self.chromagram[:, current_frame]
+        tick = self.current_tick(current_time)
+        if tick is not None:
+            bars = self.persistent_mode_artists("spectrum", self.create_spectrum_bars)
+            heights = self.render_timeline.bar_heights[tick]
+            colors = self.render_timeline.chroma_colors(self.color_scheme)[tick]
+            for bar, height, color in zip(bars, heights, colors):
+                bar.set_height(height)
+                bar.set_color(color)
                 
-                # 清除之前的频谱条
-                for artist in self.ax.patches:
-                    if hasattr(artist, '_spectrum'):
-                        artist.remove()
-                        
-                # 绘制频谱条
-                for i, intensity in enumerate(chroma):
-                    x = i * 7
-                    height = intensity * 80
-                    bar = plt.Rectangle((x-0.3, 20), 0.6, height, 
-                                      color=self.get_note_color(i, current_time),
-                                      alpha=0.8)
-                    bar._spectrum = True
-                    self.ax.add_patch(bar)
+    def create_spectrum_bars(self):
+        """创建 12 个常驻的频谱条"""
+        return [
+            self.ax.add_patch(plt.Rectangle((i * 7 - 0.3, 20), 0.6, 0, alpha=0.8))
+            for i in range(12)
+        ]
                     
     def update_waveform_visualization(self, current_time, frame):
         """更新波形可视化"""
@@ -536,38 +584,41 @@ class AdvancedMusicVisualizer:
             
             if start_sample < len(self.y):
                 waveform = self.y[start_sample:end_sample]
-                
-                # 清除之前的波形
-                for artist in self.ax.lines:
-                    artist.remove()
                     
-                # 绘制波形
+                # 更新常驻的波形线
+                line, = self.persistent_mode_artists("waveform", self.create_waveform_line)
                 x = np.linspace(0, 88, len(waveform))
                 y = 60 + waveform * 20  # 缩放并居中
-                line, = self.ax.plot(x, y, color='cyan', linewidth=2, alpha=0.8)
+                line.set_data(x, y)
+                
+    def create_waveform_line(self):
+        """创建常驻的波形线"""
+        line, = self.ax.plot([], [], color='cyan', linewidth=2, alpha=0.8)
+        return [line]
                 
     def update_piano_roll_visualization(self, current_time, frame):
         """更新钢琴卷可视化"""
-        if self.audio_data and 'chromagram' in self.audio_data:
-            current_frame = int(current_time * self.sr / 512)
-            if current_frame < self.chromagram.shape[1]:
-                chroma = self.chromagram[:, current_frame]
-                
-                # 清除之前的钢琴卷
-                for artist in self.ax.patches:
-                    if hasattr(artist, '_piano_roll'):
-                        artist.remove()
-                        
-                # 绘制钢琴卷
-                for i, intensity in enumerate(chroma):
-                    if intensity > 0.1:  # 只显示强度较高的音符
-                        x = i * 7
-                        y = 25 + intensity * 70
-                        note = plt.Rectangle((x-0.3, y), 0.6, 2, 
-                                           color=self.get_note_color(i, current_time),
-                                           alpha=intensity)
-                        note._piano_roll = True
-                        self.ax.add_patch(note)
+        tick = self.current_tick(current_time)
+        if tick is not None:
+            rolls = self.persistent_mode_artists("piano_roll", self.create_piano_roll)
+            timeline = self.render_timeline
+            colors = timeline.chroma_colors(self.color_scheme)[tick]
+            # 只显示强度较高的音符
+            for note, y, alpha, active, color in zip(
+                rolls, timeline.roll_y[tick], timeline.roll_alpha[tick], timeline.roll_active[tick], colors
+            ):
+                note.set_visible(active)
+                if active:
+                    note.set_y(y)
+                    note.set_color(color)
+                    note.set_alpha(alpha)
+                    
+    def create_piano_roll(self):
+        """创建 12 个常驻的钢琴卷音符"""
+        return [
+            self.ax.add_patch(plt.Rectangle((i * 7 - 0.3, 0), 0.6, 2, visible=False))
+            for i in range(12)
+        ]
 
 def main():
     root = tk.Tk()
@@ -0,0 +1,138 @@
+"""
+音頻分析結果緩存
+以上傳文件內容的哈希值加上分析參數作為鍵，
+分為進程內 LRU 緩存與磁盤緩存兩層，磁盤層按總大小淘汰最久未使用的條目
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import fast_json
+
+
+def make_cache_key(content_hash, params):
+    """根據內容哈希與分析參數生成緩存鍵"""
+    params_blob = json.dumps(params, sort_keys=True, separators=(',', ':'))
+    digest = hashlib.sha256()
+    digest.update(content_hash.encode('ascii'))
+    digest.update(b'\0')
+    digest.update(params_blob.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def hash_bytes(data):
+    """計算文件內容的 SHA-256"""
+    return hashlib.sha256(data).hexdigest()
+
+
+class AnalysisCache:
+    """兩層分析結果緩存（內存 LRU + 磁盤）"""
+
+    def __init__(self, cache_dir, max_memory_items=32, max_disk_bytes=512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_memory_items = max_memory_items
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+        if self.cache_dir and not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.json')
+
+    def get(self, key):
+        """讀取緩存，未命中返回 None"""
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                return value
+
+        if not self.cache_dir:
+            return None
+
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = fast_json.loads(f.read())
+        except (OSError, ValueError):
+            return None
+
+        # 更新訪問時間，供淘汰時判斷最近使用
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+        self.remember(key, value)
+        return value
+
+    def put(self, key, value, memory=True):
+        """
+        寫入兩層緩存；在分析工作進程中寫入時傳 memory=False 只寫磁盤，
+        工作進程的內存層不會被 Web 進程讀到，只會白白佔用內存
+        """
+        if memory:
+            self.remember(key, value)
+
+        if not self.cache_dir:
+            return
+
+        # 先寫臨時文件再原子替換，避免並發讀到半個文件
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(fast_json.dumps(value))
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+
+        self._evict_disk()
+
+    def remember(self, key, value):
+        """只寫入內存層（結果已在磁盤上時使用）"""
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_items:
+                self._memory.popitem(last=False)
+
+    def _evict_disk(self):
+        """磁盤緩存超過上限時，按最近訪問時間淘汰"""
+        entries = []
+        total = 0
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return
+
+        for name in names:
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        if total <= self.max_disk_bytes:
+            return
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                continue
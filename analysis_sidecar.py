@@ -0,0 +1,142 @@
+"""
+桌面可视化器的分析结果缓存
+每个音频文件的分析结果保存在用户缓存目录下的一组 .npy 文件中，读取时使用内存映射，
+再次打开同一文件几乎不需要计算。缓存键由文件路径、修改时间、大小和分析参数组成，
+文件被修改后自动失效，旧的结果在保存新结果时删除
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+
+from feature_engine import N_FFT, HOP_LENGTH
+
+# 分析参数变化时修改版本号，旧缓存自动失效
+SIDECAR_PARAMS = {'version': 1, 'sr': None, 'n_fft': N_FFT, 'hop_length': HOP_LENGTH}
+
+# 以数组形式保存的特征，其余特征（时长、速度、调性）保存在 meta.json 中
+ARRAY_FIELDS = ('beats', 'onset_frames', 'chromagram', 'mfcc')
+
+
+def default_cache_dir():
+    """用户缓存目录，可用 SEE_MUSIC_CACHE_DIR 覆盖"""
+    if os.environ.get('SEE_MUSIC_CACHE_DIR'):
+        return os.environ['SEE_MUSIC_CACHE_DIR']
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA', os.path.expanduser('~'))
+    elif sys.platform == 'darwin':
+        base = os.path.expanduser('~/Library/Caches')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache'))
+    return os.path.join(base, 'see_music', 'analysis')
+
+
+def _digest(value):
+    return hashlib.sha256(value.encode('utf-8')).hexdigest()[:32]
+
+
+class AnalysisSidecar:
+    """按文件路径与文件状态缓存分析结果"""
+
+    def __init__(self, root=None, params=SIDECAR_PARAMS, max_bytes=1024 * 1024 * 1024):
+        self.root = root or default_cache_dir()
+        self.params = params
+        self.max_bytes = max_bytes
+
+    def _key(self, path):
+        """返回 (路径前缀, 完整键)；同一路径的不同版本共享前缀"""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        prefix = _digest(path)
+        state = json.dumps([stat.st_mtime_ns, stat.st_size, self.params], sort_keys=True)
+        return prefix, f'{prefix}-{_digest(state)}'
+
+    def load(self, path, fields):
+        """
+        读取缓存的分析结果，缺少任一请求的特征或文件已修改时返回 None
+        数组以内存映射方式打开，只有实际访问的部分才会读入内存
+        """
+        try:
+            _, key = self._key(path)
+            entry = os.path.join(self.root, key)
+            with open(os.path.join(entry, 'meta.json'), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        features = {name: meta['features'][name] for name in fields if name in meta['features']}
+        for name in fields:
+            if name in ARRAY_FIELDS and name in meta['arrays']:
+                try:
+                    features[name] = np.load(os.path.join(entry, f'{name}.npy'), mmap_mode='r')
+                except OSError:
+                    return None
+        if set(fields) - set(features):
+            return None
+
+        try:
+            os.utime(entry, None)
+        except OSError:
+            pass
+        return meta['sr'], features
+
+    def save(self, path, sr, features):
+        """保存分析结果，并删除同一文件的旧结果"""
+        try:
+            prefix, key = self._key(path)
+            os.makedirs(self.root, exist_ok=True)
+            tmp_path = tempfile.mkdtemp(dir=self.root, prefix='.tmp-')
+        except OSError:
+            return
+
+        meta = {'path': os.path.abspath(path), 'sr': sr, 'features': {}, 'arrays': []}
+        try:
+            for name, value in features.items():
+                if name in ARRAY_FIELDS:
+                    np.save(os.path.join(tmp_path, f'{name}.npy'), np.asarray(value))
+                    meta['arrays'].append(name)
+                else:
+                    meta['features'][name] = value.item() if isinstance(value, np.generic) else value
+            with open(os.path.join(tmp_path, 'meta.json'), 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False)
+
+            entry = os.path.join(self.root, key)
+            shutil.rmtree(entry, ignore_errors=True)
+            os.rename(tmp_path, entry)
+        except OSError:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            return
+
+        # 文件修改前的结果已经不可能再命中
+        for name in os.listdir(self.root):
+            if name.startswith(prefix + '-') and name != key:
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        total = 0
+        for name in os.listdir(self.root):
+            if name.startswith('.tmp-'):
+                continue
+            entry = os.path.join(self.root, name)
+            try:
+                size = sum(item.stat().st_size for item in os.scandir(entry))
+                mtime = os.stat(entry).st_mtime
+            except OSError:
+                continue
+            entries.append((mtime, size, entry))
+            total += size
+
+        entries.sort()
+        for _, size, entry in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
@@ -0,0 +1,131 @@
+"""
+服務端分析結果存儲
+每個分析結果以 ID 保存為一組 .npy 文件，讀取時使用內存映射，
+按時間窗口查詢只需讀取對應的幀範圍；目錄總大小超過上限時淘汰最久未訪問的結果
+"""
+
+import json
+import os
+import re
+import shutil
+import tempfile
+
+import numpy as np
+
+# 按幀存儲的矩陣特徵（行 × 幀）
+MATRIX_FIELDS = ('chromagram', 'mfcc')
+
+# 以幀號列表存儲的事件特徵
+EVENT_FIELDS = ('beats', 'onset_frames')
+
+WINDOW_FIELDS = MATRIX_FIELDS + EVENT_FIELDS
+
+_ID_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+
+def valid_analysis_id(analysis_id):
+    return bool(_ID_PATTERN.match(analysis_id or ''))
+
+
+class AnalysisStore:
+    """以分析 ID 為鍵的特徵存儲"""
+
+    def __init__(self, root, max_bytes=1024 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        if not os.path.exists(self.root):
+            os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, analysis_id):
+        if not valid_analysis_id(analysis_id):
+            raise ValueError(f'無效的分析 ID: {analysis_id}')
+        return os.path.join(self.root, analysis_id)
+
+    def exists(self, analysis_id):
+        return valid_analysis_id(analysis_id) and os.path.exists(
+            os.path.join(self._path(analysis_id), 'meta.json')
+        )
+
+    def save(self, analysis_id, meta, arrays):
+        """保存元數據與特徵數組（先寫臨時目錄再整體改名）"""
+        path = self._path(analysis_id)
+        if os.path.exists(path):
+            return
+
+        tmp_path = tempfile.mkdtemp(dir=self.root, prefix='.tmp-')
+        try:
+            for name, values in arrays.items():
+                if values is None:
+                    continue
+                np.save(os.path.join(tmp_path, f'{name}.npy'), np.asarray(values))
+            with open(os.path.join(tmp_path, 'meta.json'), 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False)
+            os.rename(tmp_path, path)
+        except OSError:
+            # 並發寫入同一 ID 時另一方已完成
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            return
+
+        self._evict()
+
+    def load_meta(self, analysis_id):
+        """讀取元數據，不存在時返回 None"""
+        path = self._path(analysis_id)
+        try:
+            with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return meta
+
+    def load_array(self, analysis_id, name):
+        """以內存映射方式讀取特徵數組，不存在時返回 None"""
+        try:
+            return np.load(os.path.join(self._path(analysis_id), f'{name}.npy'), mmap_mode='r')
+        except OSError:
+            return None
+
+    def window(self, analysis_id, start_frame, end_frame, fields):
+        """返回 [start_frame, end_frame) 範圍內的特徵"""
+        result = {}
+        for name in fields:
+            values = self.load_array(analysis_id, name)
+            if values is None:
+                continue
+            if name in MATRIX_FIELDS:
+                result[name] = np.array(values[:, start_frame:end_frame])
+            else:
+                # 事件特徵按幀號排序，二分查找窗口邊界
+                lo, hi = np.searchsorted(values, [start_frame, end_frame])
+                result[name] = np.array(values[lo:hi])
+        return result
+
+    def _evict(self):
+        entries = []
+        total = 0
+        for name in os.listdir(self.root):
+            if not valid_analysis_id(name):
+                continue
+            path = os.path.join(self.root, name)
+            try:
+                size = sum(entry.stat().st_size for entry in os.scandir(path))
+                mtime = os.stat(path).st_mtime
+            except OSError:
+                continue
+            entries.append((mtime, size, path))
+            total += size
+
+        if total <= self.max_bytes:
+            return
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
@@ -1,31 +1,242 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, Response, g, render_template, request, jsonify, send_file
 import os
+import hmac
 import tempfile
 import librosa
 import numpy as np
 import json
-from werkzeug.utils import secure_filename
 import io
 import base64
-import matplotlib
-matplotlib.use('Agg')  # 使用非交互式後端
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
-import matplotlib.animation as animation
+from analysis_cache import AnalysisCache, make_cache_key
+from analysis_store import AnalysisStore, MATRIX_FIELDS, WINDOW_FIELDS, valid_analysis_id
+from feature_engine import FeatureEngine, ANALYSIS_FEATURES, select_features
+from streaming_analysis import stream_features
+import soundfile as sf
+from job_queue import JobQueue, STATUS_DONE, STATUS_FAILED
+from profiling import profile_call, load_summary
+from metrics import Registry, BYTES_BUCKETS, DURATION_BUCKETS, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from payload_codec import COMPACT_MIMETYPE, compact_payload, encode_matrix, round_payload, wants_compact
+from compression import compress_response
+import fast_json
+from upload_stream import HashingRequest, upload_bytes, upload_digest
+from chunked_upload import UploadSessions
+import threading
+import time
 
 app = Flask(__name__)
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max file size
 
-# 配置上傳文件夾
-UPLOAD_FOLDER = 'uploads'
-if not os.path.exists(UPLOAD_FOLDER):
-    os.makedirs(UPLOAD_FOLDER)
-
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+# 上傳文件在解析時直接寫入內存緩衝區並同步計算哈希，不落盤
+app.request_class = HashingRequest
 
 # 允許的文件類型
 ALLOWED_EXTENSIONS = {'mp3', 'wav', 'flac', 'm4a', 'ogg'}
 
+# 超過該時長（秒）的音頻使用分塊流式分析，峰值內存不隨時長增長
+STREAMING_MIN_DURATION = float(os.environ.get('STREAMING_MIN_DURATION', 600))
+
+# 分析參數（參與緩存鍵計算，修改分析流程時請同步提升版本號）
+ANALYSIS_PARAMS = {
+    'version': 3,
+    'sr': None,
+    'hop_length': 512,
+    'streaming_min_duration': STREAMING_MIN_DURATION
+}
+
+# 上傳未指定 ?fields= 或 ?analysis_profile= 時計算的特徵，默認為全部特徵（research 檔位）
+ANALYSIS_PROFILE = os.environ.get('ANALYSIS_PROFILE', 'research')
+DEFAULT_FEATURES = select_features(profile=ANALYSIS_PROFILE)
+
+# 各特徵對應的進度階段
+ANALYSIS_STAGES = {
+    'duration': ('load', 0.1),
+    'tempo': ('beats', 0.2),
+    'beats': ('beats', 0.4),
+    'onset_frames': ('onsets', 0.5),
+    'chromagram': ('chroma', 0.6),
+    'key': ('key', 0.75),
+    'mfcc': ('mfcc', 0.8)
+}
+
+# 漸進結果中每個色度窗口包含的幀數（約 12 秒 @ 22.05kHz）
+CHROMA_WINDOW_FRAMES = 512
+
+# JSON 響應中大矩陣保留的小數位數（空為不取整），客戶端可用 ?precision=N 指定；
+# 響應按 Accept-Encoding 壓縮，由反向代理壓縮時可設 RESPONSE_COMPRESSION=0 關閉
+RESPONSE_DECIMALS = int(os.environ['RESPONSE_DECIMALS']) if os.environ.get('RESPONSE_DECIMALS') else None
+RESPONSE_COMPRESSION = os.environ.get('RESPONSE_COMPRESSION', '1') == '1'
+MAX_RESPONSE_DECIMALS = 10
+
+# SSE 輪詢任務存儲的間隔與保活注釋的間隔（秒）
+SSE_POLL_INTERVAL = 0.25
+SSE_KEEPALIVE_INTERVAL = 15
+
+# 分析結果緩存
+analysis_cache = AnalysisCache(
+    os.environ.get('ANALYSIS_CACHE_DIR', 'cache'),
+    max_memory_items=int(os.environ.get('ANALYSIS_CACHE_MEMORY_ITEMS', 32)),
+    max_disk_bytes=int(os.environ.get('ANALYSIS_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+)
+
+# 按時間窗口查詢的特徵存儲，分析 ID 即緩存鍵
+analysis_store = AnalysisStore(
+    os.environ.get('ANALYSIS_STORE_DIR', 'analysis'),
+    max_bytes=int(os.environ.get('ANALYSIS_STORE_MAX_BYTES', 1024 * 1024 * 1024))
+)
+
+# 啟動時在短合成信號上預先運行一次分析流程，避免首個上傳承擔 numba 編譯與模塊導入的耗時
+ANALYSIS_WARMUP = os.environ.get('ANALYSIS_WARMUP', '0') == '1'
+
+# 性能剖析：設置 PROFILE_TOKEN 後，帶 X-Profile-Token 頭或 ?profile=<token> 的上傳會跳過緩存，
+# 在 cProfile 與 tracemalloc 下完成分析，結果寫入 PROFILE_DIR；未設置時不可用
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN', '')
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+
+# 分析任務隊列（首次使用時創建，避免在 gunicorn 預加載階段 fork 出進程池）
+JOB_DIR = os.environ.get('JOB_DIR', 'jobs')
+ANALYSIS_WORKERS = int(os.environ.get('ANALYSIS_WORKERS', 2))
+ANALYSIS_MAX_PENDING = int(os.environ.get('ANALYSIS_MAX_PENDING', 64))
+JOB_TTL = int(os.environ.get('JOB_TTL', 24 * 3600))
+
+# 分塊上傳：超過 MAX_CONTENT_LENGTH 或網絡不穩定時使用，會話放在任務目錄下以便提交時直接改名移交
+upload_sessions = UploadSessions(
+    os.path.join(JOB_DIR, 'uploads'),
+    max_bytes=int(os.environ.get('CHUNKED_UPLOAD_MAX_BYTES', 2 * 1024 ** 3)),
+    chunk_bytes=int(os.environ.get('CHUNKED_UPLOAD_CHUNK_BYTES', 8 * 1024 ** 2)),
+    ttl=int(os.environ.get('CHUNKED_UPLOAD_TTL', 24 * 3600))
+)
+
+# 運行指標，由 /metrics 以 Prometheus 文本格式輸出
+metrics = Registry()
+metric_requests = metrics.counter('seemusic_http_requests_total', '處理的 HTTP 請求數', ('endpoint', 'status'))
+metric_request_seconds = metrics.histogram('seemusic_http_request_duration_seconds',
+                                           '請求處理耗時（流式響應只計到返回響應頭）', ('endpoint',))
+metric_in_flight = metrics.gauge('seemusic_http_requests_in_flight', '正在處理的請求數')
+metric_response_bytes = metrics.histogram('seemusic_http_response_bytes', '響應體大小（字節，不含流式響應）',
+                                          ('endpoint',), buckets=BYTES_BUCKETS)
+metric_errors = metrics.counter('seemusic_errors_total', '按來源與類型統計的錯誤數', ('source', 'type'))
+metric_upload_bytes = metrics.histogram('seemusic_upload_bytes', '上傳文件大小（字節）', buckets=BYTES_BUCKETS)
+metric_cache = metrics.counter('seemusic_analysis_cache_total', '上傳時分析結果緩存的命中情況', ('result',))
+metric_jobs = metrics.counter('seemusic_analysis_jobs_total', '結束的分析任務數', ('status',))
+metric_audio_duration = metrics.histogram('seemusic_audio_duration_seconds', '解碼後的音頻時長（秒）',
+                                          buckets=DURATION_BUCKETS)
+metric_stage_seconds = metrics.histogram('seemusic_analysis_stage_seconds', '分析任務各階段耗時', ('stage',))
+metric_result_bytes = metrics.histogram('seemusic_analysis_result_bytes', '分析結果 JSON 大小（字節）',
+                                        buckets=BYTES_BUCKETS)
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+def get_job_queue():
+    """獲取任務隊列，首次創建時恢復上次未完成的任務"""
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            if not os.path.exists(JOB_DIR):
+                os.makedirs(JOB_DIR)
+            _job_queue = JobQueue(
+                os.path.join(JOB_DIR, 'jobs.db'),
+                os.path.join(JOB_DIR, 'spool'),
+                run_analysis_job,
+                max_workers=ANALYSIS_WORKERS,
+                max_pending=ANALYSIS_MAX_PENDING,
+                initializer=warm_up if ANALYSIS_WARMUP else None,
+                summarize=summarize_result,
+                on_finished=observe_job,
+                job_ttl=JOB_TTL
+            )
+            _job_queue.recover()
+        return _job_queue
+
+def summarize_result(result):
+    """在工作進程中提取需要回傳給主進程記錄的結果概要"""
+    return {'duration': result['audio_data']['duration']}
+
+def observe_job(job_id, params, outcome):
+    """任務結束後在提交任務的進程中記錄指標（工作進程中的計數不會出現在 /metrics）"""
+    metric_jobs.inc(status=outcome['status'])
+    for stage, seconds in outcome['stages'].items():
+        metric_stage_seconds.observe(seconds, stage=stage)
+    if outcome['error']:
+        metric_errors.inc(source='analysis', type=outcome['error'])
+    if outcome['summary']:
+        metric_audio_duration.observe(outcome['summary']['duration'])
+        metric_result_bytes.observe(outcome['result_bytes'])
+
+def metric_endpoint():
+    """以路由規則作為標籤，避免任務 ID 等路徑參數產生大量時間序列"""
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+@app.before_request
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    metric_in_flight.inc()
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = metric_endpoint()
+    metric_requests.inc(endpoint=endpoint, status=response.status_code)
+    metric_request_seconds.observe(time.perf_counter() - g.request_started, endpoint=endpoint)
+    if not response.is_streamed and response.content_length is not None:
+        metric_response_bytes.observe(response.content_length, endpoint=endpoint)
+    return response
+
+@app.after_request
+def compress(response):
+    # 在記錄指標的鉤子之後註冊，Flask 逆序執行 after_request，指標記錄的是壓縮後的大小
+    if RESPONSE_COMPRESSION:
+        compress_response(response, request.accept_encodings)
+    return response
+
+@app.teardown_request
+def finish_request_metrics(error=None):
+    if 'request_started' in g:
+        metric_in_flight.dec()
+    if error is not None:
+        metric_errors.inc(source='request', type=type(error).__name__)
+
+def profiling_requested():
+    """請求是否帶有正確的剖析令牌"""
+    if not PROFILE_TOKEN:
+        return False
+    token = request.headers.get('X-Profile-Token') or request.args.get('profile', '')
+    return hmac.compare_digest(token.encode('utf-8'), PROFILE_TOKEN.encode('utf-8'))
+
+def json_response(payload, status=200, mimetype='application/json'):
+    """用支持 NumPy 的編碼器序列化響應，數組無需先轉換為列表"""
+    return Response(fast_json.dumps(payload), status=status, mimetype=mimetype)
+
+def response_decimals():
+    """本次響應中大矩陣保留的小數位數，None 表示不取整"""
+    try:
+        decimals = int(request.args['precision'])
+    except (KeyError, ValueError):
+        return RESPONSE_DECIMALS
+    return min(max(decimals, 0), MAX_RESPONSE_DECIMALS)
+
+def requested_features():
+    """
+    本次上傳要計算的特徵：?fields=tempo,beats 或 ?analysis_profile=notes-only（也可放在表單中）；
+    ?profile= 是剖析令牌，不能用於選擇檔位
+    """
+    fields = [field.strip() for field in request.values.get('fields', '').split(',') if field.strip()]
+    profile = request.values.get('analysis_profile')
+    if not fields and not profile:
+        return DEFAULT_FEATURES
+    return select_features(fields, profile)
+
+def analysis_params(features):
+    """參與緩存鍵計算的參數；計算全部特徵時不加 features，與此前的緩存鍵保持一致"""
+    if tuple(features) == ANALYSIS_FEATURES:
+        return ANALYSIS_PARAMS
+    return {**ANALYSIS_PARAMS, 'features': list(features)}
+
+def select_result(result, features):
+    """從包含更多特徵的結果中選出指定特徵，可視化數據按選出的特徵重新生成"""
+    audio_data = {key: value for key, value in result['audio_data'].items()
+                  if key not in ANALYSIS_FEATURES or key in features}
+    return {'audio_data': audio_data, 'visualization': generate_visualization(audio_data)}
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
@@ -36,91 +247,578 @@ def index():
 @app.route('/upload', methods=['POST'])
 def upload_file():
     if 'file' not in request.files:
+        metric_errors.inc(source='upload', type='missing_file')
         return jsonify({'error': '沒有文件'}), 400
     
     file = request.files['file']
     if file.filename == '':
+        metric_errors.inc(source='upload', type='missing_file')
         return jsonify({'error': '沒有選擇文件'}), 400
     
     if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
-        
-        try:
-            # 分析音頻
-            audio_data = analyze_audio(filepath)
-            
-            # 生成可視化
-            visualization_data = generate_visualization(audio_data)
-            
-            # 清理臨時文件
-            os.remove(filepath)
+        size, content_hash = upload_digest(file)
+        # 文件內容直接交給工作進程在內存中解碼
+        return start_analysis(size, content_hash, file.filename, lambda job_id: upload_bytes(file))
+    
+    metric_errors.inc(source='upload', type='unsupported_type')
+    return jsonify({'error': '不支持的文件類型'}), 400
+
+def start_analysis(size, content_hash, filename, take_source, release_source=None):
+    """
+    相同內容與參數的文件直接返回緩存結果（並調用 release_source 釋放輸入），跳過解碼；
+    否則以 take_source(job_id) 取得任務輸入（文件內容或路徑）提交分析，立即返回任務 ID
+    """
+    try:
+        features = requested_features()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    metric_upload_bytes.observe(size)
+    cache_key = make_cache_key(content_hash, analysis_params(features))
+    profile = profiling_requested()
+    if not profile:
+        cached, analysis_id = analysis_cache.get(cache_key), cache_key
+        if cached is None and features != ANALYSIS_FEATURES:
+            # 已有全部特徵的結果時直接從中選取
+            analysis_id = make_cache_key(content_hash, ANALYSIS_PARAMS)
+            cached = analysis_cache.get(analysis_id)
+            if cached is not None:
+                cached = select_result(cached, features)
+        metric_cache.inc(result='miss' if cached is None else 'hit')
+        if cached is not None:
+            if release_source is not None:
+                release_source()
+            return analysis_response(cached, cached=True, analysis_id=analysis_id)
+    
+    job_queue = get_job_queue()
+    if job_queue.is_full():
+        metric_errors.inc(source='upload', type='queue_full')
+        return jsonify({'error': '分析隊列已滿，請稍後再試'}), 503
+    
+    job_id = job_queue.new_job_id()
+    params = {
+        'cache_key': cache_key,
+        'filename': filename,
+        'extension': filename.rsplit('.', 1)[1].lower(),
+        'size': size,
+        'features': list(features)
+    }
+    if profile:
+        params['profile_id'] = job_id
+    job_queue.submit(job_id, take_source(job_id), params)
+    
+    response = {
+        'success': True,
+        'job_id': job_id,
+        'status': 'queued',
+        'status_url': f'/api/jobs/{job_id}',
+        'result_url': f'/api/jobs/{job_id}/result'
+    }
+    if profile:
+        response['profile_url'] = f'/api/jobs/{job_id}/profile'
+    return jsonify(response), 202
+
+@app.route('/api/uploads', methods=['POST'])
+def create_upload():
+    """創建分塊上傳會話：{"filename": ..., "size": 字節數, "sha256": 可選的整文件哈希}"""
+    body = request.get_json(silent=True) or {}
+    filename = body.get('filename', '')
+    if not allowed_file(filename):
+        metric_errors.inc(source='upload', type='unsupported_type')
+        return jsonify({'error': '不支持的文件類型'}), 400
+    
+    try:
+        session = upload_sessions.create(filename, body.get('size'), body.get('sha256'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(upload_sessions.describe(session)), 201
+
+@app.route('/api/uploads/<upload_id>', methods=['GET'])
+def upload_status(upload_id):
+    """查詢已收到的範圍，斷線後從 next_offset（或任一缺失範圍）繼續上傳"""
+    session = upload_sessions.get(upload_id)
+    if session is None:
+        return jsonify({'error': '上傳不存在或已過期'}), 404
+    return jsonify(upload_sessions.describe(session))
+
+@app.route('/api/uploads/<upload_id>', methods=['PUT'])
+def upload_chunk(upload_id):
+    """寫入一個分塊：?offset=字節偏移，請求體為分塊內容，X-Chunk-SHA256 為其十六進制哈希"""
+    session = upload_sessions.get(upload_id)
+    if session is None:
+        return jsonify({'error': '上傳不存在或已過期'}), 404
+    
+    sha256 = request.headers.get('X-Chunk-SHA256')
+    if not sha256:
+        return jsonify({'error': '缺少 X-Chunk-SHA256 頭'}), 400
+    try:
+        offset = int(request.args.get('offset', ''))
+    except ValueError:
+        return jsonify({'error': 'offset 必須是整數'}), 400
+    
+    try:
+        session = upload_sessions.write_chunk(session, offset, request.stream, request.content_length, sha256)
+    except ValueError as e:
+        metric_errors.inc(source='upload', type='chunk_rejected')
+        return jsonify({'error': str(e)}), 400
+    return jsonify(upload_sessions.describe(session))
+
+@app.route('/api/uploads/<upload_id>', methods=['DELETE'])
+def abort_upload(upload_id):
+    """放棄上傳並刪除已收到的數據"""
+    if upload_sessions.get(upload_id) is None:
+        return jsonify({'error': '上傳不存在或已過期'}), 404
+    upload_sessions.discard(upload_id)
+    return jsonify({'success': True})
+
+@app.route('/api/uploads/<upload_id>/complete', methods=['POST'])
+def complete_upload(upload_id):
+    """校驗並提交分塊上傳，響應與 /upload 相同（緩存命中時 200，否則 202 與任務 ID）"""
+    # 先原子地佔用會話，同一上傳的並發提交只有一個會繼續，其餘返回 409（或會話已移交時返回 404）
+    if not upload_sessions.claim(upload_id):
+        if upload_sessions.get(upload_id) is None:
+            return jsonify({'error': '上傳不存在或已過期'}), 404
+        return jsonify({'error': '上傳正在提交，請稍後查詢'}), 409
+    
+    try:
+        return finish_upload(upload_id)
+    finally:
+        # 會話已移交或刪除時不影響；隊列已滿等情況下解除佔用，客戶端可以重試提交
+        upload_sessions.release(upload_id)
+
+def finish_upload(upload_id):
+    """在已佔用的會話上校驗文件並提交分析"""
+    session = upload_sessions.get(upload_id)
+    if session is None:
+        return jsonify({'error': '上傳不存在或已過期'}), 404
+    
+    try:
+        path, content_hash = upload_sessions.finish(session)
+    except ValueError as e:
+        return jsonify({'error': str(e), **upload_sessions.describe(upload_sessions.get(upload_id))}), 409
+    
+    def take_source(job_id):
+        # 同一文件系統內改名移交給任務隊列，文件由工作進程分析後刪除，服務重啟後也能恢復
+        spool_path = get_job_queue().spool_path(job_id, session['filename'].rsplit('.', 1)[1].lower())
+        os.replace(path, spool_path)
+        upload_sessions.discard(upload_id, remove_file=False)
+        return spool_path
+    
+    # 隊列已滿時保留會話，客戶端稍後重試提交即可
+    return start_analysis(session['size'], content_hash, session['filename'], take_source,
+                          release_source=lambda: upload_sessions.discard(upload_id))
+
+@app.route('/api/jobs/<job_id>')
+def job_status(job_id):
+    """查詢分析任務狀態"""
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return jsonify({'error': '任務不存在'}), 404
+    
+    return jsonify({
+        'job_id': job['id'],
+        'status': job['status'],
+        'stage': job['stage'],
+        'progress': job['progress'],
+        'error': job['error']
+    })
+
+@app.route('/api/jobs/<job_id>/result')
+def job_result(job_id):
+    """獲取分析任務結果"""
+    job = get_job_queue().get(job_id, with_result=True)
+    if job is None:
+        return jsonify({'error': '任務不存在'}), 404
+    
+    if job['status'] == STATUS_FAILED:
+        return jsonify({'error': f'音頻分析失敗: {job["error"]}'}), 500
+    
+    if job['status'] != STATUS_DONE:
+        return jsonify({
+            'success': False,
+            'job_id': job['id'],
+            'status': job['status'],
+            'stage': job['stage'],
+            'progress': job['progress']
+        }), 202
+    
+    analysis_cache.remember(job['params']['cache_key'], job['result'])
+    return analysis_response(job['result'], cached=False, analysis_id=job['params']['cache_key'])
+
+def analysis_response(result, cached, analysis_id):
+    """
+    構造分析結果響應，客戶端請求時對大矩陣使用緊湊編碼；
+    帶 windowed=1 時省略大矩陣，由客戶端通過時間窗口接口按需獲取
+    """
+    if not analysis_store.exists(analysis_id):
+        save_analysis(analysis_id, result['audio_data'])
+    
+    payload = {
+        'success': True,
+        'audio_data': result['audio_data'],
+        'visualization': result['visualization'],
+        'cached': cached,
+        'analysis_id': analysis_id,
+        'features_url': f'/api/analysis/{analysis_id}/features'
+    }
+    
+    if request.args.get('windowed') == '1':
+        payload['audio_data'] = {key: value for key, value in result['audio_data'].items()
+                                 if key not in MATRIX_FIELDS}
+        payload['visualization'] = {key: value for key, value in result['visualization'].items()
+                                    if key != 'spectrum_data'}
+    
+    if wants_compact(request):
+        return json_response(compact_payload(payload), mimetype=COMPACT_MIMETYPE)
+    
+    decimals = response_decimals()
+    if decimals is not None:
+        payload = round_payload(payload, decimals)
+    return json_response(payload)
+
+@app.route('/api/jobs/<job_id>/profile')
+def job_profile(job_id):
+    """獲取剖析任務的摘要（需要剖析令牌）"""
+    if not profiling_requested():
+        return jsonify({'error': '需要有效的剖析令牌'}), 403
+    
+    # 文件名取自任務記錄而不是 URL，避免路徑穿越
+    job = get_job_queue().get(job_id)
+    if job is None or not job['params'].get('profile_id'):
+        return jsonify({'error': '剖析結果不存在'}), 404
+    
+    summary = load_summary(PROFILE_DIR, job['params']['profile_id'])
+    if summary is None:
+        if job['status'] not in (STATUS_DONE, STATUS_FAILED):
+            return jsonify({'job_id': job_id, 'status': job['status']}), 202
+        return jsonify({'error': '剖析結果不存在'}), 404
+    return jsonify(summary)
+
+@app.route('/api/jobs/<job_id>/events')
+def job_events(job_id):
+    """以 Server-Sent Events 推送分析任務的部分結果"""
+    job_queue = get_job_queue()
+    if job_queue.get(job_id) is None:
+        return jsonify({'error': '任務不存在'}), 404
+    
+    # 斷線重連時瀏覽器會帶上最後收到的事件序號
+    try:
+        last_seq = int(request.headers.get('Last-Event-ID', 0))
+    except ValueError:
+        last_seq = 0
+    
+    def generate(seq):
+        last_sent = time.monotonic()
+        while True:
+            # 先讀狀態再讀部分結果：工作進程總是先寫完部分結果再標記完成
+            job = job_queue.get(job_id)
+            if job is None:
+                # 任務已過期被清理（見 JOB_TTL）；不用 error 作事件名，瀏覽器會把它當作連接錯誤並不斷重連
+                data = json.dumps({'error': '任務不存在或已過期'}, ensure_ascii=False)
+                yield f'event: failed\ndata: {data}\n\n'
+                return
+            parts = job_queue.parts(job_id, seq)
+            for seq, event, data in parts:
+                yield f'id: {seq}\nevent: {event}\ndata: {data}\n\n'
+                last_sent = time.monotonic()
             
-            return jsonify({
-                'success': True,
-                'audio_data': audio_data,
-                'visualization': visualization_data
+            if not parts:
+                if job['status'] == STATUS_DONE:
+                    data = json.dumps({'job_id': job_id, 'result_url': f'/api/jobs/{job_id}/result'})
+                    yield f'event: done\ndata: {data}\n\n'
+                    return
+                if job['status'] == STATUS_FAILED:
+                    data = json.dumps({'error': f'音頻分析失敗: {job["error"]}'}, ensure_ascii=False)
+                    yield f'event: failed\ndata: {data}\n\n'
+                    return
+                if time.monotonic() - last_sent >= SSE_KEEPALIVE_INTERVAL:
+                    yield ': keep-alive\n\n'
+                    last_sent = time.monotonic()
+                time.sleep(SSE_POLL_INTERVAL)
+    
+    return Response(generate(last_seq), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/api/analysis/<analysis_id>/features')
+def analysis_features(analysis_id):
+    """按時間範圍和字段返回部分特徵：?start=秒&end=秒&fields=chromagram,beats"""
+    meta = analysis_store.load_meta(analysis_id) if valid_analysis_id(analysis_id) else None
+    if meta is None:
+        return jsonify({'error': '分析結果不存在'}), 404
+    
+    fields = [field.strip() for field in request.args.get('fields', 'chromagram').split(',') if field.strip()]
+    unknown = [field for field in fields if field not in WINDOW_FIELDS]
+    if unknown:
+        return jsonify({'error': f'不支持的字段: {", ".join(unknown)}'}), 400
+    
+    try:
+        start = max(float(request.args.get('start', 0)), 0.0)
+        end = min(float(request.args.get('end', meta['duration'])), meta['duration'])
+    except ValueError:
+        return jsonify({'error': 'start 和 end 必須是秒數'}), 400
+    if end < start:
+        return jsonify({'error': 'end 不能小於 start'}), 400
+    
+    # 幀 i 的時間為 i * hop_length / sample_rate，返回時間落在 [start, end] 內的幀
+    frames_per_second = meta['sample_rate'] / meta['hop_length']
+    start_frame = min(int(np.ceil(start * frames_per_second)), meta['n_frames'])
+    end_frame = min(int(np.floor(end * frames_per_second)) + 1, meta['n_frames'])
+    
+    window = analysis_store.window(analysis_id, start_frame, end_frame, fields)
+    compact = wants_compact(request)
+    decimals = response_decimals()
+    features = {}
+    for name, values in window.items():
+        if name in MATRIX_FIELDS and compact:
+            features[name] = encode_matrix(values, 'uint8' if name == 'chromagram' else 'float16')
+        elif name in MATRIX_FIELDS and decimals is not None:
+            features[name] = np.round(np.asarray(values, dtype=np.float64), decimals)
+        else:
+            features[name] = values
+    
+    return json_response({
+        'analysis_id': analysis_id,
+        'start': start,
+        'end': end,
+        'start_frame': start_frame,
+        'end_frame': end_frame,
+        'sample_rate': meta['sample_rate'],
+        'hop_length': meta['hop_length'],
+        'features': features
+    })
+
+def save_analysis(analysis_id, audio_data, arrays=None):
+    """把分析結果寫入特徵存儲，arrays 為已有的 NumPy 特徵（可省去列表轉換）"""
+    arrays = arrays or {}
+    hop_length = ANALYSIS_PARAMS['hop_length']
+    chromagram = audio_data.get('chromagram')
+    if chromagram is not None and len(chromagram):
+        n_frames = len(chromagram[0])
+    else:
+        # 未計算色度圖時按居中 STFT 的幀數換算，節拍等事件特徵仍可按時間窗口查詢
+        n_frames = 1 + audio_data['samples'] // hop_length
+    analysis_store.save(analysis_id, {
+        'duration': audio_data['duration'],
+        'tempo': audio_data.get('tempo'),
+        'key': audio_data.get('key'),
+        'sample_rate': audio_data['sample_rate'],
+        'hop_length': hop_length,
+        'n_frames': n_frames
+    }, {
+        name: arrays[name] if name in arrays else audio_data.get(name)
+        for name in WINDOW_FIELDS
+    })
+
+def progressive_publisher(publish, analysis_id):
+    """把逐個完成的特徵轉換為客戶端可以立即使用的事件：先時長與速度，再節拍，再分窗口的色度與音符"""
+    partial = {}
+    
+    def on_feature(name, value, sr):
+        partial[name] = value
+        hop_length = ANALYSIS_PARAMS['hop_length']
+        
+        if name == 'tempo':
+            publish('summary', {
+                'analysis_id': analysis_id,
+                'duration': float(partial['duration']),
+                'tempo': float(value),
+                'sample_rate': int(sr),
+                'piano_keys': create_piano_keys()
             })
-            
-        except Exception as e:
-            # 清理臨時文件
-            if os.path.exists(filepath):
-                os.remove(filepath)
-            return jsonify({'error': f'音頻分析失敗: {str(e)}'}), 500
+        elif name == 'beats':
+            publish('beats', {
+                'beats': value,
+                'beat_times': librosa.frames_to_time(value, sr=sr, hop_length=hop_length)
+            })
+        elif name == 'chromagram':
+            notes = create_notes({
+                'beats': partial.get('beats', []),
+                'chromagram': value,
+                'sample_rate': int(sr)
+            })
+            for start in range(0, value.shape[1], CHROMA_WINDOW_FRAMES):
+                stop = min(start + CHROMA_WINDOW_FRAMES, value.shape[1])
+                start_time = start * hop_length / sr
+                stop_time = stop * hop_length / sr
+                publish('chroma', {
+                    'start': start,
+                    'end': stop,
+                    'chromagram': np.ascontiguousarray(value[:, start:stop]),
+                    'notes': [note for note in notes if start_time <= note['time'] < stop_time]
+                })
+        elif name == 'key':
+            publish('key', {'key': value})
     
-    return jsonify({'error': '不支持的文件類型'}), 400
+    return on_feature
 
-def analyze_audio(filepath):
-    """分析音頻文件"""
-    # 加載音頻
-    y, sr = librosa.load(filepath, sr=None)
+def run_analysis_job(source, params, report, publish):
+    """任務隊列工作進程執行的分析流程；開啟剖析的任務在剖析器下運行並發布摘要"""
+    if not params.get('profile_id'):
+        return analyze_job(source, params, report, publish)
     
-    # 獲取音頻長度
-    duration = librosa.get_duration(y=y, sr=sr)
+    result, summary = profile_call(lambda: analyze_job(source, params, report, publish),
+                                   PROFILE_DIR, params['profile_id'])
+    publish('profile', {
+        'wall_seconds': summary['wall_seconds'],
+        'cpu_seconds': summary['cpu_seconds'],
+        'peak_traced_bytes': summary['peak_traced_bytes'],
+        'peak_rss_bytes': summary['peak_rss_bytes']['after'],
+        'top_functions': summary['top_functions'][:10]
+    })
+    return result
+
+def analyze_job(source, params, report, publish):
+    """分析音頻並生成可視化數據，同時寫入特徵存儲與結果緩存"""
+    arrays = {}
+    publisher = progressive_publisher(publish, params['cache_key'])
     
-    # 提取節拍
-    tempo, beats = librosa.beat.beat_track(y=y, sr=sr)
+    def on_feature(name, value, sr):
+        arrays[name] = value
+        publisher(name, value, sr)
     
-    # 提取調性
-    key = librosa.feature.key_mode(y=y, sr=sr)
+    audio_data = analyze_audio(source, report=report, extension=params.get('extension'),
+                               on_feature=on_feature, fields=params.get('features', ANALYSIS_FEATURES))
+    save_analysis(params['cache_key'], audio_data, arrays)
     
-    # 提取起始點
-    onset_frames = librosa.onset.onset_detect(y=y, sr=sr)
+    report('visualization', 0.95)
+    visualization_data = generate_visualization(audio_data)
     
-    # 提取色度圖
-    chromagram = librosa.feature.chroma_cqt(y=y, sr=sr)
+    result = {
+        'audio_data': audio_data,
+        'visualization': visualization_data
+    }
+    # 在工作進程中只寫磁盤層，Web 進程讀取結果時再放入自己的內存層
+    analysis_cache.put(params['cache_key'], result, memory=False)
+    return result
+
+def load_audio(source, extension=None):
+    """解碼音頻，source 可以是文件路徑或文件內容（bytes）"""
+    if isinstance(source, str):
+        return librosa.load(source, sr=None)
     
-    # 提取MFCC特徵
-    mfcc = librosa.feature.mfcc(y=y, sr=sr)
+    try:
+        # libsndfile 支持的格式（wav/flac/ogg/mp3）直接在內存中解碼
+        return librosa.load(io.BytesIO(source), sr=None)
+    except Exception:
+        # m4a 等格式需要 audioread 按路徑讀取，只有這種情況才寫臨時文件
+        suffix = f'.{extension}' if extension else ''
+        with tempfile.NamedTemporaryFile(suffix=suffix) as tmp:
+            tmp.write(source)
+            tmp.flush()
+            return librosa.load(tmp.name, sr=None)
+
+def audio_file(source):
+    """返回 soundfile 可打開的對象（路徑或內存緩衝區）"""
+    return source if isinstance(source, str) else io.BytesIO(source)
+
+def should_stream(source):
+    """長音頻使用流式分析；libsndfile 無法讀取的格式只能整體解碼"""
+    try:
+        info = sf.info(audio_file(source))
+    except Exception:
+        return False
+    return info.duration >= STREAMING_MIN_DURATION
+
+def analyze_audio(source, report=None, extension=None, streaming=None, on_feature=None,
+                  fields=ANALYSIS_FEATURES):
+    """
+    分析音頻（文件路徑或內容），report(stage, progress) 用於匯報各階段進度，
+    on_feature(name, value, sr) 在每個特徵完成時被調用；
+    streaming 為 None 時按時長自動選擇內存分析或分塊流式分析。
+    只計算 fields 中的特徵（時長總是計算），結果中不包含未請求的特徵
+    """
+    fields = select_features(fields)
+    if report is None:
+        report = lambda stage, progress: None
+    if on_feature is None:
+        on_feature = lambda name, value, sr: None
     
-    return {
-        'duration': float(duration),
-        'tempo': float(tempo),
-        'beats': beats.tolist(),
-        'key': key.tolist(),
-        'onset_frames': onset_frames.tolist(),
-        'chromagram': chromagram.tolist(),
-        'mfcc': mfcc.tolist(),
-        'sample_rate': int(sr),
-        'samples': len(y)
+    if streaming is None:
+        streaming = should_stream(source)
+    
+    if streaming:
+        features, sr, samples = stream_features(
+            audio_file(source), fields=fields,
+            hop_length=ANALYSIS_PARAMS['hop_length'], report=report
+        )
+        for name in fields:
+            on_feature(name, features[name], sr)
+    else:
+        # 加載音頻
+        report('load', 0.0)
+        y, sr = load_audio(source, extension)
+        samples = len(y)
+        
+        # 所有特徵共享同一份 STFT 與起始點強度包絡
+        engine = FeatureEngine(y, sr, hop_length=ANALYSIS_PARAMS['hop_length'])
+        features = {}
+        for name in fields:
+            stage, progress = ANALYSIS_STAGES[name]
+            report(stage, progress)
+            features[name] = engine.get(name)
+            on_feature(name, features[name], sr)
+    
+    # 數組保持為 NumPy 類型，由 fast_json 直接序列化
+    audio_data = {
+        name: features[name]
+        for name in ('duration', 'tempo', 'beats', 'key', 'onset_frames', 'chromagram', 'mfcc')
+        if name in fields
     }
+    audio_data['duration'] = float(audio_data['duration'])
+    if 'tempo' in audio_data:
+        audio_data['tempo'] = float(audio_data['tempo'])
+    audio_data['sample_rate'] = int(sr)
+    audio_data['samples'] = int(samples)
+    return audio_data
+
+_warmed_up = False
+
+def synthetic_audio(seconds=3.0, sr=22050):
+    """生成用於預熱的 WAV 內容：120 BPM 的點擊聲疊加和弦"""
+    t = np.arange(int(seconds * sr)) / sr
+    y = 0.1 * sum(np.sin(2 * np.pi * freq * t) for freq in (261.63, 329.63, 392.0))
+    for beat in np.arange(0, seconds, 0.5):
+        start = int(beat * sr)
+        y[start:start + 200] += np.hanning(400)[200:]
+    buffer = io.BytesIO()
+    sf.write(buffer, y.astype(np.float32), sr, format='WAV')
+    return buffer.getvalue()
+
+def warm_up():
+    """
+    在合成信號上完整運行內存分析與流式分析，觸發 librosa 子模塊導入和 numba 編譯；
+    同一進程（及其 fork 出的子進程）只執行一次，返回耗時秒數
+    """
+    global _warmed_up
+    if _warmed_up:
+        return 0.0
+    
+    start = time.time()
+    source = synthetic_audio()
+    for streaming in (False, True):
+        generate_visualization(analyze_audio(source, extension='wav', streaming=streaming))
+    _warmed_up = True
+    return time.time() - start
 
 def generate_visualization(audio_data):
-    """生成可視化數據"""
+    """生成可視化數據（未計算色度圖時沒有音符與 spectrum_data）"""
     # 創建鋼琴鍵盤數據
     piano_keys = create_piano_keys()
     
     # 創建音符數據
     notes = create_notes(audio_data)
     
-    return {
+    visualization = {
         'piano_keys': piano_keys,
         'notes': notes,
-        'spectrum_data': audio_data['chromagram'],
-        'tempo': audio_data['tempo'],
+        'tempo': audio_data.get('tempo'),
         'duration': audio_data['duration']
     }
+    if 'chromagram' in audio_data:
+        visualization['spectrum_data'] = audio_data['chromagram']
+    return visualization
 
 def create_piano_keys():
     """創建鋼琴鍵盤數據"""
@@ -133,48 +831,57 @@ def create_piano_keys():
     }
 
 def create_notes(audio_data):
-    """創建音符數據"""
-    notes = []
+    """創建音符數據：每個節拍取該幀色度最強的音高，整條音軌一次向量化計算"""
+    beats = np.asarray(audio_data.get('beats', []), dtype=np.int64)
+    chromagram = audio_data.get('chromagram')
+    if beats.size == 0 or chromagram is None or len(chromagram) == 0:
+        return []
     
-    # 根據節拍生成音符
-    if 'beats' in audio_data and audio_data['beats']:
-        beat_times = librosa.frames_to_time(audio_data['beats'], sr=audio_data['sample_rate'])
-        
-        for i, beat_time in enumerate(beat_times):
-            if i < 50:  # 限制音符數量
-                # 根據色度圖選擇音符
-                if 'chromagram' in audio_data and audio_data['chromagram']:
-                    frame_idx = int(beat_time * audio_data['sample_rate'] / 512)
-                    if frame_idx < len(audio_data['chromagram'][0]):
-                        chroma = [row[frame_idx] for row in audio_data['chromagram']]
-                        note_idx = np.argmax(chroma)
-                        key_position = note_idx * 7
-                        
-                        notes.append({
-                            'x': int(key_position),
-                            'y': 100,
-                            'color': get_note_color(note_idx, beat_time),
-                            'size': 1.0,
-                            'speed': 2.5,
-                            'type': 'beat',
-                            'time': float(beat_time)
-                        })
-    
-    return notes
-
-def get_note_color(note_idx, time):
-    """獲取音符顏色"""
-    import colorsys
+    chromagram = np.asarray(chromagram)
+    
+    # 節拍本身就是幀號，直接索引色度圖（換算為秒再取整會因浮點誤差落到前一幀）；
+    # 超出色度圖範圍的節拍不生成音符
+    beats = beats[beats < chromagram.shape[1]]
+    beat_times = librosa.frames_to_time(beats, sr=audio_data['sample_rate'],
+                                        hop_length=ANALYSIS_PARAMS['hop_length'])
+    note_idx = np.argmax(chromagram[:, beats], axis=0)
+    colors = get_note_colors(note_idx, beat_times)
+    
+    return [
+        {
+            'x': int(note * 7),
+            'y': 100,
+            'color': color,
+            'size': 1.0,
+            'speed': 2.5,
+            'type': 'beat',
+            'time': float(time)
+        }
+        for note, color, time in zip(note_idx.tolist(), colors.tolist(), beat_times)
+    ]
+
+def get_note_colors(note_idx, times):
+    """批量獲取音符顏色，返回 (n, 3) 的 0-255 整數數組"""
+    # 首次生成可視化時才導入 matplotlib，/health 等路由不必承擔其導入時間
+    from matplotlib.colors import hsv_to_rgb
     
     # 彩虹色彩方案
-    hue = (note_idx / 12.0 + time * 0.1) % 1.0
-    rgb = colorsys.hsv_to_rgb(hue, 0.8, 0.9)
-    return [int(c * 255) for c in rgb]
+    hue = (np.asarray(note_idx) / 12.0 + np.asarray(times) * 0.1) % 1.0
+    hsv = np.stack([hue, np.full_like(hue, 0.8), np.full_like(hue, 0.9)], axis=-1)
+    return (hsv_to_rgb(hsv) * 255).astype(np.int64)
 
 @app.route('/health')
 def health():
     return jsonify({'status': 'healthy', 'message': '音樂可視化器運行正常'})
 
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus 文本格式的運行指標"""
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
 if __name__ == '__main__':
+    if ANALYSIS_WARMUP:
+        warm_up()
+    get_job_queue()
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=False)
@@ -4,15 +4,12 @@ import json
 import numpy as np
 import io
 import base64
+from upload_stream import HashingRequest, upload_digest
 
 app = Flask(__name__)
 
-# 配置上傳文件夾
-UPLOAD_FOLDER = 'uploads'
-if not os.path.exists(UPLOAD_FOLDER):
-    os.makedirs(UPLOAD_FOLDER)
-
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+# 上傳文件在解析時直接寫入內存緩衝區並同步計算大小和哈希，不落盤
+app.request_class = HashingRequest
 
 # 允許的文件類型
 ALLOWED_EXTENSIONS = {'mp3', 'wav', 'flac', 'm4a', 'ogg'}
@@ -91,10 +88,8 @@ def upload_file():
     
     if file and allowed_file(file.filename):
         try:
-            # 保存文件
             filename = file.filename
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
+            file_size, content_hash = upload_digest(file)
             
             # 生成音頻分析數據
             audio_data = generate_mock_audio_data()
@@ -122,16 +117,14 @@ def upload_file():
                 }
                 visualization_data['notes'].append(note)
             
-            # 清理臨時文件
-            if os.path.exists(filepath):
-                os.remove(filepath)
-            
             return jsonify({
                 'success': True,
                 'message': '音樂分析完成！現在可以看到動態音符效果了！',
                 'visualization': visualization_data,
                 'audio_info': {
                     'filename': filename,
+                    'size': file_size,
+                    'sha256': content_hash,
                     'duration': audio_data['duration'],
                     'tempo': audio_data['tempo'],
                     'beats_count': len(audio_data['beats'])
@@ -139,9 +132,6 @@ def upload_file():
             })
             
         except Exception as e:
-            # 清理臨時文件
-            if os.path.exists(filepath):
-                os.remove(filepath)
             return jsonify({'error': f'處理失敗: {str(e)}'}), 500
     
     return jsonify({'error': '不支持的文件類型'}), 400
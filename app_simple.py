@@ -1,16 +1,13 @@
 from flask import Flask, render_template, request, jsonify
 import os
 import json
+from upload_stream import HashingRequest, upload_digest
 
 app = Flask(__name__)
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max file size
 
-# 配置上傳文件夾
-UPLOAD_FOLDER = 'uploads'
-if not os.path.exists(UPLOAD_FOLDER):
-    os.makedirs(UPLOAD_FOLDER)
-
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+# 上傳文件在解析時直接寫入內存緩衝區並同步計算大小和哈希，不落盤
+app.request_class = HashingRequest
 
 # 允許的文件類型
 ALLOWED_EXTENSIONS = {'mp3', 'wav', 'flac', 'm4a', 'ogg'}
@@ -59,25 +56,17 @@ def upload_file():
         try:
             # 簡化處理 - 只返回基本信息
             filename = file.filename
-            file_size = len(file.read())
-            file.seek(0)  # 重置文件指針
-            
-            # 保存文件
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
+            file_size, content_hash = upload_digest(file)
             
             # 返回基本信息
             result = {
                 'success': True,
                 'filename': filename,
                 'size': file_size,
+                'sha256': content_hash,
                 'message': '文件上傳成功！音頻分析功能正在開發中...'
             }
             
-            # 清理臨時文件
-            if os.path.exists(filepath):
-                os.remove(filepath)
-            
             return jsonify(result)
             
         except Exception as e:
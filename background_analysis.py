@@ -0,0 +1,141 @@
+"""
+桌面可视化器的后台音频分析
+在工作线程中按阶段（解码、节拍、色度、MFCC）分析音频，每个阶段完成后把进度和结果放入队列，
+界面线程用 root.after 定时取出，窗口不再冻结；已完成阶段的结果可以直接用于播放。
+取消是协作式的：当前阶段的 librosa 调用结束后立即停止，不再产生后续结果。
+传入 AnalysisSidecar 时先查找缓存，命中则直接发出全部特征，再按需在后台解码波形
+"""
+
+import queue
+import threading
+
+import librosa
+
+from feature_engine import FeatureEngine, ANALYSIS_FEATURES
+
+# 解码之后的分析阶段及各阶段产出的特征
+ANALYSIS_STAGES = (
+    ('beats', ('duration', 'tempo', 'beats', 'onset_frames')),
+    ('chroma', ('chromagram', 'key')),
+    ('mfcc', ('mfcc',)),
+)
+
+# 各阶段在界面上显示的名称
+STAGE_NAMES = {
+    'cache': '读取缓存',
+    'decode': '解码音频',
+    'beats': '检测节拍',
+    'chroma': '计算色度',
+    'mfcc': '计算MFCC',
+    'done': '完成'
+}
+
+# 队列消息类型
+EVENT_PROGRESS = 'progress'  # (stage, 进度 0-1)
+EVENT_AUDIO = 'audio'        # (sr, duration)，此后即可播放
+EVENT_SIGNAL = 'signal'      # (y,) 解码后的波形
+EVENT_FEATURES = 'features'  # (stage, {特征名: 值})
+EVENT_DONE = 'done'
+EVENT_CANCELLED = 'cancelled'
+EVENT_FAILED = 'failed'      # 错误信息
+
+
+class AnalysisCancelled(Exception):
+    pass
+
+
+class BackgroundAnalysis:
+    """在工作线程中分析一个音频文件，结果通过 poll() 按顺序取出"""
+
+    def __init__(self, path, fields=ANALYSIS_FEATURES, sidecar=None, need_signal=True):
+        self.path = path
+        self.fields = set(fields)
+        self.sidecar = sidecar
+        # 命中缓存时是否仍需解码波形（波形模式使用）
+        self.need_signal = need_signal
+        self.events = queue.Queue()
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def poll(self):
+        """取出当前已到达的全部消息（不阻塞）"""
+        events = []
+        while True:
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                return events
+
+    def _check(self):
+        if self._cancel.is_set():
+            raise AnalysisCancelled()
+
+    def _stages(self):
+        for stage, names in ANALYSIS_STAGES:
+            names = [name for name in names if name in self.fields]
+            if names:
+                yield stage, names
+
+    def _run(self):
+        try:
+            if not (self.sidecar and self._run_cached()):
+                self._run_analysis()
+            self.events.put((EVENT_PROGRESS, 'done', 1.0))
+            self.events.put((EVENT_DONE,))
+        except AnalysisCancelled:
+            self.events.put((EVENT_CANCELLED,))
+        except Exception as e:
+            self.events.put((EVENT_FAILED, str(e)))
+
+    def _run_cached(self):
+        """从缓存恢复结果，未命中时返回 False"""
+        self.events.put((EVENT_PROGRESS, 'cache', 0.0))
+        cached = self.sidecar.load(self.path, self.fields | {'duration'})
+        if cached is None:
+            return False
+
+        sr, features = cached
+        self.events.put((EVENT_AUDIO, sr, features['duration']))
+        self.events.put((EVENT_FEATURES, 'cache', features))
+
+        if self.need_signal:
+            self.events.put((EVENT_PROGRESS, 'decode', 0.5))
+            y, _ = librosa.load(self.path, sr=None)
+            self._check()
+            self.events.put((EVENT_SIGNAL, y))
+        return True
+
+    def _run_analysis(self):
+        stages = list(self._stages())
+        total = len(stages) + 1
+
+        self.events.put((EVENT_PROGRESS, 'decode', 0.0))
+        y, sr = librosa.load(self.path, sr=None)
+        self._check()
+        self.events.put((EVENT_AUDIO, sr, len(y) / sr))
+        self.events.put((EVENT_SIGNAL, y))
+
+        engine = FeatureEngine(y, sr)
+        features = {}
+        for index, (stage, names) in enumerate(stages):
+            self.events.put((EVENT_PROGRESS, stage, (index + 1) / total))
+            values = {name: engine.get(name) for name in names}
+            self._check()
+            features.update(values)
+            self.events.put((EVENT_FEATURES, stage, values))
+
+        # 只保存完整的结果，下次打开直接读取
+        if self.sidecar:
+            features.setdefault('duration', len(y) / sr)
+            self.sidecar.save(self.path, sr, features)
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+批量分析音樂庫
+遍歷目錄中的音頻文件，在進程池中調用與 /upload 相同的 analyze_audio() 和 generate_visualization()，
+結果逐行寫入 JSONL，或直接寫入服務端的結果緩存與按列存儲的特徵存儲（發布後上傳同一文件直接命中）。
+每個文件完成後記錄到 SQLite 檢查點，中途崩潰或中斷後重新運行只處理尚未完成的文件
+
+用法：
+    python batch_analyze.py /music -o results.jsonl
+    python batch_analyze.py /music --store --workers 4          # 預先填充服務端緩存
+    python batch_analyze.py /music -o results.jsonl --no-matrices --retry-failed
+    python batch_analyze.py /music -o tempo.jsonl --analysis-profile tempo   # 只計算時長、速度與節拍
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import app
+import fast_json
+from analysis_cache import hash_bytes, make_cache_key
+from feature_engine import ANALYSIS_FEATURES, ANALYSIS_PROFILES, select_features
+
+# --no-matrices 時從結果中省略的大矩陣
+MATRIX_KEYS = (('audio_data', 'chromagram'), ('audio_data', 'mfcc'), ('visualization', 'spectrum_data'))
+
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+
+def find_audio_files(roots):
+    """按路徑順序遍歷目錄，產出支持格式的音頻文件絕對路徑"""
+    for root in roots:
+        if os.path.isfile(root):
+            yield os.path.abspath(root)
+            continue
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            for name in sorted(filenames):
+                if app.allowed_file(name):
+                    yield os.path.abspath(os.path.join(dirpath, name))
+
+
+class Checkpoint:
+    """記錄每個文件的處理結果；文件大小、修改時間或計算的特徵變化後視為未處理"""
+
+    def __init__(self, path, features=ANALYSIS_FEATURES):
+        self.features = ','.join(features)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                analysis_id TEXT,
+                error TEXT,
+                seconds REAL,
+                updated_at REAL NOT NULL,
+                features TEXT
+            )
+        """)
+        columns = [row[1] for row in self.conn.execute('PRAGMA table_info(files)')]
+        if 'features' not in columns:
+            self.conn.execute('ALTER TABLE files ADD COLUMN features TEXT')
+        self.conn.commit()
+
+    def should_skip(self, path, stat, retry_failed=False):
+        row = self.conn.execute(
+            'SELECT size, mtime_ns, status, features FROM files WHERE path = ?', (path,)
+        ).fetchone()
+        if row is None or (row[0], row[1]) != (stat.st_size, stat.st_mtime_ns):
+            return False
+        # 沒有記錄特徵的舊檢查點按全部特徵處理
+        if (row[3] or ','.join(ANALYSIS_FEATURES)) != self.features:
+            return False
+        return row[2] == STATUS_DONE or (row[2] == STATUS_FAILED and not retry_failed)
+
+    def record(self, path, stat, status, analysis_id=None, error=None, seconds=None):
+        self.conn.execute(
+            'INSERT OR REPLACE INTO files (path, size, mtime_ns, status, analysis_id, error, seconds, updated_at, features) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (path, stat.st_size, stat.st_mtime_ns, status, analysis_id, error, seconds, time.time(), self.features)
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+# 從文件末尾向前查找換行符時每次讀取的字節數
+TAIL_BLOCK_SIZE = 64 * 1024
+
+
+def open_output(path):
+    """以追加方式打開 JSONL，先截掉上次崩潰時寫了一半的最後一行"""
+    if os.path.exists(path) and os.path.getsize(path) > 0:
+        with open(path, 'rb+') as f:
+            end = f.seek(0, os.SEEK_END)
+            f.seek(end - 1)
+            if f.read(1) != b'\n':
+                # 含矩陣的結果文件可能有數 GB，從末尾按塊向前查找最後一個換行符，不讀入整個文件
+                keep = 0
+                position = end
+                while position > 0:
+                    start = max(position - TAIL_BLOCK_SIZE, 0)
+                    f.seek(start)
+                    index = f.read(position - start).rfind(b'\n')
+                    if index >= 0:
+                        keep = start + index + 1
+                        break
+                    position = start
+                f.truncate(keep)
+    return open(path, 'a', encoding='utf-8')
+
+
+# 工作進程的選項，由 init_worker 設置
+_options = {}
+
+
+def init_worker(options):
+    _options.update(options)
+    app.warm_up()
+
+
+def analyze_path(path):
+    """在工作進程中分析單個文件，返回寫入結果所需的信息"""
+    start = time.perf_counter()
+    with open(path, 'rb') as f:
+        data = f.read()
+    features = _options['features']
+    analysis_id = make_cache_key(hash_bytes(data), app.analysis_params(features))
+
+    # 寫入服務端緩存時，內容相同的文件（包括上次運行或其他路徑）不再重複分析
+    result = app.analysis_cache.get(analysis_id) if _options['store'] else None
+    cached = result is not None
+    if result is None:
+        audio_data = app.analyze_audio(data, extension=path.rsplit('.', 1)[-1].lower(), fields=features)
+        result = {'audio_data': audio_data, 'visualization': app.generate_visualization(audio_data)}
+        if _options['store']:
+            app.save_analysis(analysis_id, audio_data)
+            app.analysis_cache.put(analysis_id, result, memory=False)
+
+    if not _options['output']:
+        result = None
+    elif _options['no_matrices']:
+        result = {section: dict(values) for section, values in result.items()}
+        for section, field in MATRIX_KEYS:
+            result[section].pop(field, None)
+
+    return {
+        'analysis_id': analysis_id,
+        'cached': cached,
+        'seconds': round(time.perf_counter() - start, 3),
+        'result': result
+    }
+
+
+def run_batch(roots, output=None, store=False, checkpoint_path=None, workers=None,
+              no_matrices=False, retry_failed=False, log=None, features=None):
+    """批量分析，features 為要計算的特徵（默認同服務端），返回 {'done': 完成數, 'failed': 失敗數, 'skipped': 跳過數}"""
+    log = log or (lambda message: None)
+    workers = workers or os.cpu_count() or 1
+    features = features or app.DEFAULT_FEATURES
+    checkpoint = Checkpoint(checkpoint_path, features)
+    out = open_output(output) if output else None
+    options = {'output': bool(output), 'store': store, 'no_matrices': no_matrices, 'features': features}
+    counts = {'done': 0, 'failed': 0, 'skipped': 0}
+
+    def pending_files():
+        for path in find_audio_files(roots):
+            try:
+                stat = os.stat(path)
+            except OSError as e:
+                log(f'跳過 {path}: {e}')
+                continue
+            if checkpoint.should_skip(path, stat, retry_failed):
+                counts['skipped'] += 1
+                continue
+            yield path, stat
+
+    def new_executor():
+        # 預熱後再創建進程池：fork 出的工作進程直接繼承編譯好的 numba 函數
+        app.warm_up()
+        return ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(options,))
+
+    # 首個需要處理的文件出現時才創建進程池，全部跳過時不必預熱
+    executor = None
+    broken = False
+    in_flight = {}
+    files = pending_files()
+    try:
+        while True:
+            # 只保持有限個任務在途，上萬個文件時不會一次性堆積結果
+            while len(in_flight) < workers * 2:
+                item = next(files, None)
+                if item is None:
+                    break
+                if broken:
+                    executor.shutdown(wait=False)
+                    executor = None
+                    broken = False
+                if executor is None:
+                    executor = new_executor()
+                in_flight[executor.submit(analyze_path, item[0])] = item
+            if not in_flight:
+                break
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                path, stat = in_flight.pop(future)
+                try:
+                    outcome = future.result()
+                except Exception as e:
+                    # 工作進程崩潰（例如內存不足）時同一批在途文件都會失敗，可用 --retry-failed 重試
+                    broken = broken or isinstance(e, BrokenProcessPool)
+                    error = f'{type(e).__name__}: {e}'
+                    checkpoint.record(path, stat, STATUS_FAILED, error=error)
+                    counts['failed'] += 1
+                    log(f'失敗 {path}: {error}')
+                    continue
+
+                if out is not None:
+                    line = {'path': path, 'analysis_id': outcome['analysis_id'], 'cached': outcome['cached'],
+                            'seconds': outcome['seconds'], **outcome['result']}
+                    out.write(fast_json.dumps(line).decode('utf-8') + '\n')
+                    out.flush()
+                # 結果寫出後才記錄檢查點：崩潰時最多重複寫出一行，不會丟失結果
+                checkpoint.record(path, stat, STATUS_DONE, outcome['analysis_id'], seconds=outcome['seconds'])
+                counts['done'] += 1
+                log(f"[{counts['done'] + counts['failed']}] {path} {outcome['seconds']:.2f}s"
+                    f"{'（緩存）' if outcome['cached'] else ''}")
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+        if out is not None:
+            out.close()
+        checkpoint.close()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批量分析音樂庫')
+    parser.add_argument('paths', nargs='+', help='音頻文件或目錄（遞歸遍歷）')
+    parser.add_argument('-o', '--output', help='結果 JSONL 文件（追加寫入）')
+    parser.add_argument('--store', action='store_true',
+                        help='寫入服務端結果緩存與特徵存儲（ANALYSIS_CACHE_DIR / ANALYSIS_STORE_DIR）')
+    parser.add_argument('--checkpoint', help='檢查點文件（默認為輸出文件名加 .checkpoint，或 batch_checkpoint.db）')
+    parser.add_argument('--workers', type=int, default=None, help='分析進程數（默認 CPU 核數）')
+    parser.add_argument('--no-matrices', action='store_true', help='JSONL 中省略色度圖、MFCC 等大矩陣')
+    parser.add_argument('--retry-failed', action='store_true', help='重新分析上次失敗的文件')
+    parser.add_argument('--analysis-profile', help=f'分析檔位：{", ".join(ANALYSIS_PROFILES)}（默認同服務端 ANALYSIS_PROFILE）')
+    parser.add_argument('--fields', help='逗號分隔的特徵，優先於 --analysis-profile')
+    args = parser.parse_args()
+
+    if not args.output and not args.store:
+        parser.error('至少需要 --output 或 --store 之一')
+    features = None
+    if args.fields or args.analysis_profile:
+        fields = [field.strip() for field in (args.fields or '').split(',') if field.strip()]
+        try:
+            features = select_features(fields, args.analysis_profile)
+        except ValueError as e:
+            parser.error(str(e))
+    checkpoint = args.checkpoint or (f'{args.output}.checkpoint' if args.output else 'batch_checkpoint.db')
+
+    start = time.time()
+    counts = run_batch(args.paths, args.output, args.store, checkpoint, args.workers,
+                       args.no_matrices, args.retry_failed, log=lambda message: print(message, file=sys.stderr),
+                       features=features)
+    print(f"完成 {counts['done']} 個，失敗 {counts['failed']} 個，跳過 {counts['skipped']} 個，"
+          f"耗時 {time.time() - start:.1f} 秒", file=sys.stderr)
+    if counts['failed']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
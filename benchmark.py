@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+分析流程基準測試
+用固定種子生成的合成音頻（純音、和弦、點擊音軌、噪聲），在多個時長與採樣率下
+分別計時解碼、各特徵節點、analyze_audio()（全部特徵及各分析檔位）、create_notes() 與 generate_visualization()，
+記錄峰值內存和 JSON 響應體積（原始、取整、gzip 與緊湊格式），結果以 JSON 輸出，可與保存的基線對比
+
+用法：
+    python benchmark.py --output bench.json                   # 運行並保存結果
+    python benchmark.py --baseline bench.json                 # 與基線對比，有退化時退出碼為 1
+    python benchmark.py --signals chord --durations 30 --rates 22050 --repeat 5
+"""
+
+import argparse
+import gc
+import gzip
+import io
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import soundfile as sf
+
+import app
+import fast_json
+from compression import GZIP_LEVEL
+from feature_engine import ANALYSIS_FEATURES, ANALYSIS_PROFILES, FeatureEngine, resolve
+from payload_codec import compact_payload, round_payload
+
+SIGNALS = ('tone', 'chord', 'clicks', 'noise')
+DURATIONS = (10, 60, 180)
+SAMPLE_RATES = (22050, 44100)
+
+# 統計取整後響應體積時使用的小數位數
+ROUNDED_DECIMALS = 4
+
+# 耗時過短的階段受計時噪聲影響大，基線低於該值（秒）的階段不判定退化
+MIN_COMPARE_SECONDS = 0.005
+
+
+def synthesize(kind, seconds, sr, seed=0):
+    """生成確定性的合成信號（float32，峰值不超過 1）"""
+    t = np.arange(int(seconds * sr)) / sr
+    if kind == 'tone':
+        y = 0.5 * np.sin(2 * np.pi * 440.0 * t)
+    elif kind == 'chord':
+        # 每 2 秒在 C、F、G、C 大三和弦之間切換，讓色度與調性有變化
+        roots = np.array([261.63, 349.23, 392.0, 261.63])
+        root = roots[(t // 2).astype(np.int64) % len(roots)]
+        y = sum(0.2 * np.sin(2 * np.pi * root * ratio * t) for ratio in (1.0, 1.26, 1.5))
+    elif kind == 'clicks':
+        # 120 BPM 點擊音軌，重拍更響
+        y = np.zeros_like(t)
+        click = np.hanning(int(0.02 * sr)) * np.sin(2 * np.pi * 1000.0 * t[:int(0.02 * sr)])
+        for i, beat in enumerate(np.arange(0, seconds, 0.5)):
+            start = int(beat * sr)
+            segment = y[start:start + len(click)]
+            segment += (0.9 if i % 4 == 0 else 0.5) * click[:len(segment)]
+    elif kind == 'noise':
+        y = 0.3 * np.random.default_rng(seed).standard_normal(len(t))
+    else:
+        raise ValueError(f'未知信號類型: {kind}')
+    return np.clip(y, -1.0, 1.0).astype(np.float32)
+
+
+def encode_wav(y, sr):
+    buffer = io.BytesIO()
+    sf.write(buffer, y, sr, format='WAV')
+    return buffer.getvalue()
+
+
+def time_call(func, repeat):
+    """重複調用 func，返回 (各次耗時, 最後一次的返回值)"""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return timings, result
+
+
+def summarize(timings):
+    return {'min': round(min(timings), 6), 'median': round(statistics.median(timings), 6)}
+
+
+def peak_memory(func):
+    """單獨運行一次 func，返回 tracemalloc 記錄的峰值分配字節數（含 numpy 數組）"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def engine_stages(y, sr):
+    """按依賴順序逐個計算特徵節點，返回 {節點: 耗時}；共享中間結果只計入首次計算它的節點"""
+    engine = FeatureEngine(y, sr, hop_length=app.ANALYSIS_PARAMS['hop_length'])
+    timings = {}
+    for node in resolve(ANALYSIS_FEATURES):
+        start = time.perf_counter()
+        engine.get(node)
+        timings[node] = time.perf_counter() - start
+    return timings
+
+
+def run_case(kind, seconds, sr, repeat):
+    """測量一個信號/時長/採樣率組合"""
+    source = encode_wav(synthesize(kind, seconds, sr), sr)
+    stages = {}
+
+    decode_timings, (y, decoded_sr) = time_call(lambda: app.load_audio(source, 'wav'), repeat)
+    stages['decode'] = summarize(decode_timings)
+
+    node_timings = {}
+    for _ in range(repeat):
+        gc.collect()
+        for node, elapsed in engine_stages(y, decoded_sr).items():
+            node_timings.setdefault(node, []).append(elapsed)
+    for node, timings in node_timings.items():
+        stages[f'feature.{node}'] = summarize(timings)
+
+    analyze_timings, audio_data = time_call(
+        lambda: app.analyze_audio(source, extension='wav', streaming=False), repeat
+    )
+    stages['analyze_audio'] = summarize(analyze_timings)
+
+    for profile, fields in ANALYSIS_PROFILES.items():
+        if fields != ANALYSIS_FEATURES:
+            profile_timings, _ = time_call(
+                lambda: app.analyze_audio(source, extension='wav', streaming=False, fields=fields), repeat
+            )
+            stages[f'analyze_audio.{profile}'] = summarize(profile_timings)
+
+    notes_timings, notes = time_call(lambda: app.create_notes(audio_data), repeat)
+    stages['create_notes'] = summarize(notes_timings)
+
+    visualization_timings, visualization = time_call(lambda: app.generate_visualization(audio_data), repeat)
+    stages['generate_visualization'] = summarize(visualization_timings)
+
+    # 與 /api/jobs/<id>/result 返回的結構一致
+    payload = {'success': True, 'audio_data': audio_data, 'visualization': visualization}
+    serialize_timings, body = time_call(lambda: fast_json.dumps(payload), repeat)
+    stages['json_dumps'] = summarize(serialize_timings)
+
+    return {
+        'name': f'{kind}-{seconds}s-{sr}',
+        'signal': kind,
+        'duration': seconds,
+        'sample_rate': sr,
+        'stages': stages,
+        'peak_memory_bytes': {
+            'analyze_audio': peak_memory(lambda: app.analyze_audio(source, extension='wav', streaming=False)),
+            'generate_visualization': peak_memory(lambda: app.generate_visualization(audio_data))
+        },
+        'payload_bytes': {
+            'json': len(body),
+            'json_rounded': len(fast_json.dumps(round_payload(payload, ROUNDED_DECIMALS))),
+            'json_gzip': len(gzip.compress(body, compresslevel=GZIP_LEVEL)),
+            'compact': len(fast_json.dumps(compact_payload(payload)))
+        },
+        'notes': len(notes),
+        'beats': len(audio_data['beats'])
+    }
+
+
+def environment():
+    import librosa
+    import numba
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'numpy': np.__version__,
+        'librosa': librosa.__version__,
+        'numba': numba.__version__
+    }
+
+
+def run_benchmarks(signals=SIGNALS, durations=DURATIONS, rates=SAMPLE_RATES, repeat=3, log=None):
+    """運行全部組合，返回結果字典"""
+    start = time.perf_counter()
+    warmup = app.warm_up()
+    cases = []
+    for kind in signals:
+        for seconds in durations:
+            for sr in rates:
+                case = run_case(kind, seconds, sr, repeat)
+                if log:
+                    log(f"{case['name']:>22}  analyze {case['stages']['analyze_audio']['median'] * 1000:8.1f} ms  "
+                        f"peak {case['peak_memory_bytes']['analyze_audio'] / 2 ** 20:7.1f} MiB  "
+                        f"json {case['payload_bytes']['json'] / 1024:8.1f} KiB")
+                cases.append(case)
+    return {
+        'version': 1,
+        'environment': environment(),
+        'repeat': repeat,
+        'warmup_seconds': round(warmup, 3),
+        'total_seconds': round(time.perf_counter() - start, 3),
+        'cases': cases
+    }
+
+
+def compare(results, baseline, threshold=1.2):
+    """
+    按用例與指標對比中位數耗時、峰值內存和響應體積，
+    返回比值超過 threshold 的退化列表 [(用例, 指標, 基線值, 當前值, 比值)]
+    """
+    previous = {case['name']: case for case in baseline['cases']}
+    regressions = []
+    for case in results['cases']:
+        old = previous.get(case['name'])
+        if old is None:
+            continue
+
+        metrics = []
+        for stage, timing in case['stages'].items():
+            if stage in old['stages'] and old['stages'][stage]['median'] >= MIN_COMPARE_SECONDS:
+                metrics.append((stage, old['stages'][stage]['median'], timing['median']))
+        for group in ('peak_memory_bytes', 'payload_bytes'):
+            for name, value in case[group].items():
+                if old.get(group, {}).get(name):
+                    metrics.append((f'{group}.{name}', old[group][name], value))
+
+        for metric, before, after in metrics:
+            ratio = after / before
+            if ratio > threshold:
+                regressions.append((case['name'], metric, before, after, ratio))
+    return regressions
+
+
+def parse_list(value, cast=str):
+    return tuple(cast(item) for item in value.split(',') if item)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='分析流程基準測試')
+    parser.add_argument('--signals', type=parse_list, default=SIGNALS, help='逗號分隔：tone,chord,clicks,noise')
+    parser.add_argument('--durations', type=lambda v: parse_list(v, int), default=DURATIONS, help='逗號分隔的時長（秒）')
+    parser.add_argument('--rates', type=lambda v: parse_list(v, int), default=SAMPLE_RATES, help='逗號分隔的採樣率')
+    parser.add_argument('--repeat', type=int, default=3, help='每個階段重複次數（取中位數）')
+    parser.add_argument('--output', '-o', help='保存結果的 JSON 文件')
+    parser.add_argument('--baseline', help='對比的基線 JSON 文件')
+    parser.add_argument('--threshold', type=float, default=1.2, help='判定退化的比值（默認 1.2）')
+    args = parser.parse_args()
+
+    for kind in args.signals:
+        if kind not in SIGNALS:
+            parser.error(f'未知信號類型: {kind}')
+
+    results = run_benchmarks(args.signals, args.durations, args.rates, args.repeat,
+                             log=lambda line: print(line, file=sys.stderr))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    else:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for name, metric, before, after, ratio in regressions:
+            print(f'退化 {name} {metric}: {before} -> {after}（x{ratio:.2f}）', file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f'與基線相比沒有超過 x{args.threshold} 的退化', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
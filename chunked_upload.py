@@ -0,0 +1,261 @@
+"""
+可續傳的分塊上傳
+客戶端先創建上傳會話，再按偏移量逐塊 PUT（每塊附帶 SHA-256），最後提交；
+分塊邊讀邊校驗並暫存到臨時文件，校驗通過後才寫入磁盤上預先分配好大小的文件的對應位置，
+服務端內存中最多只有一小段數據。
+已確認的分塊記錄在 SQLite 中，連接中斷後客戶端查詢已收到的範圍即可從斷點繼續
+"""
+
+import hashlib
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+
+# 會話狀態：接收中、已校驗完整文件
+STATUS_OPEN = 'open'
+STATUS_COMPLETE = 'complete'
+
+# 讀取請求體與計算整文件哈希時的分段大小
+READ_SIZE = 1024 * 1024
+
+# 提交時佔用會話的最長時間（秒），處理提交的進程崩潰後超時的佔用自動失效
+CLAIM_TIMEOUT = 600
+
+_SCHEMA = ("""
+CREATE TABLE IF NOT EXISTS uploads (
+    id TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    sha256 TEXT,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    claimed_at REAL
+)
+""", """
+CREATE TABLE IF NOT EXISTS upload_chunks (
+    upload_id TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    PRIMARY KEY (upload_id, offset)
+)
+""")
+
+
+def merge_ranges(chunks):
+    """把 [(偏移, 長度)] 合併為按順序排列、互不重疊的 [[起點, 終點)]"""
+    ranges = []
+    for offset, length in sorted(chunks):
+        end = offset + length
+        if ranges and offset <= ranges[-1][1]:
+            ranges[-1][1] = max(ranges[-1][1], end)
+        else:
+            ranges.append([offset, end])
+    return ranges
+
+
+class UploadSessions:
+    """分塊上傳會話：元數據與已收到的分塊在 SQLite 中，文件內容在 root 目錄下"""
+
+    def __init__(self, root, max_bytes=2 * 1024 ** 3, chunk_bytes=8 * 1024 ** 2, ttl=24 * 3600):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.chunk_bytes = chunk_bytes
+        self.ttl = ttl
+        os.makedirs(self.root, exist_ok=True)
+        self.db_path = os.path.join(self.root, 'uploads.db')
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            for statement in _SCHEMA:
+                conn.execute(statement)
+            columns = [row['name'] for row in conn.execute('PRAGMA table_info(uploads)')]
+            if 'claimed_at' not in columns:
+                conn.execute('ALTER TABLE uploads ADD COLUMN claimed_at REAL')
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def path(self, upload_id):
+        return os.path.join(self.root, f'{upload_id}.part')
+
+    def create(self, filename, size, sha256=None):
+        """創建會話並預先分配文件，返回會話信息"""
+        if not isinstance(size, int) or size <= 0:
+            raise ValueError('size 必須是正整數')
+        if size > self.max_bytes:
+            raise ValueError(f'文件超過 {self.max_bytes} 字節的上限')
+        if sha256 is not None and (len(sha256) != 64 or any(c not in '0123456789abcdef' for c in sha256.lower())):
+            raise ValueError('sha256 必須是 64 位十六進制字符串')
+
+        self.sweep()
+        upload_id = uuid.uuid4().hex
+        # 截斷到目標大小得到稀疏文件，分塊可以按任意順序寫入
+        with open(self.path(upload_id), 'wb') as f:
+            f.truncate(size)
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT INTO uploads (id, filename, size, sha256, status, created_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (upload_id, filename, size, sha256.lower() if sha256 else None, STATUS_OPEN, now, now)
+            )
+        return self.get(upload_id)
+
+    def get(self, upload_id):
+        """返回會話信息（含已收到的範圍與下一個缺失的偏移量），不存在時返回 None"""
+        with self._connect() as conn:
+            row = conn.execute('SELECT * FROM uploads WHERE id = ?', (upload_id,)).fetchone()
+            if row is None:
+                return None
+            chunks = conn.execute(
+                'SELECT offset, length FROM upload_chunks WHERE upload_id = ?', (upload_id,)
+            ).fetchall()
+
+        session = dict(row)
+        session['received'] = merge_ranges((chunk['offset'], chunk['length']) for chunk in chunks)
+        session['received_bytes'] = sum(end - start for start, end in session['received'])
+        first = session['received'][0] if session['received'] else None
+        session['next_offset'] = first[1] if first and first[0] == 0 else 0
+        session['complete'] = session['received_bytes'] == session['size']
+        session['claimed'] = bool(session['claimed_at']) and session['claimed_at'] > time.time() - CLAIM_TIMEOUT
+        return session
+
+    def claim(self, upload_id):
+        """
+        佔用會話以便提交，同一會話同時只有一個請求能佔用成功；
+        會話不存在或已被佔用時返回 False。提交結束後調用 release（會話已刪除時無需調用）
+        """
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                'UPDATE uploads SET claimed_at = ? WHERE id = ? AND (claimed_at IS NULL OR claimed_at < ?)',
+                (now, upload_id, now - CLAIM_TIMEOUT)
+            )
+            return cursor.rowcount == 1
+
+    def release(self, upload_id):
+        with self._connect() as conn:
+            conn.execute('UPDATE uploads SET claimed_at = NULL WHERE id = ?', (upload_id,))
+
+    def write_chunk(self, session, offset, stream, length, sha256):
+        """
+        把長度為 length 的分塊從 stream 寫入 offset 處：先暫存並計算 SHA-256，
+        校驗通過後才寫入上傳文件，哈希不符或數據不完整時文件保持不變並拋出 ValueError
+        """
+        if session['status'] != STATUS_OPEN:
+            raise ValueError('上傳已經提交')
+        if session['claimed']:
+            raise ValueError('上傳正在提交，不能再寫入分塊')
+        if length is None or length <= 0:
+            raise ValueError('分塊需要 Content-Length')
+        if length > self.chunk_bytes:
+            raise ValueError(f'分塊不能超過 {self.chunk_bytes} 字節')
+        if offset < 0 or offset + length > session['size']:
+            raise ValueError('分塊超出文件範圍')
+
+        digest = hashlib.sha256()
+        written = 0
+        # 與上傳文件放在同一目錄下，避免佔用系統臨時目錄；關閉時自動刪除
+        with tempfile.TemporaryFile(dir=self.root) as staging:
+            while written < length:
+                data = stream.read(min(READ_SIZE, length - written))
+                if not data:
+                    break
+                digest.update(data)
+                staging.write(data)
+                written += len(data)
+
+            if written != length:
+                raise ValueError(f'分塊不完整：收到 {written} / {length} 字節')
+            if digest.hexdigest() != sha256.lower():
+                raise ValueError('分塊 SHA-256 校驗失敗')
+
+            # 校驗通過後才覆蓋上傳文件，錯誤的分塊不會破壞已確認的數據
+            staging.seek(0)
+            with open(self.path(session['id']), 'r+b') as f:
+                f.seek(offset)
+                shutil.copyfileobj(staging, f, READ_SIZE)
+
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO upload_chunks (upload_id, offset, length) VALUES (?, ?, ?)',
+                (session['id'], offset, length)
+            )
+            conn.execute('UPDATE uploads SET updated_at = ? WHERE id = ?', (time.time(), session['id']))
+        return self.get(session['id'])
+
+    def finish(self, session):
+        """
+        校驗文件完整後計算整文件 SHA-256，返回 (文件路徑, SHA-256)；
+        創建會話時聲明了哈希的，必須一致。重複提交不會重新計算
+        """
+        if session['status'] == STATUS_COMPLETE:
+            return self.path(session['id']), session['sha256']
+        if not session['complete']:
+            raise ValueError(f"文件不完整：已收到 {session['received_bytes']} / {session['size']} 字節")
+
+        digest = hashlib.sha256()
+        with open(self.path(session['id']), 'rb') as f:
+            for data in iter(lambda: f.read(READ_SIZE), b''):
+                digest.update(data)
+        content_hash = digest.hexdigest()
+        if session['sha256'] and session['sha256'] != content_hash:
+            # 各分塊都已校驗過，整體不符說明客戶端聲明的哈希有誤，清空後需要重新上傳
+            with self._connect() as conn:
+                conn.execute('DELETE FROM upload_chunks WHERE upload_id = ?', (session['id'],))
+            raise ValueError('文件 SHA-256 與創建上傳時聲明的不一致')
+
+        with self._connect() as conn:
+            conn.execute(
+                'UPDATE uploads SET status = ?, sha256 = ?, updated_at = ? WHERE id = ?',
+                (STATUS_COMPLETE, content_hash, time.time(), session['id'])
+            )
+        return self.path(session['id']), content_hash
+
+    def discard(self, upload_id, remove_file=True):
+        """刪除會話；文件已被移交（例如移入任務暫存目錄）時傳 remove_file=False"""
+        with self._connect() as conn:
+            conn.execute('DELETE FROM upload_chunks WHERE upload_id = ?', (upload_id,))
+            conn.execute('DELETE FROM uploads WHERE id = ?', (upload_id,))
+        if remove_file:
+            try:
+                os.remove(self.path(upload_id))
+            except OSError:
+                pass
+
+    def sweep(self):
+        """刪除超過 ttl 未更新的會話，返回刪除數"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                'SELECT id FROM uploads WHERE updated_at < ?', (time.time() - self.ttl,)
+            ).fetchall()
+        for row in rows:
+            self.discard(row['id'])
+        return len(rows)
+
+    def describe(self, session):
+        """會話信息中可以返回給客戶端的部分"""
+        return {
+            'upload_id': session['id'],
+            'filename': session['filename'],
+            'size': session['size'],
+            'status': session['status'],
+            'received': session['received'],
+            'received_bytes': session['received_bytes'],
+            'next_offset': session['next_offset'],
+            'complete': session['complete'],
+            'chunk_size': self.chunk_bytes,
+            'upload_url': f"/api/uploads/{session['id']}",
+            'complete_url': f"/api/uploads/{session['id']}/complete"
+        }
@@ -0,0 +1,63 @@
+"""
+按 Accept-Encoding 壓縮響應
+優先使用 brotli（安裝了 Brotli 包時），否則使用 gzip；流式響應（SSE）、已編碼或過小的響應不壓縮
+"""
+
+import gzip
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 小於該大小（字節）的響應壓縮收益不抵開銷
+MIN_COMPRESS_BYTES = 1024
+
+# 壓縮級別取速度與壓縮率的折中：分析結果在 brotli 4 / gzip 5 時已接近最高級別的壓縮率
+BROTLI_QUALITY = 4
+GZIP_LEVEL = 5
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'application/vnd.seemusic.compact+json',
+    'text/html',
+    'text/plain',
+    'text/css',
+    'application/javascript'
+}
+
+
+def choose_encoding(accept_encodings):
+    """根據請求的 Accept-Encoding（werkzeug 的 Accept 對象）選擇編碼，不壓縮時返回 None"""
+    if brotli is not None and accept_encodings['br']:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress_body(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+
+def compress_response(response, accept_encodings):
+    """原地壓縮 Flask 響應並設置相應的頭，返回響應"""
+    response.vary.add('Accept-Encoding')
+    if (response.is_streamed or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES
+            or not 200 <= response.status_code < 300):
+        return response
+
+    encoding = choose_encoding(accept_encodings)
+    if encoding is None:
+        return response
+    data = response.get_data()
+    if len(data) < MIN_COMPRESS_BYTES:
+        return response
+
+    response.set_data(compress_body(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
@@ -0,0 +1,44 @@
+"""
+预先排序的事件时间线
+节拍、起始点等事件在分析完成后一次性换算成秒并排序，播放时用单调前进的游标取出到期事件：
+每帧开销只与本帧到期的事件数有关，每个事件只触发一次；时间倒退（重新播放、跳转）时二分查找重新定位
+"""
+
+import bisect
+
+import numpy as np
+
+
+class EventTimeline:
+    """按时间顺序消费的事件序列"""
+
+    def __init__(self, times, max_late=0.25):
+        self.times = np.sort(np.asarray(times, dtype=float))
+        # 超过这个时间仍未取出的事件直接跳过（例如卡顿或向前跳转后）
+        self.max_late = max_late
+        self.cursor = 0
+        self.last_time = 0.0
+
+    def __len__(self):
+        return len(self.times)
+
+    def seek(self, current_time):
+        """把游标定位到 current_time 之后的第一个事件"""
+        self.cursor = bisect.bisect_left(self.times, current_time)
+        self.last_time = current_time
+
+    def due(self, current_time):
+        """返回 (上次调用, current_time] 内到期事件的时间数组"""
+        if current_time < self.last_time:
+            self.seek(current_time)
+            return self.times[:0]
+
+        start = self.cursor
+        end = start
+        while end < len(self.times) and self.times[end] <= current_time:
+            end += 1
+        self.cursor = end
+        self.last_time = current_time
+
+        events = self.times[start:end]
+        return events[events >= current_time - self.max_late]
@@ -0,0 +1,49 @@
+"""
+支持 NumPy 的快速 JSON 編解碼
+安裝了 orjson 時直接序列化 NumPy 數組，不再經過 .tolist() 生成大量 Python 浮點對象；
+未安裝時退回標準庫 json，並把數組與 NumPy 標量轉換為列表和 Python 數值。兩種實現的輸出都是 UTF-8 bytes
+"""
+
+import json
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f'無法序列化 {type(value).__name__}')
+
+
+def _orjson_default(value):
+    if isinstance(value, np.ndarray):
+        # 內存映射（np.memmap）與非連續切片 orjson 不能直接處理，先複製為普通的連續數組
+        if type(value) is not np.ndarray or not value.flags.c_contiguous:
+            return np.ascontiguousarray(value)
+    # orjson 不支持的數據類型（如 float16、object）轉換為列表
+    return _default(value)
+
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps(value):
+        """序列化為緊湊的 UTF-8 JSON"""
+        return orjson.dumps(value, default=_orjson_default, option=_OPTIONS)
+
+    def loads(data):
+        return orjson.loads(data)
+else:
+    def dumps(value):
+        """序列化為緊湊的 UTF-8 JSON"""
+        return json.dumps(value, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    def loads(data):
+        return json.loads(data)
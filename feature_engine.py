@@ -0,0 +1,212 @@
+"""
+單次頻譜特徵提取引擎
+STFT、梅爾頻譜與起始點強度包絡只計算一次，
+節拍、起始點、色度圖與 MFCC 都從這些共享的中間結果推導；
+每個特徵聲明自己的依賴，引擎只計算被請求的特徵及其依賴，
+客戶端可以按字段或檔位（ANALYSIS_PROFILES）只請求需要的特徵
+"""
+
+import librosa
+import numpy as np
+
+# 與 librosa 默認值保持一致，前端和可視化代碼按 hop_length=512 換算幀號
+N_FFT = 2048
+HOP_LENGTH = 512
+
+# 對外提供的分析特徵（按計算順序排列）
+ANALYSIS_FEATURES = ('duration', 'tempo', 'beats', 'onset_frames', 'chromagram', 'key', 'mfcc')
+
+# 分析檔位：上傳時用 ?analysis_profile= 選擇（?profile= 是剖析令牌），檔位之外的特徵及其專屬的中間結果都不計算。
+# tempo 只有速度與節拍；notes-only 是頁面與 generate_visualization 用到的特徵；
+# full 再加起始點；research 為全部特徵（含 MFCC）
+ANALYSIS_PROFILES = {
+    'tempo': ('duration', 'tempo', 'beats'),
+    'notes-only': ('duration', 'tempo', 'beats', 'chromagram', 'key'),
+    'full': ('duration', 'tempo', 'beats', 'onset_frames', 'chromagram', 'key'),
+    'research': ANALYSIS_FEATURES
+}
+
+# 調性名稱與 Krumhansl-Schmuckler 調性輪廓
+PITCH_NAMES = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
+MAJOR_PROFILE = np.array([6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88])
+MINOR_PROFILE = np.array([6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17])
+
+_FEATURES = {}
+
+
+def feature(name, requires=()):
+    """註冊特徵計算函數，requires 為其依賴的其他特徵或中間結果"""
+    def decorator(func):
+        _FEATURES[name] = (tuple(requires), func)
+        return func
+    return decorator
+
+
+def resolve(names):
+    """返回計算指定特徵所需的全部節點（依賴在前）"""
+    order = []
+    visiting = set()
+
+    def visit(name):
+        if name in order:
+            return
+        if name not in _FEATURES:
+            raise KeyError(f'未知特徵: {name}')
+        if name in visiting:
+            raise ValueError(f'特徵依賴存在循環: {name}')
+        visiting.add(name)
+        for dependency in _FEATURES[name][0]:
+            visit(dependency)
+        visiting.discard(name)
+        order.append(name)
+
+    for name in names:
+        visit(name)
+    return order
+
+
+def select_features(fields=None, profile='research'):
+    """
+    按字段列表（優先）或檔位名選擇要計算的特徵，返回按 ANALYSIS_FEATURES 順序排列的元組；
+    時長總是包含在內。未知的字段或檔位拋出 ValueError
+    """
+    if fields:
+        unknown = [name for name in fields if name not in ANALYSIS_FEATURES]
+        if unknown:
+            raise ValueError(f'不支持的字段: {", ".join(unknown)}')
+        selected = set(fields)
+    elif profile in ANALYSIS_PROFILES:
+        selected = set(ANALYSIS_PROFILES[profile])
+    else:
+        raise ValueError(f'未知的分析檔位: {profile}（可選 {", ".join(ANALYSIS_PROFILES)}）')
+    selected.add('duration')
+    return tuple(name for name in ANALYSIS_FEATURES if name in selected)
+
+
+class FeatureEngine:
+    """按需計算並緩存特徵，同一音頻的中間結果只計算一次"""
+
+    def __init__(self, y, sr, n_fft=N_FFT, hop_length=HOP_LENGTH, intermediates=None):
+        self.y = y
+        self.sr = sr
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self._values = dict(intermediates or {})
+
+    def get(self, name):
+        """獲取單個特徵，必要時先計算其依賴"""
+        if name not in self._values:
+            for node in resolve([name]):
+                if node not in self._values:
+                    self._values[node] = _FEATURES[node][1](self)
+        return self._values[name]
+
+    def compute(self, names):
+        """計算一組特徵，返回 {名稱: 值}"""
+        return {name: self.get(name) for name in names}
+
+    def computed(self):
+        """已計算的節點名稱（用於調試和測量）"""
+        return list(self._values)
+
+
+# ---- 共享中間結果 ----
+
+@feature('stft')
+def _stft(engine):
+    return np.abs(librosa.stft(engine.y, n_fft=engine.n_fft, hop_length=engine.hop_length))
+
+
+@feature('power', requires=('stft',))
+def _power(engine):
+    return engine.get('stft') ** 2
+
+
+@feature('mel_db', requires=('power',))
+def _mel_db(engine):
+    mel = librosa.feature.melspectrogram(S=engine.get('power'), sr=engine.sr)
+    return librosa.power_to_db(mel)
+
+
+@feature('onset_env', requires=('mel_db',))
+def _onset_env(engine):
+    return librosa.onset.onset_strength(S=engine.get('mel_db'), sr=engine.sr)
+
+
+@feature('beat_env', requires=('mel_db',))
+def _beat_env(engine):
+    # librosa 的節拍跟蹤默認用頻帶中位數聚合起始點強度
+    return librosa.onset.onset_strength(S=engine.get('mel_db'), sr=engine.sr, aggregate=np.median)
+
+
+# ---- 對外特徵 ----
+
+@feature('duration')
+def _duration(engine):
+    return librosa.get_duration(y=engine.y, sr=engine.sr)
+
+
+@feature('beat_track', requires=('beat_env',))
+def _beat_track(engine):
+    tempo, beats = librosa.beat.beat_track(
+        onset_envelope=engine.get('beat_env'), sr=engine.sr, hop_length=engine.hop_length
+    )
+    return float(np.atleast_1d(tempo)[0]), beats
+
+
+@feature('tempo', requires=('beat_track',))
+def _tempo(engine):
+    return engine.get('beat_track')[0]
+
+
+@feature('beats', requires=('beat_track',))
+def _beats(engine):
+    return engine.get('beat_track')[1]
+
+
+@feature('onset_frames', requires=('onset_env',))
+def _onset_frames(engine):
+    return librosa.onset.onset_detect(
+        onset_envelope=engine.get('onset_env'), sr=engine.sr, hop_length=engine.hop_length
+    )
+
+
+@feature('tuning', requires=('power',))
+def _tuning(engine):
+    # 與 chroma_stft 未指定 tuning 時的內部估計相同；流式分析時由調用方傳入整條音頻共用的值
+    return librosa.estimate_tuning(S=engine.get('power'), sr=engine.sr, bins_per_octave=12)
+
+
+@feature('chromagram', requires=('power', 'tuning'))
+def _chromagram(engine):
+    return librosa.feature.chroma_stft(
+        S=engine.get('power'), sr=engine.sr, n_fft=engine.n_fft, hop_length=engine.hop_length,
+        tuning=engine.get('tuning')
+    )
+
+
+@feature('mfcc', requires=('mel_db',))
+def _mfcc(engine):
+    return librosa.feature.mfcc(S=engine.get('mel_db'), sr=engine.sr)
+
+
+@feature('key', requires=('chromagram',))
+def _key(engine):
+    return estimate_key(engine.get('chromagram'))
+
+
+def estimate_key(chromagram):
+    """用色度均值與大小調輪廓的相關係數估計調性，返回如 'A minor' 的字符串"""
+    profile = np.asarray(chromagram).mean(axis=1)
+    if not np.any(profile):
+        return 'C major'
+
+    best_score = -np.inf
+    best_key = 'C major'
+    for mode, template in (('major', MAJOR_PROFILE), ('minor', MINOR_PROFILE)):
+        for tonic in range(12):
+            score = np.corrcoef(profile, np.roll(template, tonic))[0, 1]
+            if score > best_score:
+                best_score = score
+                best_key = f'{PITCH_NAMES[tonic]} {mode}'
+    return best_key
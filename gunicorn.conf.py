@@ -0,0 +1,25 @@
+"""
+gunicorn 配置：gunicorn -c gunicorn.conf.py app:app
+主進程預加載應用並預熱分析流程，fork 出的 worker（及其分析進程池）直接繼承
+已導入的 librosa 子模塊和已編譯的 numba 函數，擴容或重新部署後首個上傳不再變慢
+"""
+
+import os
+
+# 未顯式關閉時默認預熱
+os.environ.setdefault('ANALYSIS_WARMUP', '1')
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+preload_app = True
+
+
+def when_ready(server):
+    """應用已在主進程加載、worker 尚未 fork 時預熱"""
+    import app
+
+    if app.ANALYSIS_WARMUP:
+        elapsed = app.warm_up()
+        server.log.info('分析流程預熱完成，耗時 %.1f 秒', elapsed)
@@ -0,0 +1,375 @@
+"""
+音頻分析任務隊列
+任務狀態保存在本地 SQLite 中，服務重啟後輸入仍在磁盤上的未完成任務會被重新排隊；
+分析在有上限的進程池中執行，不依賴外部消息代理
+
+任務輸入可以是文件路徑，也可以是直接傳給工作進程的文件內容（bytes）。
+後者不落盤，但服務重啟時尚未完成的此類任務會被標記為失敗，需要重新上傳。
+結束的任務在 job_ttl 秒後刪除，其部分結果（SSE 事件）在結束 PARTS_TTL 秒後即刪除
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import fast_json
+
+# 任務狀態
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+PENDING_STATUSES = (STATUS_QUEUED, STATUS_RUNNING)
+FINISHED_STATUSES = (STATUS_DONE, STATUS_FAILED)
+
+# 任務結束後部分結果保留的秒數：留給已連接的 SSE 客戶端讀完，之後客戶端應讀取完整結果
+PARTS_TTL = 60
+
+# 清理過期任務的最短間隔（秒）
+PRUNE_INTERVAL = 60
+
+_SCHEMA = ("""
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    stage TEXT,
+    progress REAL NOT NULL DEFAULT 0,
+    source_path TEXT,
+    params TEXT,
+    owner TEXT,
+    error TEXT,
+    result TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+)
+""", """
+CREATE TABLE IF NOT EXISTS job_parts (
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    event TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (job_id, seq)
+)
+""")
+
+
+def _owner_id():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def _owner_alive(owner):
+    """判斷提交任務的進程是否仍在運行（僅限同一主機）"""
+    if not owner:
+        return False
+    host, _, pid = owner.rpartition(':')
+    if host != socket.gethostname():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except (ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobStore:
+    """基於 SQLite 的任務狀態存儲"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            for statement in _SCHEMA:
+                conn.execute(statement)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def create(self, job_id, source_path, params, owner):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT INTO jobs (id, status, stage, progress, source_path, params, owner, created_at, updated_at) '
+                'VALUES (?, ?, ?, 0, ?, ?, ?, ?, ?)',
+                (job_id, STATUS_QUEUED, 'queued', source_path, json.dumps(params), owner, now, now)
+            )
+
+    def update(self, job_id, **fields):
+        fields['updated_at'] = time.time()
+        columns = ', '.join(f'{name} = ?' for name in fields)
+        with self._connect() as conn:
+            conn.execute(f'UPDATE jobs SET {columns} WHERE id = ?', (*fields.values(), job_id))
+
+    def claim(self, job_id, old_owner, new_owner):
+        """以比較並交換的方式接管任務，防止多個進程重複恢復同一任務"""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                'UPDATE jobs SET owner = ?, status = ?, updated_at = ? WHERE id = ? AND owner IS ?',
+                (new_owner, STATUS_QUEUED, time.time(), job_id, old_owner)
+            )
+            return cursor.rowcount == 1
+
+    def get(self, job_id, with_result=False):
+        columns = '*' if with_result else \
+            'id, status, stage, progress, source_path, params, owner, error, created_at, updated_at'
+        with self._connect() as conn:
+            row = conn.execute(f'SELECT {columns} FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['params'] = json.loads(job['params']) if job['params'] else {}
+        if with_result and job.get('result') is not None:
+            job['result'] = fast_json.loads(job['result'])
+        return job
+
+    def add_part(self, job_id, event, data):
+        """追加一條部分結果，返回其序號"""
+        with self._connect() as conn:
+            row = conn.execute('SELECT COALESCE(MAX(seq), 0) FROM job_parts WHERE job_id = ?', (job_id,)).fetchone()
+            seq = row[0] + 1
+            conn.execute(
+                'INSERT INTO job_parts (job_id, seq, event, data) VALUES (?, ?, ?, ?)',
+                (job_id, seq, event, fast_json.dumps(data).decode('utf-8'))
+            )
+        return seq
+
+    def parts(self, job_id, after=0):
+        """返回序號大於 after 的部分結果 [(seq, event, data_json)]"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                'SELECT seq, event, data FROM job_parts WHERE job_id = ? AND seq > ? ORDER BY seq',
+                (job_id, after)
+            ).fetchall()
+        return [(row['seq'], row['event'], row['data']) for row in rows]
+
+    def clear_parts(self, job_id):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM job_parts WHERE job_id = ?', (job_id,))
+
+    def prune(self, jobs_before, parts_before):
+        """
+        刪除在 jobs_before 之前結束的任務，以及在 parts_before 之前結束的任務的部分結果
+        （parts_before 應不早於 jobs_before），返回刪除的任務數
+        """
+        with self._connect() as conn:
+            conn.execute(
+                'DELETE FROM job_parts WHERE job_id IN '
+                '(SELECT id FROM jobs WHERE status IN (?, ?) AND updated_at < ?)',
+                (*FINISHED_STATUSES, parts_before)
+            )
+            cursor = conn.execute(
+                'DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?',
+                (*FINISHED_STATUSES, jobs_before)
+            )
+            return cursor.rowcount
+
+    def pending(self):
+        with self._connect() as conn:
+            rows = conn.execute(
+                'SELECT id, source_path, params, owner FROM jobs WHERE status IN (?, ?) ORDER BY created_at',
+                PENDING_STATUSES
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def count_pending(self):
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)', PENDING_STATUSES
+            ).fetchone()
+        return row[0]
+
+
+def _remove_source(source):
+    if isinstance(source, str) and os.path.exists(source):
+        os.remove(source)
+
+
+def _run_job(handler, summarize, db_path, job_id, source, params):
+    """
+    在工作進程中執行單個任務，返回交給提交進程的結果概要：
+    {'status', 'error'（異常類名）, 'stages'（各階段耗時秒數）, 'result_bytes', 'summary'}
+    """
+    store = JobStore(db_path)
+    store.update(job_id, status=STATUS_RUNNING, stage='load', progress=0.0)
+
+    # 以 report 切換階段的時間點劃分各階段耗時，最後一個階段在 handler 返回時結束
+    stages = {}
+    current = ['load', time.perf_counter()]
+
+    def close_stage(now):
+        stages[current[0]] = stages.get(current[0], 0.0) + now - current[1]
+
+    def report(stage, progress):
+        if stage != current[0]:
+            now = time.perf_counter()
+            close_stage(now)
+            current[:] = [stage, now]
+        store.update(job_id, stage=stage, progress=float(progress))
+
+    def publish(event, data):
+        store.add_part(job_id, event, data)
+
+    try:
+        result = handler(source, params, report, publish)
+    except Exception as e:
+        close_stage(time.perf_counter())
+        store.update(job_id, status=STATUS_FAILED, stage='failed', error=str(e))
+        return {'status': STATUS_FAILED, 'error': type(e).__name__, 'stages': stages,
+                'result_bytes': 0, 'summary': None}
+    finally:
+        _remove_source(source)
+
+    close_stage(time.perf_counter())
+    encoded = fast_json.dumps(result)
+    store.update(job_id, status=STATUS_DONE, stage='done', progress=1.0, result=encoded.decode('utf-8'))
+    return {'status': STATUS_DONE, 'error': None, 'stages': stages,
+            'result_bytes': len(encoded),
+            'summary': summarize(result) if summarize else None}
+
+
+class JobQueue:
+    """任務隊列：負責持久化任務並分發到進程池"""
+
+    def __init__(self, db_path, spool_dir, handler, max_workers=2, max_pending=64, initializer=None,
+                 summarize=None, on_finished=None, job_ttl=24 * 3600):
+        """
+        handler 必須是模塊級函數（可被 pickle），簽名為 handler(source, params, report, publish)，
+        source 為文件路徑或文件內容；report(stage, progress) 匯報進度，
+        publish(event, data) 發布可供客戶端提前使用的部分結果；返回可 JSON 序列化的結果。
+        initializer 在每個工作進程啟動時調用一次（例如預熱分析流程）。
+        summarize(result) 在工作進程中把結果概括為小字典（同樣須可 pickle），
+        任務結束後在提交進程中調用 on_finished(job_id, params, outcome)，outcome 見 _run_job。
+        結束超過 job_ttl 秒的任務（含結果）會被刪除
+        """
+        self.db_path = db_path
+        self.spool_dir = spool_dir
+        self.handler = handler
+        self.initializer = initializer
+        self.summarize = summarize
+        self.on_finished = on_finished
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.job_ttl = job_ttl
+        self.owner = _owner_id()
+        self.store = JobStore(db_path)
+        self._executor = None
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+
+        if not os.path.exists(self.spool_dir):
+            os.makedirs(self.spool_dir, exist_ok=True)
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                     initializer=self.initializer)
+            return self._executor
+
+    def spool_path(self, job_id, extension):
+        """任務輸入文件的暫存路徑（以任務 ID 命名，避免並發上傳互相覆蓋）"""
+        return os.path.join(self.spool_dir, f'{job_id}.{extension}')
+
+    def new_job_id(self):
+        return uuid.uuid4().hex
+
+    def is_full(self):
+        return self.store.count_pending() >= self.max_pending
+
+    def submit(self, job_id, source, params=None):
+        """登記並提交任務，source 為文件路徑或文件內容"""
+        params = params or {}
+        self.prune()
+        source_path = source if isinstance(source, str) else None
+        self.store.create(job_id, source_path, params, self.owner)
+        self._dispatch(job_id, source, params)
+        return job_id
+
+    def _dispatch(self, job_id, source, params):
+        try:
+            future = self._get_executor().submit(
+                _run_job, self.handler, self.summarize, self.db_path, job_id, source, params
+            )
+        except BrokenProcessPool:
+            # 進程池損壞（例如工作進程被 OOM 殺死），重建後重試一次
+            with self._lock:
+                self._executor = None
+            future = self._get_executor().submit(
+                _run_job, self.handler, self.summarize, self.db_path, job_id, source, params
+            )
+        source_path = source if isinstance(source, str) else None
+        future.add_done_callback(lambda f: self._on_done(job_id, source_path, params, f))
+
+    def _on_done(self, job_id, source_path, params, future):
+        """工作進程異常退出時，把任務標記為失敗；隨後把結果概要交給 on_finished"""
+        error = future.exception()
+        if error is None:
+            outcome = future.result()
+        else:
+            if isinstance(error, BrokenProcessPool):
+                with self._lock:
+                    self._executor = None
+            self.store.update(job_id, status=STATUS_FAILED, stage='failed', error=f'工作進程異常退出: {error}')
+            _remove_source(source_path)
+            outcome = {'status': STATUS_FAILED, 'error': type(error).__name__, 'stages': {},
+                       'result_bytes': 0, 'summary': None}
+
+        if self.on_finished is not None:
+            self.on_finished(job_id, params, outcome)
+
+    def prune(self, force=False):
+        """刪除過期的已結束任務與部分結果（兩次清理至少間隔 PRUNE_INTERVAL 秒），返回刪除的任務數"""
+        now = time.time()
+        with self._lock:
+            if not force and now - self._last_prune < PRUNE_INTERVAL:
+                return 0
+            self._last_prune = now
+        return self.store.prune(now - self.job_ttl, now - PARTS_TTL)
+
+    def recover(self):
+        """重新排隊提交進程已退出的未完成任務，返回恢復的任務數"""
+        self.prune(force=True)
+        recovered = 0
+        for job in self.store.pending():
+            if job['owner'] == self.owner or _owner_alive(job['owner']):
+                continue
+            if not self.store.claim(job['id'], job['owner'], self.owner):
+                continue
+            source_path = job['source_path']
+            if not source_path or not os.path.exists(source_path):
+                self.store.update(job['id'], status=STATUS_FAILED, stage='failed', error='服務重啟時任務輸入已丟失，請重新上傳')
+                continue
+            params = json.loads(job['params']) if job['params'] else {}
+            self.store.clear_parts(job['id'])
+            self.store.update(job['id'], stage='queued', progress=0.0)
+            self._dispatch(job['id'], source_path, params)
+            recovered += 1
+        return recovered
+
+    def get(self, job_id, with_result=False):
+        return self.store.get(job_id, with_result=with_result)
+
+    def parts(self, job_id, after=0):
+        return self.store.parts(job_id, after)
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
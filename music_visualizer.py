@@ -1,7 +1,6 @@
 import tkinter as tk
-from tkinter import filedialog, messagebox
+from tkinter import filedialog, messagebox, ttk
 import pygame
-import librosa
 import numpy as np
 import threading
 import time
@@ -10,6 +9,30 @@ from scipy.signal import find_peaks
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import matplotlib.animation as animation
+from matplotlib.colors import to_rgba_array
+from note_renderer import NoteRenderer, draw_piano_keyboard
+from note_particles import NoteParticles
+import background_analysis
+from background_analysis import BackgroundAnalysis, STAGE_NAMES
+from analysis_sidecar import AnalysisSidecar
+
+# 音符颜色
+NOTE_COLORS = to_rgba_array(['purple', 'green', 'yellow', 'cyan', 'magenta'])
+
+# 动画帧间隔（毫秒，约 60 FPS）
+FRAME_INTERVAL = 16
+
+# 音符速度按原 50ms 一帧定义，换算到实际帧间隔，保持下落速度不变
+SPEED_SCALE = FRAME_INTERVAL / 50.0
+
+# 每隔多少帧生成一个音符（约 0.5 秒）
+NOTE_SPAWN_FRAMES = 30
+
+# 轮询后台分析结果的间隔（毫秒）
+ANALYSIS_POLL_INTERVAL = 100
+
+# 本界面只用到时长与节拍
+ANALYSIS_FIELDS = ('duration', 'tempo', 'beats')
 
 class MusicVisualizer:
     def __init__(self, root):
@@ -24,6 +47,13 @@ class MusicVisualizer:
         self.sr = None
         self.is_playing = False
         self.current_position = 0
+        self.audio_data = None
+        
+        # 后台分析任务
+        self.analysis = None
+        
+        # 分析结果缓存，再次打开同一文件时直接读取
+        self.sidecar = AnalysisSidecar()
         
         # 初始化pygame mixer
         pygame.mixer.init()
@@ -87,7 +117,22 @@ class MusicVisualizer:
             pady=10,
             state=tk.DISABLED
         )
-        self.stop_btn.pack(side=tk.10, padx=10)
+        self.stop_btn.pack(side=tk.LEFT, padx=10)
+        
+        # 取消分析按钮
+        self.cancel_btn = tk.Button(
+            control_frame,
+            text="取消分析",
+            command=self.cancel_analysis,
+            font=("Arial", 14),
+            bg="#FF9800",
+            fg="white",
+            relief="flat",
+            padx=20,
+            pady=10,
+            state=tk.DISABLED
+        )
+        self.cancel_btn.pack(side=tk.LEFT, padx=10)
         
         # 文件信息标签
         self.file_label = tk.Label(
@@ -99,6 +144,16 @@ class MusicVisualizer:
         )
         self.file_label.pack(pady=10)
         
+        # 分析进度
+        progress_frame = tk.Frame(self.root, bg="black")
+        progress_frame.pack()
+        
+        self.progress_label = tk.Label(progress_frame, text="", fg="white", bg="black")
+        self.progress_label.pack(side=tk.LEFT, padx=10)
+        
+        self.progress_bar = ttk.Progressbar(progress_frame, length=200, maximum=1.0)
+        self.progress_bar.pack(side=tk.LEFT, padx=10)
+        
         # 可视化画布
         self.canvas_frame = tk.Frame(self.root, bg="black")
         self.canvas_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
@@ -120,31 +175,17 @@ class MusicVisualizer:
         self.draw_piano_keyboard()
         
         # 音符列表
-        self.notes = []
+        self.notes = NoteParticles()
+        
+        # 音符渲染器（键盘保留在背景中，只重绘音符集合）
+        self.note_renderer = NoteRenderer(self.ax)
         
         # 动画
         self.ani = None
         
     def draw_piano_keyboard(self):
         """绘制钢琴键盘"""
-        # 白键
-        white_keys = [0, 2, 4, 5, 7, 9, 11, 12, 14, 16, 17, 19, 21, 23, 24, 26, 28, 29, 31, 33, 35, 36, 38, 40, 41, 43, 45, 47, 48, 50, 52, 53, 55, 57, 59, 60, 62, 64, 65, 67, 69, 71, 72, 74, 76, 77, 79, 81, 83, 84, 86, 88]
-        
-        for key in white_keys:
-            if key <= 88:
-                x = key
-                rect = plt.Rectangle((x-0.4, 0), 0.8, 20, facecolor='white', edgecolor='black', linewidth=1)
-                self.ax.add_patch(rect)
-        
-        # 黑键
-        black_keys = [1, 3, 6, 8, 10, 13, 15, 18, 20, 22, 25, 27, 30, 32, 34, 37, 39, 42, 44, 46, 49, 51, 54, 56, 58, 61, 63, 66, 68, 70, 73, 75, 78, 80, 82, 85, 87]
-        
-        for key in black_keys:
-            if key <= 88:
-                x = key
-                rect = plt.Rectangle((x-0.25, 12), 0.5, 8, facecolor='black', edgecolor='white', linewidth=1)
-                self.ax.add_patch(rect)
-        
+        draw_piano_keyboard(self.ax)
         self.canvas.draw()
         
     def upload_music(self):
@@ -162,48 +203,84 @@ class MusicVisualizer:
         
         if file_path:
             try:
+                # 换文件时先停止播放和上一次分析
+                if self.is_playing:
+                    self.stop_music()
                 self.audio_file = file_path
                 self.file_label.config(text=f"已选择: {os.path.basename(file_path)}")
                 
-                # 分析音频
+                # 在后台分析音频，解码完成后即可播放
                 self.analyze_audio()
                 
-                # 启用播放按钮
-                self.play_btn.config(state=tk.NORMAL)
-                self.stop_btn.config(state=tk.NORMAL)
-                
             except Exception as e:
                 messagebox.showerror("错误", f"无法加载音频文件: {str(e)}")
                 
     def analyze_audio(self):
-        """分析音频文件"""
-        try:
-            # 加载音频
-            self.y, self.sr = librosa.load(self.audio_file, sr=None)
-            
-            # 获取音频长度
-            duration = librosa.get_duration(y=self.y, sr=self.sr)
+        """在后台线程中分析音频文件"""
+        if self.analysis:
+            self.analysis.cancel()
             
-            # 提取节拍
-            tempo, beats = librosa.beat.beat_track(y=self.y, sr=self.sr)
-            
-            # 提取频谱
-            D = librosa.stft(self.y)
-            frequencies = librosa.fft_frequencies(sr=self.sr)
-            
-            # 存储分析结果
-            self.audio_data = {
-                'duration': duration,
-                'tempo': tempo,
-                'beats': beats,
-                'frequencies': frequencies,
-                'spectrogram': np.abs(D)
-            }
+        self.y = None
+        self.sr = None
+        self.audio_data = {}
+        self.play_btn.config(state=tk.DISABLED)
+        self.stop_btn.config(state=tk.DISABLED)
+        self.cancel_btn.config(state=tk.NORMAL)
+        
+        self.analysis = BackgroundAnalysis(
+            self.audio_file, fields=ANALYSIS_FIELDS, sidecar=self.sidecar, need_signal=False
+        ).start()
+        self.root.after(ANALYSIS_POLL_INTERVAL, self.poll_analysis, self.analysis)
+        
+    def cancel_analysis(self):
+        """取消后台分析"""
+        if self.analysis:
+            self.analysis.cancel()
+            self.cancel_btn.config(state=tk.DISABLED)
+            self.progress_label.config(text="正在取消...")
             
-            messagebox.showinfo("成功", f"音频分析完成！\n时长: {duration:.2f}秒\n节拍: {tempo:.1f} BPM")
+    def poll_analysis(self, analysis):
+        """取出后台分析的进度与阶段结果"""
+        # 已被新的分析任务替换
+        if analysis is not self.analysis:
+            return
             
-        except Exception as e:
-            messagebox.showerror("错误", f"音频分析失败: {str(e)}")
+        for event in analysis.poll():
+            kind = event[0]
+            if kind == background_analysis.EVENT_PROGRESS:
+                _, stage, progress = event
+                self.progress_bar['value'] = progress
+                self.progress_label.config(text=f"{STAGE_NAMES.get(stage, stage)}...")
+            elif kind == background_analysis.EVENT_AUDIO:
+                _, self.sr, _ = event
+                # 解码完成（或命中缓存）即可播放
+                self.play_btn.config(state=tk.NORMAL)
+                self.stop_btn.config(state=tk.NORMAL)
+            elif kind == background_analysis.EVENT_SIGNAL:
+                self.y = event[1]
+            elif kind == background_analysis.EVENT_FEATURES:
+                self.audio_data.update(event[2])
+            else:
+                self.finish_analysis(event)
+                return
+                
+        self.root.after(ANALYSIS_POLL_INTERVAL, self.poll_analysis, analysis)
+        
+    def finish_analysis(self, event):
+        """后台分析结束（完成、取消或失败）"""
+        kind = event[0]
+        self.analysis = None
+        self.cancel_btn.config(state=tk.DISABLED)
+        
+        if kind == background_analysis.EVENT_DONE:
+            duration = self.audio_data['duration']
+            tempo = self.audio_data['tempo']
+            self.progress_label.config(text=f"分析完成  时长: {duration:.2f}秒  节拍: {tempo:.1f} BPM")
+        elif kind == background_analysis.EVENT_CANCELLED:
+            self.progress_label.config(text="已取消分析")
+        else:
+            self.progress_label.config(text="")
+            messagebox.showerror("错误", f"音频分析失败: {event[1]}")
             
     def toggle_play(self):
         """播放/暂停音乐"""
@@ -246,10 +323,9 @@ class MusicVisualizer:
         if self.ani:
             self.ani.event_source.stop()
             
-        # 清除音符
+        # 清除音符（保留键盘与坐标轴设置）
         self.notes.clear()
-        self.ax.clear()
-        self.draw_piano_keyboard()
+        self.note_renderer.clear()
         self.canvas.draw()
         
     def start_visualization(self):
@@ -260,27 +336,25 @@ class MusicVisualizer:
         self.ani = animation.FuncAnimation(
             self.fig, 
             self.update_visualization, 
-            interval=50,  # 20 FPS
-            blit=False
+            interval=FRAME_INTERVAL,
+            blit=True,
+            cache_frame_data=False
         )
         
     def update_visualization(self, frame):
         """更新可视化效果"""
         if not self.is_playing:
-            return
+            return []
             
         # 获取当前播放位置
         current_time = pygame.mixer.music.get_pos() / 1000.0
         
         # 根据时间生成音符
-        if frame % 10 == 0:  # 每10帧生成一个音符
+        if frame % NOTE_SPAWN_FRAMES == 0:
             self.generate_note(current_time)
             
-        # 更新音符位置
-        self.update_notes()
-        
-        # 重绘画布
-        self.canvas.draw()
+        # 更新音符位置，只返回音符集合，由动画在缓存的背景上重绘
+        return self.update_notes()
         
     def generate_note(self, current_time):
         """生成音符"""
@@ -288,49 +362,24 @@ class MusicVisualizer:
         key_position = np.random.randint(0, 88)
         
         # 随机选择颜色
-        colors = ['purple', 'green', 'yellow', 'cyan', 'magenta']
-        color = np.random.choice(colors)
+        color = NOTE_COLORS[np.random.randint(len(NOTE_COLORS))]
         
         # 创建音符
-        note = {
-            'x': key_position,
-            'y': 100,  # 从顶部开始
-            'color': color,
-            'size': np.random.uniform(0.3, 0.8),
-            'speed': np.random.uniform(1, 3)
-        }
-        
-        self.notes.append(note)
+        self.notes.spawn(
+            x=key_position,
+            y=100,  # 从顶部开始
+            speed=np.random.uniform(1, 3),
+            size=np.random.uniform(0.3, 0.8),
+            rgba=color
+        )
         
     def update_notes(self):
         """更新音符位置"""
-        # 清除之前的音符
-        for artist in self.ax.texts + self.ax.patches:
-            if hasattr(artist, '_note'):
-                artist.remove()
-                
-        # 更新音符位置
-        notes_to_remove = []
-        for note in self.notes:
-            note['y'] -= note['speed']
-            
-            # 绘制音符
-            circle = plt.Circle((note['x'], note['y']), note['size'], 
-                              color=note['color'], alpha=0.8)
-            circle._note = True
-            self.ax.add_patch(circle)
-            
-            # 如果音符到达键盘，标记为删除
-            if note['y'] <= 20:
-                notes_to_remove.append(note)
-                
-        # 删除到达键盘的音符
-        for note in notes_to_remove:
-            self.notes.remove(note)
-            
-        # 限制音符数量
-        if len(self.notes) > 50:
-            self.notes = self.notes[-50:]
+        # 整体下落并释放到达键盘的音符
+        visible = self.notes.step(SPEED_SCALE)
+        
+        # 所有音符由渲染器的集合一次绘制
+        return self.note_renderer.update_particles(self.notes, visible)
 
 def main():
     root = tk.Tk()
@@ -0,0 +1,80 @@
+"""
+落下音符的粒子存储
+以结构数组（每个属性一个 NumPy 数组）保存全部音符，配合存活掩码复用空槽；
+移动、到达键盘后的剔除和批量生成都是向量化操作，每帧开销与 Python 对象数量无关
+"""
+
+import numpy as np
+
+# 音符类型
+KIND_NOTE = 0
+KIND_BEAT = 1
+
+
+class NoteParticles:
+    """容量固定、满时按倍数扩容的音符粒子存储"""
+
+    def __init__(self, capacity=1024, floor=20.0):
+        self.floor = floor
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        self.x = np.zeros(capacity)
+        self.y = np.zeros(capacity)
+        self.speed = np.zeros(capacity)
+        self.size = np.zeros(capacity)
+        self.rgba = np.zeros((capacity, 4))
+        self.kind = np.zeros(capacity, dtype=np.uint8)
+        self.live = np.zeros(capacity, dtype=bool)
+
+    @property
+    def capacity(self):
+        return len(self.live)
+
+    def __len__(self):
+        return int(np.count_nonzero(self.live))
+
+    def _grow(self, needed):
+        capacity = self.capacity
+        while capacity < needed:
+            capacity *= 2
+
+        old = (self.x, self.y, self.speed, self.size, self.rgba, self.kind, self.live)
+        count = len(self.live)
+        self._allocate(capacity)
+        for new_array, old_array in zip(
+            (self.x, self.y, self.speed, self.size, self.rgba, self.kind, self.live), old
+        ):
+            new_array[:count] = old_array
+
+    def spawn(self, x, y, speed, size, rgba, kind=KIND_NOTE):
+        """批量生成音符，参数可以是标量或等长数组，rgba 为 (n, 4) 或单个颜色"""
+        x = np.atleast_1d(np.asarray(x, dtype=float))
+        count = len(x)
+        if count == 0:
+            return
+
+        free = np.flatnonzero(~self.live)
+        if len(free) < count:
+            self._grow(len(self) + count)
+            free = np.flatnonzero(~self.live)
+        slots = free[:count]
+
+        self.x[slots] = x
+        self.y[slots] = y
+        self.speed[slots] = speed
+        self.size[slots] = size
+        self.rgba[slots] = rgba
+        self.kind[slots] = kind
+        self.live[slots] = True
+
+    def step(self, scale=1.0):
+        """所有存活音符下落一帧，返回本帧需要绘制的槽位（含刚到达键盘的音符）"""
+        self.y[self.live] -= self.speed[self.live] * scale
+        visible = np.flatnonzero(self.live)
+        # 到达键盘的音符绘制最后一帧后释放槽位
+        self.live &= self.y > self.floor
+        return visible
+
+    def clear(self):
+        self.live[:] = False
@@ -0,0 +1,101 @@
+"""
+落下音符的保留式渲染器
+所有音符由两个可复用的集合对象绘制（普通音符用 EllipseCollection，节拍音符用星形 PathCollection），
+每帧只更新位置、大小和颜色；两个集合都标记为 animated，
+配合 FuncAnimation(blit=True) 只重绘动态部分，静态的钢琴键盘保留在缓存的背景中
+"""
+
+import numpy as np
+from matplotlib.collections import EllipseCollection
+from matplotlib.colors import to_rgba_array
+from matplotlib.patches import Rectangle
+
+from note_particles import KIND_BEAT
+
+
+# 88 键钢琴键盘中白键与黑键的位置
+WHITE_KEYS = [0, 2, 4, 5, 7, 9, 11, 12, 14, 16, 17, 19, 21, 23, 24, 26, 28, 29, 31, 33, 35, 36, 38, 40, 41, 43, 45, 47, 48, 50, 52, 53, 55, 57, 59, 60, 62, 64, 65, 67, 69, 71, 72, 74, 76, 77, 79, 81, 83, 84, 86, 88]
+BLACK_KEYS = [1, 3, 6, 8, 10, 13, 15, 18, 20, 22, 25, 27, 30, 32, 34, 37, 39, 42, 44, 46, 49, 51, 54, 56, 58, 61, 63, 66, 68, 70, 73, 75, 78, 80, 82, 85, 87]
+
+
+def draw_piano_keyboard(ax):
+    """在坐标轴底部绘制静态的钢琴键盘"""
+    for x in WHITE_KEYS:
+        ax.add_patch(Rectangle((x-0.4, 0), 0.8, 20, facecolor='white', edgecolor='black', linewidth=1))
+    for x in BLACK_KEYS:
+        ax.add_patch(Rectangle((x-0.25, 12), 0.5, 8, facecolor='black', edgecolor='white', linewidth=1))
+
+
+class NoteRenderer:
+    """用固定的两个集合对象绘制任意数量的音符"""
+
+    def __init__(self, ax, alpha=0.8, beat_alpha=0.9):
+        self.ax = ax
+        self.alpha = alpha
+        self.beat_alpha = beat_alpha
+
+        # 普通音符：圆形，宽高以数据坐标为单位
+        self.circles = EllipseCollection(
+            [], [], [],
+            units='xy',
+            offsets=np.empty((0, 2)),
+            offset_transform=ax.transData,
+            animated=True
+        )
+        ax.add_collection(self.circles)
+
+        # 节拍音符：星形，scatter 的大小以点²为单位，每帧按坐标比例换算
+        self.stars = ax.scatter([], [], marker='*', animated=True)
+
+    def artists(self):
+        return [self.circles, self.stars]
+
+    def _points_per_unit(self):
+        """数据坐标中 1 个单位对应的点数"""
+        pixels = self.ax.transData.transform([(0, 0), (1, 0)])
+        return abs(pixels[1, 0] - pixels[0, 0]) * 72.0 / self.ax.figure.dpi
+
+    def update(self, x, y, size, colors, is_beat=None):
+        """
+        按数组更新全部音符，返回需要重绘的 artist 列表
+        size 为半径（数据坐标），colors 为颜色名、RGB 或 RGBA 序列
+        """
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        size = np.asarray(size, dtype=float)
+        rgba = to_rgba_array(colors) if len(x) else np.empty((0, 4))
+        if is_beat is None:
+            is_beat = np.zeros(len(x), dtype=bool)
+        is_beat = np.asarray(is_beat, dtype=bool)
+
+        circle = ~is_beat
+        circle_rgba = rgba[circle].copy()
+        circle_rgba[:, 3] = self.alpha
+        self.circles.set_offsets(np.column_stack([x[circle], y[circle]]))
+        self.circles.set_widths(2 * size[circle])
+        self.circles.set_heights(2 * size[circle])
+        self.circles.set_angles(np.zeros(np.count_nonzero(circle)))
+        self.circles.set_facecolor(circle_rgba)
+
+        star_rgba = rgba[is_beat].copy()
+        star_rgba[:, 3] = self.beat_alpha
+        self.stars.set_offsets(np.column_stack([x[is_beat], y[is_beat]]))
+        self.stars.set_sizes((2 * size[is_beat] * self._points_per_unit()) ** 2)
+        self.stars.set_facecolor(star_rgba)
+        self.stars.set_edgecolor('none')
+
+        return self.artists()
+
+    def update_particles(self, particles, slots):
+        """按 NoteParticles 中指定槽位的音符更新"""
+        return self.update(
+            particles.x[slots],
+            particles.y[slots],
+            particles.size[slots],
+            particles.rgba[slots],
+            particles.kind[slots] == KIND_BEAT
+        )
+
+    def clear(self):
+        """清空所有音符"""
+        return self.update([], [], [], [])
@@ -0,0 +1,83 @@
+"""
+分析結果的緊湊編碼
+把色度圖、MFCC 等大矩陣量化後以 base64 二進制塊傳輸，並附帶形狀與數據類型，
+客戶端按 dtype/shape 還原（uint8 需按 min + value * scale 反量化）；
+仍使用 JSON 數組的客戶端可以只對這些矩陣按小數位數取整，縮短數字文本
+"""
+
+import base64
+
+import numpy as np
+
+COMPACT_MIMETYPE = 'application/vnd.seemusic.compact+json'
+
+# 需要緊湊編碼的字段及量化方式
+COMPACT_FIELDS = {
+    ('audio_data', 'chromagram'): 'uint8',
+    ('audio_data', 'mfcc'): 'float16',
+    ('visualization', 'spectrum_data'): 'uint8'
+}
+
+
+def wants_compact(request):
+    """根據查詢參數或 Accept 頭判斷客戶端是否需要緊湊格式"""
+    if request.args.get('format') == 'compact':
+        return True
+    # 只接受顯式聲明，避免瀏覽器的 */* 意外切換到新格式
+    return COMPACT_MIMETYPE in request.accept_mimetypes.values()
+
+
+def encode_matrix(values, dtype):
+    """把矩陣編碼為帶元數據的 base64 塊"""
+    array = np.asarray(values, dtype=np.float32)
+    encoded = {
+        'encoding': 'base64',
+        'dtype': dtype,
+        'shape': list(array.shape)
+    }
+
+    if dtype == 'uint8':
+        # 線性量化到 0-255，保存反量化所需的偏移和步長
+        low = float(array.min()) if array.size else 0.0
+        high = float(array.max()) if array.size else 0.0
+        scale = (high - low) / 255.0 if high > low else 1.0
+        quantized = np.round((array - low) / scale).astype(np.uint8)
+        encoded['min'] = low
+        encoded['scale'] = scale
+        data = quantized.tobytes()
+    elif dtype == 'float16':
+        data = array.astype('<f2').tobytes()
+    else:
+        raise ValueError(f'不支持的數據類型: {dtype}')
+
+    encoded['data'] = base64.b64encode(data).decode('ascii')
+    return encoded
+
+
+def decode_matrix(encoded):
+    """還原 encode_matrix 生成的矩陣（float32）"""
+    data = base64.b64decode(encoded['data'])
+    shape = tuple(encoded['shape'])
+    if encoded['dtype'] == 'uint8':
+        quantized = np.frombuffer(data, dtype=np.uint8).reshape(shape)
+        return quantized.astype(np.float32) * encoded['scale'] + encoded['min']
+    return np.frombuffer(data, dtype='<f2').reshape(shape).astype(np.float32)
+
+
+def round_payload(payload, decimals):
+    """返回大矩陣字段取整到 decimals 位小數（NumPy 數組）後的結果副本"""
+    result = {key: (dict(value) if isinstance(value, dict) else value) for key, value in payload.items()}
+    for section, field in COMPACT_FIELDS:
+        if section in result and field in result[section]:
+            result[section][field] = np.round(np.asarray(result[section][field], dtype=np.float64), decimals)
+    return result
+
+
+def compact_payload(payload):
+    """返回大矩陣字段被緊湊編碼後的結果副本"""
+    result = {key: (dict(value) if isinstance(value, dict) else value) for key, value in payload.items()}
+    for (section, field), dtype in COMPACT_FIELDS.items():
+        if section in result and field in result[section]:
+            result[section][field] = encode_matrix(result[section][field], dtype)
+    result['format'] = 'compact'
+    return result
@@ -0,0 +1,117 @@
+"""
+單次分析的性能剖析
+用 cProfile 與 tracemalloc 包裹一次調用，把 cProfile 原始數據（可用 pstats / snakeviz 查看）
+和 JSON 摘要（最耗時的函數、分配最多的代碼行、峰值內存）寫入本地目錄；
+只有顯式開啟剖析的任務才會調用，普通請求不受影響
+"""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def _peak_rss():
+    """進程自啟動以來的峰值常駐內存（字節），平台不支持時返回 None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KiB 為單位，macOS 以字節為單位
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _top_functions(profiler, top):
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    rows = []
+    for (filename, line, name), (_, calls, own, cumulative, _) in stats.stats.items():
+        rows.append({
+            'function': f'{os.path.basename(filename)}:{line}({name})',
+            'calls': calls,
+            'self_seconds': round(own, 6),
+            'cumulative_seconds': round(cumulative, 6)
+        })
+    rows.sort(key=lambda row: -row['cumulative_seconds'])
+    return rows[:top]
+
+
+def _top_allocations(snapshot, top):
+    return [
+        {
+            'location': f'{stat.traceback[0].filename}:{stat.traceback[0].lineno}',
+            'bytes': stat.size,
+            'count': stat.count
+        }
+        for stat in snapshot.statistics('lineno')[:top]
+    ]
+
+
+def profile_call(func, output_dir, name, top=25):
+    """
+    在剖析器下調用 func()，返回 (func 的返回值, 摘要字典)；
+    原始數據寫入 output_dir/name.prof，摘要寫入 output_dir/name.json。
+    func 拋出異常時同樣寫入摘要，然後重新拋出
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    profiler = cProfile.Profile()
+    rss_before = _peak_rss()
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    error = None
+    result = None
+    profiler.enable()
+    try:
+        result = func()
+    except Exception as e:
+        error = e
+    finally:
+        profiler.disable()
+        wall = time.perf_counter() - start
+        cpu = time.process_time() - cpu_start
+        peak_traced = tracemalloc.get_traced_memory()[1]
+        snapshot = tracemalloc.take_snapshot()
+        if not tracing:
+            tracemalloc.stop()
+
+    profile_path = os.path.join(output_dir, f'{name}.prof')
+    profiler.dump_stats(profile_path)
+    summary = {
+        'name': name,
+        'wall_seconds': round(wall, 6),
+        'cpu_seconds': round(cpu, 6),
+        'error': f'{type(error).__name__}: {error}' if error else None,
+        'peak_traced_bytes': peak_traced,
+        # 進程峰值 RSS 只增不減，工作進程被復用時 before 記錄此前任務留下的峰值
+        'peak_rss_bytes': {'before': rss_before, 'after': _peak_rss()},
+        'top_functions': _top_functions(profiler, top),
+        'top_allocations': _top_allocations(snapshot, top),
+        'profile_path': profile_path
+    }
+    with open(os.path.join(output_dir, f'{name}.json'), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    if error is not None:
+        raise error
+    return result, summary
+
+
+def load_summary(output_dir, name):
+    """讀取已保存的剖析摘要，不存在時返回 None"""
+    try:
+        with open(os.path.join(output_dir, f'{name}.json'), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
@@ -0,0 +1,120 @@
+"""
+按渲染帧预先烘焙的可视化时间线
+分析结果到达后，一次性把色度、MFCC 换算到每个渲染帧（tick）上：频谱条高度、钢琴卷位置与透明度、
+各颜色方案下的颜色都保存为连续数组，播放时每帧只需按 tick 取一行；
+切换可视化模式时直接复用，切换颜色方案时只需按需烘焙一次该方案的颜色
+"""
+
+import librosa
+import numpy as np
+from matplotlib.colors import hsv_to_rgb
+
+from feature_engine import HOP_LENGTH
+
+# 颜色的饱和度与明度
+NOTE_SATURATION = 0.8
+NOTE_VALUE = 0.9
+
+# 钢琴卷只显示强度高于此值的音符
+ROLL_THRESHOLD = 0.1
+
+# 频率配色的范围（A0 到 C8）
+LOW_FREQ = 27.5
+HIGH_FREQ = 4186.0
+
+
+class RenderTimeline:
+    """以渲染帧为索引的可视化数据"""
+
+    def __init__(self, duration, sr, tick_seconds, hop_length=HOP_LENGTH):
+        self.tick_seconds = tick_seconds
+        self.n_ticks = int(np.ceil(duration / tick_seconds)) + 1
+        self.times = np.arange(self.n_ticks) * tick_seconds
+        # 每个渲染帧对应的分析帧
+        self.frames = (self.times * sr / hop_length).astype(int)
+
+        self.chroma = None
+        self.chroma_valid = None
+        self.bar_heights = None
+        self.roll_y = None
+        self.roll_alpha = None
+        self.roll_active = None
+        self.mood_hue = None
+        self._colors = {}
+
+    def tick(self, current_time):
+        """当前时间对应的渲染帧，超出音频长度时返回 None"""
+        tick = int(round(current_time / self.tick_seconds))
+        if tick < 0 or tick >= self.n_ticks:
+            return None
+        return tick
+
+    def has_chroma(self, tick):
+        return self.chroma is not None and tick is not None and bool(self.chroma_valid[tick])
+
+    def set_chromagram(self, chromagram):
+        """烘焙频谱条与钢琴卷"""
+        chromagram = np.asarray(chromagram)
+        self.chroma_valid = self.frames < chromagram.shape[1]
+        chroma = np.zeros((self.n_ticks, chromagram.shape[0]), dtype=np.float32)
+        chroma[self.chroma_valid] = chromagram[:, self.frames[self.chroma_valid]].T
+        self.chroma = chroma
+
+        self.bar_heights = chroma * 80
+        self.roll_y = 25 + chroma * 70
+        self.roll_alpha = np.clip(chroma, 0.0, 1.0)
+        self.roll_active = chroma > ROLL_THRESHOLD
+
+    def set_mfcc(self, mfcc):
+        """烘焙情绪配色使用的色相（第一个 MFCC 系数）"""
+        mfcc = np.asarray(mfcc)
+        valid = self.frames < mfcc.shape[1]
+        hue = np.full(self.n_ticks, 0.5, dtype=np.float32)  # 默认蓝色
+        hue[valid] = np.clip((mfcc[0, self.frames[valid]] + 20) / 40, 0, 1)
+        self.mood_hue = hue
+        self._colors.pop('mood_based', None)
+
+    def hues(self, scheme, note_idx, ticks):
+        """按颜色方案计算色相，note_idx 与 ticks 可以是可广播的数组"""
+        note_idx = np.asarray(note_idx, dtype=float)
+        ticks = np.asarray(ticks)
+        if scheme == "rainbow":
+            return (note_idx / 88.0 + self.times[ticks] * 0.1) % 1.0
+        if scheme == "frequency_based":
+            # 根据频率映射颜色（21 是 A0 的 MIDI 音高）
+            freq = librosa.midi_to_hz(note_idx + 21)
+            hue = (np.log10(freq) - np.log10(LOW_FREQ)) / (np.log10(HIGH_FREQ) - np.log10(LOW_FREQ))
+            return np.broadcast_to(np.clip(hue, 0, 1), np.broadcast(note_idx, ticks).shape)
+        # mood_based：根据 MFCC 特征映射颜色
+        if self.mood_hue is None:
+            return np.full(np.broadcast(note_idx, ticks).shape, 0.5)
+        return np.broadcast_to(self.mood_hue[ticks], np.broadcast(note_idx, ticks).shape)
+
+    def colors(self, scheme, note_idx, ticks):
+        """按颜色方案计算 RGB 颜色，返回形状为 广播形状 + (3,)"""
+        return _hsv_colors(self.hues(scheme, note_idx, ticks))
+
+    def chroma_colors(self, scheme):
+        """每个渲染帧 12 个音级的 RGB 颜色，形状为 (n_ticks, 12, 3)"""
+        if scheme not in self._colors:
+            self._colors[scheme] = self.colors(
+                scheme, np.arange(12)[np.newaxis, :], np.arange(self.n_ticks)[:, np.newaxis]
+            )
+        return self._colors[scheme]
+
+    def note_color(self, scheme, note_idx, current_time):
+        """单个音符在当前时间的 RGB 颜色"""
+        tick = self.tick(current_time)
+        if tick is None:
+            tick = self.n_ticks - 1
+        return tuple(self.colors(scheme, note_idx, tick))
+
+
+def _hsv_colors(hue):
+    hue = np.asarray(hue, dtype=float)
+    hsv = np.stack([
+        hue,
+        np.full_like(hue, NOTE_SATURATION),
+        np.full_like(hue, NOTE_VALUE)
+    ], axis=-1)
+    return hsv_to_rgb(hsv).astype(np.float32)
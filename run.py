@@ -7,17 +7,22 @@
 import os
 import sys
 import subprocess
+from importlib import metadata
+from importlib.util import find_spec
+
+def is_installed(lib):
+    """通过包元数据判断依赖是否安装，不实际导入（可视化器在子进程中才会导入）"""
+    try:
+        metadata.distribution(lib)
+        return True
+    except metadata.PackageNotFoundError:
+        # 没有元数据的安装方式（例如直接放在 sys.path 中）
+        return find_spec(lib) is not None
 
 def check_dependencies():
     """检查依赖是否安装"""
     required_libs = ['librosa', 'pygame', 'matplotlib', 'numpy', 'scipy']
-    missing_libs = []
-    
-    for lib in required_libs:
-        try:
-            __import__(lib)
-        except ImportError:
-            missing_libs.append(lib)
+    missing_libs = [lib for lib in required_libs if not is_installed(lib)]
     
     if missing_libs:
         print("❌ 缺少以下依赖库：")
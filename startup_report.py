@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+冷啟動耗時報告
+在乾淨的子進程中以 python -X importtime 導入應用模塊並請求一次 /health，
+匯總導入總耗時、首個 /health 響應耗時，以及累計耗時最多的模塊
+
+用法：
+    python startup_report.py            # 默認檢查 app
+    python startup_report.py app_simple --top 20
+"""
+
+import argparse
+import json
+import re
+import subprocess
+import sys
+
+_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+# 在子進程中執行：導入模塊、請求 /health，並把耗時以 JSON 輸出到 stdout
+_PROBE = '''
+import json, time
+start = time.perf_counter()
+import {module} as target
+imported = time.perf_counter()
+status = None
+if hasattr(target, 'app'):
+    status = target.app.test_client().get('/health').status_code
+done = time.perf_counter()
+print(json.dumps({{'import': imported - start, 'health': done - start, 'status': status}}))
+'''
+
+
+def parse_importtime(stderr):
+    """解析 -X importtime 輸出，返回 [(模塊, 自身微秒, 累計微秒, 嵌套深度)]"""
+    entries = []
+    for line in stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            own, cumulative, indent, name = match.groups()
+            entries.append((name, int(own), int(cumulative), (len(indent) - 1) // 2))
+    return entries
+
+
+def startup_report(module='app', top=15):
+    """在子進程中測量冷啟動，返回報告字典"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', _PROBE.format(module=module)],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else '子進程執行失敗')
+
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    entries = parse_importtime(result.stderr)
+    # 只統計頂層及目標模塊直接導入的模塊，避免父子模塊重複計算
+    top_level = sorted(
+        (entry for entry in entries if entry[3] <= 1 and entry[0] != module),
+        key=lambda entry: -entry[2]
+    )
+
+    return {
+        'module': module,
+        'import_seconds': round(timings['import'], 4),
+        'first_health_seconds': round(timings['health'], 4),
+        'health_status': timings['status'],
+        'modules_imported': len(entries),
+        'slowest_modules': [
+            {'module': name, 'cumulative_ms': round(cumulative / 1000, 1), 'self_ms': round(own / 1000, 1)}
+            for name, own, cumulative, _ in top_level[:top]
+        ]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='測量應用冷啟動耗時')
+    parser.add_argument('module', nargs='?', default='app', help='要導入的模塊（默認 app）')
+    parser.add_argument('--top', type=int, default=15, help='列出累計耗時最多的前 N 個模塊')
+    parser.add_argument('--json', action='store_true', help='以 JSON 輸出')
+    args = parser.parse_args()
+
+    report = startup_report(args.module, args.top)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+
+    print(f"模塊: {report['module']}")
+    print(f"導入耗時: {report['import_seconds'] * 1000:.1f} ms（共 {report['modules_imported']} 個模塊）")
+    print(f"首個 /health 響應: {report['first_health_seconds'] * 1000:.1f} ms（狀態碼 {report['health_status']}）")
+    print('累計耗時最多的直接導入模塊:')
+    for entry in report['slowest_modules']:
+        print(f"  {entry['cumulative_ms']:8.1f} ms  {entry['module']}")
+
+
+if __name__ == '__main__':
+    main()
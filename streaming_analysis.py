@@ -0,0 +1,227 @@
+"""
+分塊流式音頻分析
+通過 librosa.stream 按固定大小、相互重疊的塊讀取音頻，逐塊累積色度圖、MFCC
+與起始點強度包絡；除輸出特徵本身（每幀幾十個浮點數）外，峰值內存只與塊大小有關，
+不再隨解碼後的採樣數增長。節拍與起始點在整條包絡累積完成後再檢測，
+速度估計分段累積節奏圖，避免一次性構造 384 × 幀數 的矩陣
+
+與內存路徑（feature_engine 一次性分析整條音頻）的差異：
+- 分塊使用左對齊幀（center=False），結果按 n_fft // (2 * hop_length) 幀的偏移對齊到居中幀，
+  首尾各 2 幀用相鄰幀填充
+- 調音只用開頭 TUNING_SECONDS 秒估計一次，所有塊的色度圖共用（這段的幅度譜先緩存，約 10MB @ 44.1kHz）；
+  音高穩定的音頻與內存路徑的調音相同，benchmark.py 的純音、和弦、點擊信號上色度圖平均絕對誤差
+  不超過 4e-4、99% 分位不超過 6e-4，誤差大於 0.05 的只有首尾填充幀（約 0.1%）。
+  沒有穩定音高的音頻（如白噪聲）開頭與整條的調音估計可能不同，180 秒噪聲的平均誤差約 0.05
+- 分貝轉換的 top_db 截斷按塊進行：MFCC 在動態範圍超過 80 dB 的安靜片段可能有數 dB 差異
+- 起始點包絡在非首尾幀上與內存路徑一致，速度估計結果相同。內存路徑的包絡開頭有居中補零產生的尖峰，
+  而起始點檢測按包絡最大值歸一化，因此起始點數量可能明顯不同（60 秒噪聲 196 / 487 個）；
+  節拍數量最多相差數個，和弦信號 95% 以上的節拍幀號相同、其餘相差 1 幀，噪聲上個別節拍位置不同
+"""
+
+import librosa
+import numpy as np
+import soundfile as sf
+
+from feature_engine import FeatureEngine, N_FFT, HOP_LENGTH, ANALYSIS_FEATURES, estimate_key
+
+# 每塊包含的幀數（256 幀 × 512 採樣約 3 秒 @ 44.1kHz）
+BLOCK_LENGTH = 256
+
+# 估計調音所用的開頭時長（秒）：這段的幅度譜先緩存，調音確定後整條音頻的色度圖共用同一個值
+TUNING_SECONDS = 30
+
+# 速度估計時每次計算的節奏圖幀數，以及 librosa 默認的節奏圖窗口長度
+TEMPOGRAM_CHUNK = 1024
+TEMPOGRAM_WIN_LENGTH = 384
+
+
+def stream_features(source, fields=ANALYSIS_FEATURES, block_length=BLOCK_LENGTH,
+                    n_fft=N_FFT, hop_length=HOP_LENGTH, report=None):
+    """
+    流式計算特徵，source 為文件路徑或類文件對象（須為 libsndfile 支持的格式）
+    返回 (features, sr, samples)，features 的鍵與 FeatureEngine 相同
+    """
+    if report is None:
+        report = lambda stage, progress: None
+
+    fields = set(fields)
+    need_chroma = bool(fields & {'chromagram', 'key'})
+    need_mfcc = 'mfcc' in fields
+    need_onsets = 'onset_frames' in fields
+    need_beats = bool(fields & {'tempo', 'beats'})
+    need_mel = need_mfcc or need_onsets or need_beats
+
+    with sf.SoundFile(source) as sfo:
+        sr = sfo.samplerate
+        samples = sfo.frames
+
+        chroma_blocks = []
+        # 調音確定前緩存的幅度譜，以及估計調音需要的幀數
+        pending_stft = []
+        tuning = None
+        tuning_frames = int(TUNING_SECONDS * sr / hop_length)
+        mfcc_blocks = []
+        onset_diffs = []
+        beat_diffs = []
+        previous_mel = None
+        processed = 0
+
+        report('stream', 0.0)
+        stream = librosa.stream(sfo, block_length=block_length, frame_length=n_fft,
+                                hop_length=hop_length)
+        for block in stream:
+            processed += len(block)
+            if len(block) < n_fft:
+                # 末尾不足一幀的殘塊
+                continue
+
+            stft = np.abs(librosa.stft(block, n_fft=n_fft, hop_length=hop_length, center=False))
+            engine = FeatureEngine(block, sr, n_fft=n_fft, hop_length=hop_length,
+                                   intermediates={'stft': stft})
+
+            if need_chroma:
+                if tuning is None:
+                    pending_stft.append(stft)
+                    if sum(block_stft.shape[1] for block_stft in pending_stft) >= tuning_frames:
+                        tuning = _estimate_tuning(pending_stft, sr, n_fft)
+                        chroma_blocks.extend(_chroma(block_stft, sr, n_fft, hop_length, tuning)
+                                             for block_stft in pending_stft)
+                        pending_stft = []
+                else:
+                    chroma_blocks.append(_chroma(stft, sr, n_fft, hop_length, tuning))
+            if need_mfcc:
+                mfcc_blocks.append(engine.get('mfcc'))
+            if need_mel:
+                mel_db = engine.get('mel_db')
+                # 與上一塊最後一幀相接，保證差分跨塊連續
+                if previous_mel is not None:
+                    mel_db = np.concatenate([previous_mel, mel_db], axis=1)
+                if mel_db.shape[1] > 1:
+                    diff = np.maximum(0.0, mel_db[:, 1:] - mel_db[:, :-1])
+                    onset_diffs.append(diff.mean(axis=0))
+                    beat_diffs.append(np.median(diff, axis=0))
+                previous_mel = mel_db[:, -1:]
+
+            if samples > 0:
+                report('stream', min(processed / samples, 1.0) * 0.8)
+
+    if pending_stft:
+        # 音頻短於 TUNING_SECONDS：用整條音頻估計調音
+        tuning = _estimate_tuning(pending_stft, sr, n_fft)
+        chroma_blocks.extend(_chroma(block_stft, sr, n_fft, hop_length, tuning) for block_stft in pending_stft)
+
+    n_frames = 1 + samples // hop_length
+    offset = n_fft // (2 * hop_length)
+    features = {}
+
+    if 'duration' in fields:
+        features['duration'] = samples / float(sr)
+
+    if need_mel:
+        onset_env = _align_envelope(onset_diffs, n_frames, offset)
+        beat_env = _align_envelope(beat_diffs, n_frames, offset)
+        if need_beats:
+            report('beats', 0.85)
+            # 預先分段估計速度，避免 beat_track 內部一次性構造整條節奏圖
+            tempo = streaming_tempo(beat_env, sr, hop_length)
+            _, beats = librosa.beat.beat_track(onset_envelope=beat_env, sr=sr, hop_length=hop_length,
+                                               bpm=tempo)
+            features['tempo'] = tempo
+            features['beats'] = beats
+        if need_onsets:
+            report('onsets', 0.9)
+            features['onset_frames'] = librosa.onset.onset_detect(
+                onset_envelope=onset_env, sr=sr, hop_length=hop_length
+            )
+
+    if need_chroma:
+        chromagram = _align_frames(chroma_blocks, n_frames, offset, 12)
+        features['chromagram'] = chromagram
+        if 'key' in fields:
+            features['key'] = estimate_key(chromagram)
+
+    if need_mfcc:
+        features['mfcc'] = _align_frames(mfcc_blocks, n_frames, offset, 20)
+
+    return features, sr, samples
+
+
+def streaming_tempo(onset_env, sr, hop_length=HOP_LENGTH, chunk=TEMPOGRAM_CHUNK,
+                    win_length=TEMPOGRAM_WIN_LENGTH):
+    """
+    分段累積節奏圖的時間均值再估計速度，結果與 librosa.feature.tempo 相同，
+    但內存只與分段大小有關（整條節奏圖為 win_length × 幀數）
+    """
+    n_frames = len(onset_env)
+    if n_frames == 0:
+        return 0.0
+
+    context = win_length // 2
+    total = np.zeros(win_length)
+    for start in range(0, n_frames, chunk):
+        stop = min(start + chunk, n_frames)
+        left = max(start - context, 0)
+        right = min(stop + context, n_frames)
+        tempogram = librosa.feature.tempogram(
+            onset_envelope=onset_env[left:right], sr=sr, hop_length=hop_length, win_length=win_length
+        )
+        # 只累加本段自身的幀，兩側上下文只用於保證窗口完整
+        total += tempogram[:, start - left:stop - left].sum(axis=1)
+
+    mean_tempogram = (total / n_frames)[:, np.newaxis]
+    tempo = librosa.feature.tempo(tg=mean_tempogram, sr=sr, hop_length=hop_length)
+    return float(np.atleast_1d(tempo)[0])
+
+
+def _estimate_tuning(stfts, sr, n_fft):
+    """
+    用若干塊幅度譜估計調音（單位：色度 bin），結果與對拼接後的整段調用 librosa.estimate_tuning 相同；
+    piptrack 的幅度閾值按幀計算，因此可以逐塊進行並只保留候選音高，不構造整段大小的中間數組
+    """
+    pitches = []
+    magnitudes = []
+    for stft in stfts:
+        pitch, mag = librosa.piptrack(S=stft ** 2, sr=sr, n_fft=n_fft)
+        mask = pitch > 0
+        pitches.append(pitch[mask])
+        magnitudes.append(mag[mask])
+
+    pitches = np.concatenate(pitches)
+    magnitudes = np.concatenate(magnitudes)
+    threshold = np.median(magnitudes) if len(magnitudes) else 0.0
+    return librosa.pitch_tuning(pitches[magnitudes >= threshold], bins_per_octave=12)
+
+
+def _chroma(stft, sr, n_fft, hop_length, tuning):
+    """用給定的調音計算一塊的色度圖，各塊調音一致才能無縫拼接"""
+    engine = FeatureEngine(None, sr, n_fft=n_fft, hop_length=hop_length,
+                           intermediates={'stft': stft, 'tuning': tuning})
+    return engine.get('chromagram')
+
+
+def _align_frames(blocks, n_frames, offset, n_rows):
+    """把左對齊幀拼接並平移到居中幀位置，兩端用邊緣幀填充"""
+    if not blocks:
+        return np.zeros((n_rows, n_frames), dtype=np.float32)
+
+    frames = np.concatenate(blocks, axis=1)
+    tail = max(n_frames - offset - frames.shape[1], 0)
+    aligned = np.pad(frames, ((0, 0), (offset, tail)), mode='edge')
+    return aligned[:, :n_frames]
+
+
+def _align_envelope(diffs, n_frames, offset):
+    """
+    把逐塊差分拼成起始點強度包絡，與 librosa.onset.onset_strength(center=True) 對齊：
+    左對齊幀 k 對應居中幀 k + offset，onset_strength 自身又補 lag + offset 幀
+    """
+    envelope = np.zeros(n_frames, dtype=np.float32)
+    if not diffs:
+        return envelope
+
+    values = np.concatenate(diffs)
+    start = 2 * offset + 1
+    count = min(len(values), n_frames - start)
+    if count > 0:
+        envelope[start:start + count] = values[:count]
+    return envelope
@@ -0,0 +1,6 @@
+"""讓測試直接導入倉庫根目錄下的模塊"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,138 @@
+import hashlib
+import io
+
+import pytest
+
+from chunked_upload import UploadSessions, merge_ranges, STATUS_COMPLETE
+
+CONTENT = bytes(range(256)) * 40
+
+
+def sha(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def put(sessions, upload_id, offset, data, digest=None):
+    session = sessions.get(upload_id)
+    return sessions.write_chunk(session, offset, io.BytesIO(data), len(data), digest or sha(data))
+
+
+def read_file(sessions, upload_id):
+    with open(sessions.path(upload_id), 'rb') as f:
+        return f.read()
+
+
+@pytest.fixture
+def sessions(tmp_path):
+    return UploadSessions(str(tmp_path / 'uploads'), chunk_bytes=4096)
+
+
+def test_merge_ranges():
+    assert merge_ranges([(10, 5), (0, 10), (20, 5), (22, 10)]) == [[0, 15], [20, 32]]
+    assert merge_ranges([]) == []
+
+
+def test_chunk_with_wrong_hash_leaves_file_untouched(sessions):
+    upload_id = sessions.create('a.wav', len(CONTENT))['id']
+    put(sessions, upload_id, 0, CONTENT[:4096])
+    before = read_file(sessions, upload_id)
+
+    with pytest.raises(ValueError, match='SHA-256'):
+        put(sessions, upload_id, 0, b'x' * 4096, digest=sha(CONTENT[:4096]))
+
+    assert read_file(sessions, upload_id) == before
+    assert sessions.get(upload_id)['received'] == [[0, 4096]]
+
+
+def test_short_chunk_is_rejected(sessions):
+    upload_id = sessions.create('a.wav', len(CONTENT))['id']
+    session = sessions.get(upload_id)
+
+    with pytest.raises(ValueError, match='分塊不完整'):
+        sessions.write_chunk(session, 0, io.BytesIO(CONTENT[:100]), 4096, sha(CONTENT[:4096]))
+
+    assert sessions.get(upload_id)['received_bytes'] == 0
+    assert read_file(sessions, upload_id) == b'\0' * len(CONTENT)
+
+
+def test_chunk_limits(sessions):
+    upload_id = sessions.create('a.wav', len(CONTENT))['id']
+    with pytest.raises(ValueError, match='不能超過'):
+        put(sessions, upload_id, 0, CONTENT[:4097])
+    with pytest.raises(ValueError, match='超出文件範圍'):
+        put(sessions, upload_id, len(CONTENT) - 10, CONTENT[:20])
+
+
+def test_resume_from_next_offset(sessions):
+    upload_id = sessions.create('a.wav', len(CONTENT), sha256=sha(CONTENT))['id']
+    put(sessions, upload_id, 0, CONTENT[:4096])
+    # 亂序到達的分塊也會記錄，但斷點仍是第一個缺口
+    session = put(sessions, upload_id, 8192, CONTENT[8192:])
+    assert session['received'] == [[0, 4096], [8192, len(CONTENT)]]
+    assert session['next_offset'] == 4096
+    assert not session['complete']
+    with pytest.raises(ValueError, match='文件不完整'):
+        sessions.finish(session)
+
+    # 模擬重新連接：重新打開會話並從斷點續傳
+    reopened = UploadSessions(sessions.root, chunk_bytes=4096)
+    offset = reopened.get(upload_id)['next_offset']
+    session = put(reopened, upload_id, offset, CONTENT[offset:offset + 4096])
+    assert session['complete']
+    assert session['next_offset'] == len(CONTENT)
+
+    path, digest = reopened.finish(session)
+    assert digest == sha(CONTENT)
+    with open(path, 'rb') as f:
+        assert f.read() == CONTENT
+    assert reopened.get(upload_id)['status'] == STATUS_COMPLETE
+    with pytest.raises(ValueError, match='已經提交'):
+        put(reopened, upload_id, 0, CONTENT[:4096])
+
+
+def test_finish_rejects_declared_hash_mismatch(sessions):
+    upload_id = sessions.create('a.wav', 4096, sha256=sha(b'other'))['id']
+    session = put(sessions, upload_id, 0, CONTENT[:4096])
+
+    with pytest.raises(ValueError, match='聲明的不一致'):
+        sessions.finish(session)
+
+    # 已收到的分塊被清空，需要重新上傳
+    session = sessions.get(upload_id)
+    assert session['received'] == []
+    assert session['status'] != STATUS_COMPLETE
+
+
+def test_create_validates_arguments(sessions):
+    with pytest.raises(ValueError):
+        sessions.create('a.wav', 0)
+    with pytest.raises(ValueError):
+        sessions.create('a.wav', sessions.max_bytes + 1)
+    with pytest.raises(ValueError):
+        sessions.create('a.wav', 10, sha256='not-a-hash')
+
+
+def test_claim_is_exclusive(sessions):
+    upload_id = sessions.create('a.wav', len(CONTENT))['id']
+
+    assert sessions.claim(upload_id)
+    assert not sessions.claim(upload_id)
+    assert sessions.get(upload_id)['claimed']
+    with pytest.raises(ValueError, match='正在提交'):
+        put(sessions, upload_id, 0, CONTENT[:4096])
+
+    sessions.release(upload_id)
+    assert not sessions.get(upload_id)['claimed']
+    assert sessions.claim(upload_id)
+    assert not sessions.claim('missing')
+
+
+def test_discard_and_sweep(sessions):
+    kept = sessions.create('a.wav', 10)['id']
+    dropped = sessions.create('b.wav', 10)['id']
+    sessions.discard(dropped)
+    assert sessions.get(dropped) is None
+
+    sessions.ttl = -1
+    assert sessions.sweep() == 1
+    assert sessions.get(kept) is None
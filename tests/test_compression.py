@@ -0,0 +1,67 @@
+import gzip
+
+import numpy as np
+from flask import Flask, Response
+from werkzeug.datastructures import Accept
+
+import compression
+from compression import MIN_COMPRESS_BYTES, compress_response
+from fast_json import dumps, loads
+
+app = Flask(__name__)
+
+
+def accept(*encodings):
+    return Accept([(encoding, 1) for encoding in encodings])
+
+
+def json_response(size):
+    return Response(b'[' + b'1,' * (size // 2) + b'1]', mimetype='application/json')
+
+
+def test_gzip_when_brotli_not_accepted():
+    with app.app_context():
+        response = compress_response(json_response(4 * MIN_COMPRESS_BYTES), accept('gzip'))
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.vary
+    assert loads(gzip.decompress(response.get_data()))[0] == 1
+
+
+def test_brotli_preferred_when_available():
+    with app.app_context():
+        response = compress_response(json_response(4 * MIN_COMPRESS_BYTES), accept('gzip', 'br'))
+    expected = 'br' if compression.brotli is not None else 'gzip'
+    assert response.headers['Content-Encoding'] == expected
+
+
+def test_small_streamed_and_binary_responses_are_left_alone():
+    with app.app_context():
+        small = compress_response(json_response(MIN_COMPRESS_BYTES // 4), accept('gzip'))
+        streamed = compress_response(
+            Response(iter([b'data: x\n\n'] * 1000), mimetype='text/event-stream'), accept('gzip')
+        )
+        binary = compress_response(Response(b'\0' * 10 * MIN_COMPRESS_BYTES, mimetype='audio/wav'), accept('gzip'))
+        plain = compress_response(json_response(4 * MIN_COMPRESS_BYTES), accept())
+    for response in (small, streamed, binary, plain):
+        assert 'Content-Encoding' not in response.headers
+
+
+def test_dumps_serializes_numpy_values():
+    value = {
+        'matrix': np.arange(6, dtype=np.float32).reshape(2, 3),
+        'view': np.arange(10)[::2],
+        'half': np.ones(2, dtype=np.float16),
+        'tempo': np.float64(120.5),
+        'count': np.int64(3)
+    }
+
+    data = dumps(value)
+
+    assert isinstance(data, bytes)
+    assert loads(data) == {
+        'matrix': [[0.0, 1.0, 2.0], [3.0, 4.0, 5.0]],
+        'view': [0, 2, 4, 6, 8],
+        'half': [1.0, 1.0],
+        'tempo': 120.5,
+        'count': 3
+    }
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from feature_engine import ANALYSIS_FEATURES, ANALYSIS_PROFILES, FeatureEngine, estimate_key, resolve, select_features
+
+
+def test_select_features_defaults_to_research():
+    assert select_features() == ANALYSIS_FEATURES
+    assert select_features(profile='research') == ANALYSIS_FEATURES
+
+
+@pytest.mark.parametrize('profile', sorted(ANALYSIS_PROFILES))
+def test_select_features_profiles(profile):
+    selected = select_features(profile=profile)
+    assert set(selected) == set(ANALYSIS_PROFILES[profile])
+    assert selected[0] == 'duration'
+
+
+def test_select_features_keeps_order_and_adds_duration():
+    assert select_features(['mfcc', 'tempo']) == ('duration', 'tempo', 'mfcc')
+    assert select_features(['key', 'key', 'beats']) == ('duration', 'beats', 'key')
+
+
+def test_select_features_fields_take_priority_over_profile():
+    assert select_features(['chromagram'], profile='tempo') == ('duration', 'chromagram')
+    # 字段有效時不檢查檔位
+    assert select_features(['tempo'], profile='no-such-profile') == ('duration', 'tempo')
+
+
+def test_select_features_rejects_unknown_fields():
+    with pytest.raises(ValueError, match='不支持的字段: loudness, stft'):
+        select_features(['tempo', 'loudness', 'stft'])
+
+
+def test_select_features_rejects_unknown_profile():
+    with pytest.raises(ValueError, match='未知的分析檔位: fastest') as error:
+        select_features(profile='fastest')
+    for name in ANALYSIS_PROFILES:
+        assert name in str(error.value)
+
+
+def test_resolve_puts_dependencies_first():
+    order = resolve(['key'])
+    assert order.index('stft') < order.index('chromagram') < order.index('key')
+    with pytest.raises(KeyError):
+        resolve(['loudness'])
+
+
+def test_engine_only_computes_requested_features():
+    sr = 22050
+    y = 0.5 * np.sin(2 * np.pi * 440 * np.arange(sr) / sr).astype(np.float32)
+    engine = FeatureEngine(y, sr)
+
+    values = engine.compute(select_features(profile='tempo'))
+
+    assert set(values) == {'duration', 'tempo', 'beats'}
+    assert values['duration'] == pytest.approx(1.0)
+    for skipped in ('chromagram', 'mfcc', 'onset_frames', 'tuning'):
+        assert skipped not in engine.computed()
+
+
+def test_estimate_key_finds_tonic():
+    chromagram = np.zeros((12, 8))
+    # C 大三和弦
+    chromagram[[0, 4, 7]] = 1.0
+    assert estimate_key(chromagram) == 'C major'
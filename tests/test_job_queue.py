@@ -0,0 +1,114 @@
+import socket
+import subprocess
+import time
+
+from job_queue import JobQueue, JobStore, STATUS_DONE, STATUS_FAILED, STATUS_RUNNING
+
+
+def read_handler(source, params, report, publish):
+    """讀取輸入文件並返回其內容，供恢復測試確認任務確實重新執行"""
+    report('read', 0.5)
+    with open(source, 'rb') as f:
+        data = f.read()
+    publish('partial', {'size': len(data)})
+    return {'content': data.decode('utf-8'), 'params': params}
+
+
+def dead_owner():
+    """同一主機上已退出進程的 owner 標識"""
+    process = subprocess.Popen(['true'])
+    process.wait()
+    return f'{socket.gethostname()}:{process.pid}'
+
+
+def wait_finished(queue, job_id, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(job_id)
+        if job['status'] in (STATUS_DONE, STATUS_FAILED):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f'任務 {job_id} 未在 {timeout} 秒內結束')
+
+
+def test_prune_drops_parts_before_jobs(tmp_path):
+    store = JobStore(str(tmp_path / 'jobs.db'))
+    for job_id, status in (('done', STATUS_DONE), ('failed', STATUS_FAILED), ('running', STATUS_RUNNING)):
+        store.create(job_id, None, {}, 'owner')
+        store.add_part(job_id, 'partial', {'job': job_id})
+        store.update(job_id, status=status)
+
+    now = time.time()
+    # 只到部分結果的期限：結束任務的部分結果刪除，任務本身保留
+    assert store.prune(jobs_before=now - 3600, parts_before=now + 1) == 0
+    assert store.parts('done') == []
+    assert store.parts('failed') == []
+    assert store.get('done')['status'] == STATUS_DONE
+    assert len(store.parts('running')) == 1
+
+    # 到任務的期限：結束的任務刪除，執行中的任務不受影響
+    assert store.prune(jobs_before=now + 1, parts_before=now + 1) == 2
+    assert store.get('done') is None
+    assert store.get('failed') is None
+    assert store.get('running')['status'] == STATUS_RUNNING
+    assert len(store.parts('running')) == 1
+
+
+def test_queue_prune_uses_job_ttl(tmp_path):
+    queue = JobQueue(str(tmp_path / 'jobs.db'), str(tmp_path / 'spool'), read_handler, max_workers=1, job_ttl=0)
+    queue.store.create('old', None, {}, queue.owner)
+    queue.store.update('old', status=STATUS_DONE)
+    time.sleep(0.01)
+
+    assert queue.prune(force=True) == 1
+    assert queue.get('old') is None
+    # 未到清理間隔時不重複清理
+    queue.store.create('new', None, {}, queue.owner)
+    queue.store.update('new', status=STATUS_DONE)
+    assert queue.prune() == 0
+    assert queue.get('new') is not None
+
+
+def test_recover_requeues_jobs_of_dead_owner(tmp_path):
+    queue = JobQueue(str(tmp_path / 'jobs.db'), str(tmp_path / 'spool'), read_handler, max_workers=1)
+    try:
+        source = queue.spool_path('orphan', 'txt')
+        with open(source, 'w', encoding='utf-8') as f:
+            f.write('hello')
+        queue.store.create('orphan', source, {'extension': 'txt'}, dead_owner())
+        queue.store.update('orphan', status=STATUS_RUNNING)
+        queue.store.add_part('orphan', 'partial', {'stale': True})
+
+        assert queue.recover() == 1
+        job = wait_finished(queue, 'orphan')
+        assert job['status'] == STATUS_DONE
+        assert queue.get('orphan', with_result=True)['result'] == {
+            'content': 'hello', 'params': {'extension': 'txt'}
+        }
+        # 上次運行留下的部分結果在重新排隊時清除
+        assert [event for _, event, data in queue.parts('orphan')] == ['partial']
+        assert '"size":5' in queue.parts('orphan')[0][2]
+
+        # 已接管的任務不會被再次恢復
+        assert queue.recover() == 0
+    finally:
+        queue.shutdown()
+
+
+def test_recover_fails_jobs_whose_input_is_gone(tmp_path):
+    queue = JobQueue(str(tmp_path / 'jobs.db'), str(tmp_path / 'spool'), read_handler, max_workers=1)
+    # 直接傳入內存的任務沒有輸入文件，重啟後無法恢復
+    queue.store.create('in-memory', None, {}, dead_owner())
+
+    assert queue.recover() == 0
+    job = queue.get('in-memory')
+    assert job['status'] == STATUS_FAILED
+    assert '重新上傳' in job['error']
+
+
+def test_recover_skips_jobs_of_live_owner(tmp_path):
+    queue = JobQueue(str(tmp_path / 'jobs.db'), str(tmp_path / 'spool'), read_handler, max_workers=1)
+    queue.store.create('mine', None, {}, queue.owner)
+
+    assert queue.recover() == 0
+    assert queue.get('mine')['owner'] == queue.owner
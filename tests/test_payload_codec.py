@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from fast_json import dumps
+from payload_codec import compact_payload, decode_matrix, encode_matrix, round_payload
+
+
+@pytest.fixture
+def matrix():
+    return np.random.default_rng(0).uniform(-80.0, 20.0, size=(12, 257)).astype(np.float32)
+
+
+def test_uint8_round_trip_within_half_step(matrix):
+    encoded = encode_matrix(matrix, 'uint8')
+    decoded = decode_matrix(encoded)
+
+    assert encoded['shape'] == [12, 257]
+    assert decoded.dtype == np.float32
+    assert decoded.shape == matrix.shape
+    assert encoded['scale'] == pytest.approx((matrix.max() - matrix.min()) / 255.0)
+    assert np.abs(decoded - matrix).max() <= encoded['scale'] / 2 + 1e-4
+
+
+def test_uint8_constant_and_empty_matrices():
+    constant = np.full((3, 4), 0.25, dtype=np.float32)
+    np.testing.assert_allclose(decode_matrix(encode_matrix(constant, 'uint8')), constant)
+
+    empty = np.zeros((12, 0), dtype=np.float32)
+    assert decode_matrix(encode_matrix(empty, 'uint8')).shape == (12, 0)
+
+
+def test_float16_round_trip(matrix):
+    encoded = encode_matrix(matrix, 'float16')
+    decoded = decode_matrix(encoded)
+
+    assert encoded['dtype'] == 'float16'
+    assert decoded.shape == matrix.shape
+    np.testing.assert_allclose(decoded, matrix, rtol=1e-3, atol=1e-3)
+
+
+def test_encode_rejects_unknown_dtype(matrix):
+    with pytest.raises(ValueError, match='不支持的數據類型'):
+        encode_matrix(matrix, 'int4')
+
+
+def test_compact_payload_encodes_large_fields_only(matrix):
+    payload = {
+        'audio_data': {'tempo': 120.0, 'chromagram': matrix, 'mfcc': matrix[:5]},
+        'visualization': {'spectrum_data': matrix.T, 'notes': []},
+        'filename': 'a.wav'
+    }
+
+    result = compact_payload(payload)
+
+    assert result['format'] == 'compact'
+    assert result['audio_data']['tempo'] == 120.0
+    assert result['visualization']['notes'] == []
+    assert result['audio_data']['chromagram']['dtype'] == 'uint8'
+    assert result['audio_data']['mfcc']['dtype'] == 'float16'
+    assert decode_matrix(result['visualization']['spectrum_data']).shape == matrix.T.shape
+    # 原結果不被修改
+    assert payload['audio_data']['chromagram'] is matrix
+    assert 'format' not in payload
+
+
+def test_round_payload_rounds_large_fields(matrix):
+    payload = {
+        'audio_data': {'tempo': 123.456789, 'chromagram': matrix, 'mfcc': matrix.tolist()},
+        'visualization': {'spectrum_data': matrix}
+    }
+
+    result = round_payload(payload, 2)
+
+    for section, field in (('audio_data', 'chromagram'), ('audio_data', 'mfcc'), ('visualization', 'spectrum_data')):
+        rounded = result[section][field]
+        np.testing.assert_array_equal(rounded, np.round(matrix.astype(np.float64), 2))
+        assert np.abs(rounded - matrix).max() <= 0.005 + 1e-6
+    # 標量字段與原結果不受影響
+    assert result['audio_data']['tempo'] == 123.456789
+    assert payload['audio_data']['chromagram'] is matrix
+
+
+def test_round_payload_precision_in_json(matrix):
+    text = dumps(round_payload({'audio_data': {'chromagram': matrix}}, 3)).decode('utf-8')
+    numbers = text.split('[[', 1)[1].replace(']', ',').replace('[', '').split(',')
+    assert max(len(number.split('.')[1]) for number in numbers if '.' in number) <= 3
+
+
+def test_round_payload_without_large_fields():
+    payload = {'audio_data': {'tempo': 120.0}, 'filename': 'a.wav'}
+    assert round_payload(payload, 1) == payload
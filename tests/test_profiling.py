@@ -0,0 +1,42 @@
+import os
+import pstats
+
+import pytest
+
+from profiling import load_summary, profile_call
+
+
+def busy(n):
+    return sum(i * i for i in range(n))
+
+
+def test_profile_call_writes_profile_and_summary(tmp_path):
+    output_dir = str(tmp_path / 'profiles')
+
+    result, summary = profile_call(lambda: busy(20000), output_dir, 'job1', top=5)
+
+    assert result == busy(20000)
+    assert summary['error'] is None
+    assert summary['wall_seconds'] >= 0
+    assert len(summary['top_functions']) <= 5
+    assert any('busy' in row['function'] for row in summary['top_functions'])
+    assert os.path.exists(os.path.join(output_dir, 'job1.prof'))
+    pstats.Stats(summary['profile_path'])
+    assert load_summary(output_dir, 'job1') == summary
+
+
+def test_profile_call_records_error_and_reraises(tmp_path):
+    output_dir = str(tmp_path)
+
+    def fail():
+        raise RuntimeError('boom')
+
+    with pytest.raises(RuntimeError, match='boom'):
+        profile_call(fail, output_dir, 'job2')
+
+    assert load_summary(output_dir, 'job2')['error'] == 'RuntimeError: boom'
+    assert os.path.exists(os.path.join(output_dir, 'job2.prof'))
+
+
+def test_load_summary_missing(tmp_path):
+    assert load_summary(str(tmp_path), 'missing') is None
@@ -0,0 +1,82 @@
+"""
+零落盤的上傳處理
+上傳文件在解析請求體時寫入內存中的暫存緩衝區，同一遍寫入中累計大小與 SHA-256；
+只有超過內存上限的文件才會溢出到匿名臨時文件，不再寫入共享的 uploads/ 目錄
+"""
+
+import hashlib
+import os
+from tempfile import SpooledTemporaryFile
+
+from flask import Request
+
+# 單個上傳文件保留在內存中的上限，超出後溢出到匿名臨時文件
+SPOOL_MAX_MEMORY = int(os.environ.get('UPLOAD_SPOOL_MAX_MEMORY', 64 * 1024 * 1024))
+
+# 需要自行讀取時的分塊大小
+CHUNK_SIZE = 1024 * 1024
+
+
+class HashingSpool:
+    """寫入時同步計算哈希與大小的暫存緩衝區"""
+
+    def __init__(self, max_memory=SPOOL_MAX_MEMORY):
+        self._file = SpooledTemporaryFile(max_size=max_memory, mode='w+b')
+        self._hash = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self._hash.update(data)
+        self.size += len(data)
+        return self._file.write(data)
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+    def getvalue(self):
+        """返回緩衝區中的全部內容"""
+        position = self._file.tell()
+        self._file.seek(0)
+        data = self._file.read()
+        self._file.seek(position)
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+    def __iter__(self):
+        return iter(self._file)
+
+
+class HashingRequest(Request):
+    """上傳文件使用 HashingSpool 接收的請求類"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return HashingSpool()
+
+
+def upload_digest(file):
+    """返回上傳文件的 (大小, SHA-256)；非 HashingSpool 的流會分塊讀取一遍"""
+    stream = file.stream
+    if isinstance(stream, HashingSpool):
+        return stream.size, stream.hexdigest()
+
+    digest = hashlib.sha256()
+    size = 0
+    stream.seek(0)
+    for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+        digest.update(chunk)
+        size += len(chunk)
+    stream.seek(0)
+    return size, digest.hexdigest()
+
+
+def upload_bytes(file):
+    """返回上傳文件的完整內容"""
+    stream = file.stream
+    if isinstance(stream, HashingSpool):
+        return stream.getvalue()
+    stream.seek(0)
+    data = stream.read()
+    stream.seek(0)
+    return data
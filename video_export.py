@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+无界面的可视化视频导出
+使用 Agg 后端按分析时间线逐帧渲染高级版本的四种可视化模式，不依赖 tkinter、pygame 或播放进度：
+音符的生成时间、位置和颜色在导出前一次性确定（随机音符使用固定种子），
+因此任意一帧都可以独立渲染。帧区间被分配到进程池中并行渲染，
+输出为 PNG 序列，或 rgb24 原始视频流（可直接交给 ffmpeg 编码）
+
+用法：
+    python video_export.py song.mp3 -o frames/
+    python video_export.py song.mp3 --format raw -o - | ffmpeg -f rawvideo -pix_fmt rgb24 \\
+        -s 1280x720 -r 30 -i - -i song.mp3 -shortest out.mp4
+"""
+
+import argparse
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import librosa
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.image import imsave
+from matplotlib.patches import Rectangle
+
+from feature_engine import FeatureEngine
+from note_particles import KIND_NOTE, KIND_BEAT
+from note_renderer import NoteRenderer, draw_piano_keyboard
+from render_timeline import RenderTimeline
+
+MODES = ('falling_notes', 'spectrum', 'waveform', 'piano_roll')
+COLOR_SCHEMES = ('rainbow', 'frequency_based', 'mood_based')
+
+# 导出需要的分析特征
+EXPORT_FEATURES = ('duration', 'beats', 'chromagram', 'mfcc')
+
+# 桌面版音符速度所基于的帧间隔（秒），导出时按实际帧率换算
+BASE_FRAME_SECONDS = 0.033
+
+# 随机音符的生成间隔（秒）
+RANDOM_NOTE_INTERVAL = 0.5
+
+# 音符到达键盘的高度
+KEYBOARD_TOP = 20.0
+
+# 原始视频流模式下每个任务渲染的帧数（限制进程间传输的数据量）
+RAW_CHUNK_FRAMES = 30
+PNG_CHUNK_FRAMES = 120
+
+
+def analyze_file(path):
+    """分析音频文件，返回导出所需的特征"""
+    y, sr = librosa.load(path, sr=None)
+    features = FeatureEngine(y, sr).compute(EXPORT_FEATURES)
+    features['sr'] = sr
+    features['y'] = y
+    return features
+
+
+def note_schedule(timeline, beat_times, scheme, seed=0):
+    """
+    预先确定全部落下音符：返回按生成帧排序的数组字典
+    （tick、x、speed、size、rgb、kind），与桌面版的生成规则一致
+    """
+    rng = np.random.default_rng(seed)
+    spawn_every = max(int(round(RANDOM_NOTE_INTERVAL / timeline.tick_seconds)), 1)
+
+    # 随机音符
+    random_ticks = np.arange(0, timeline.n_ticks, spawn_every)
+    random_x = rng.integers(0, 88, len(random_ticks))
+    random_speed = rng.uniform(1, 3, len(random_ticks))
+    random_size = rng.uniform(0.3, 0.8, len(random_ticks))
+
+    # 节拍音符：在节拍到期的第一帧生成，位置取该帧最强的音级
+    beat_ticks = np.ceil(np.asarray(beat_times) / timeline.tick_seconds - 1e-9).astype(int)
+    beat_ticks = np.unique(beat_ticks[(beat_ticks >= 0) & (beat_ticks < timeline.n_ticks)])
+    if timeline.chroma is not None:
+        beat_ticks = beat_ticks[timeline.chroma_valid[beat_ticks]]
+        beat_idx = np.argmax(timeline.chroma[beat_ticks], axis=1)
+    else:
+        beat_ticks = beat_ticks[:0]
+        beat_idx = beat_ticks
+
+    ticks = np.concatenate([beat_ticks, random_ticks])
+    note_idx = np.concatenate([beat_idx, random_x])
+    order = np.argsort(ticks, kind='stable')
+    schedule = {
+        'tick': ticks,
+        'x': np.concatenate([beat_idx * 7, random_x]).astype(float),
+        'speed': np.concatenate([np.full(len(beat_ticks), 2.5), random_speed]),
+        'size': np.concatenate([np.full(len(beat_ticks), 1.0), random_size]),
+        'rgb': timeline.colors(scheme, note_idx, ticks),
+        'kind': np.concatenate([
+            np.full(len(beat_ticks), KIND_BEAT, dtype=np.uint8),
+            np.full(len(random_ticks), KIND_NOTE, dtype=np.uint8)
+        ])
+    }
+    return {name: values[order] for name, values in schedule.items()}
+
+
+class FrameRenderer:
+    """在 Agg 画布上渲染指定帧，静态键盘作为背景只绘制一次"""
+
+    def __init__(self, features, mode='falling_notes', color_scheme='rainbow', fps=30,
+                 width=1280, height=720, dpi=100, seed=0):
+        if mode not in MODES:
+            raise ValueError(f'未知的可视化模式: {mode}')
+        if color_scheme not in COLOR_SCHEMES:
+            raise ValueError(f'未知的颜色方案: {color_scheme}')
+
+        self.mode = mode
+        self.color_scheme = color_scheme
+        self.fps = fps
+        self.sr = features['sr']
+        self.y = features.get('y')
+
+        self.timeline = RenderTimeline(features['duration'], self.sr, 1.0 / fps)
+        self.timeline.set_chromagram(features['chromagram'])
+        self.timeline.set_mfcc(features['mfcc'])
+        self.n_frames = self.timeline.n_ticks
+
+        self.fig = Figure(figsize=(width / dpi, height / dpi), dpi=dpi, facecolor='black')
+        self.canvas = FigureCanvasAgg(self.fig)
+        self.ax = self.fig.add_subplot()
+        self.ax.set_facecolor('black')
+        self.ax.set_xlim(0, 88)
+        self.ax.set_ylim(0, 100)
+        self.ax.set_aspect('equal')
+        self.ax.axis('off')
+        draw_piano_keyboard(self.ax)
+
+        if mode == 'falling_notes':
+            beat_times = librosa.frames_to_time(features['beats'], sr=self.sr)
+            self.schedule = note_schedule(self.timeline, beat_times, color_scheme, seed)
+            self.speed_scale = self.timeline.tick_seconds / BASE_FRAME_SECONDS
+            # 最慢的音符从顶部落到键盘所需的帧数
+            self.max_age = int(np.ceil((100 - KEYBOARD_TOP) / (1.0 * self.speed_scale))) + 1
+            self.note_renderer = NoteRenderer(self.ax)
+            self.artists = self.note_renderer.artists()
+        elif mode == 'waveform':
+            line, = self.ax.plot([], [], color='cyan', linewidth=2, alpha=0.8, animated=True)
+            self.artists = [line]
+        elif mode == 'spectrum':
+            self.artists = [
+                self.ax.add_patch(Rectangle((i * 7 - 0.3, 20), 0.6, 0, alpha=0.8, animated=True))
+                for i in range(12)
+            ]
+        else:
+            self.artists = [
+                self.ax.add_patch(Rectangle((i * 7 - 0.3, 0), 0.6, 2, animated=True))
+                for i in range(12)
+            ]
+
+        self.canvas.draw()
+        self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+
+    def render(self, tick):
+        """渲染第 tick 帧，返回 (高, 宽, 3) 的 uint8 数组"""
+        self.canvas.restore_region(self.background)
+        getattr(self, f'_update_{self.mode}')(tick)
+        for artist in self.artists:
+            self.ax.draw_artist(artist)
+        return np.asarray(self.canvas.buffer_rgba())[:, :, :3].copy()
+
+    def _update_falling_notes(self, tick):
+        schedule = self.schedule
+        lo, hi = np.searchsorted(schedule['tick'], [tick - self.max_age, tick], side='right')
+        age = tick - schedule['tick'][lo:hi]
+        speed = schedule['speed'][lo:hi] * self.speed_scale
+        # 生成当帧即下落一步；到达键盘的音符再绘制最后一帧
+        visible = 100 - speed * age > KEYBOARD_TOP
+        y = 100 - speed * (age + 1)
+        self.note_renderer.update(
+            schedule['x'][lo:hi][visible],
+            y[visible],
+            schedule['size'][lo:hi][visible],
+            schedule['rgb'][lo:hi][visible],
+            schedule['kind'][lo:hi][visible] == KIND_BEAT
+        )
+
+    def _update_spectrum(self, tick):
+        valid = self.timeline.has_chroma(tick)
+        colors = self.timeline.chroma_colors(self.color_scheme)[tick]
+        for bar, height, color in zip(self.artists, self.timeline.bar_heights[tick], colors):
+            bar.set_visible(valid)
+            bar.set_height(height)
+            bar.set_color(color)
+
+    def _update_piano_roll(self, tick):
+        timeline = self.timeline
+        valid = timeline.has_chroma(tick)
+        colors = timeline.chroma_colors(self.color_scheme)[tick]
+        for note, y, alpha, active, color in zip(
+            self.artists, timeline.roll_y[tick], timeline.roll_alpha[tick], timeline.roll_active[tick], colors
+        ):
+            note.set_visible(valid and active)
+            note.set_y(y)
+            note.set_color(color)
+            note.set_alpha(alpha)
+
+    def _update_waveform(self, tick):
+        line, = self.artists
+        window_size = int(0.1 * self.sr)  # 100ms窗口
+        start_sample = int(self.timeline.times[tick] * self.sr)
+        waveform = self.y[start_sample:start_sample + window_size]
+        line.set_data(np.linspace(0, 88, len(waveform)), 60 + waveform * 20)
+
+
+# ---- 进程池 ----
+
+_renderer = None
+
+
+def _init_worker(features, options):
+    global _renderer
+    _renderer = FrameRenderer(features, **options)
+
+
+def _render_png(start, stop, output_dir):
+    for tick in range(start, stop):
+        imsave(os.path.join(output_dir, f'frame_{tick:06d}.png'), _renderer.render(tick))
+    return stop - start
+
+
+def _render_raw(start, stop):
+    return b''.join(_renderer.render(tick).tobytes() for tick in range(start, stop))
+
+
+def export_video(features, output, fmt='png', workers=None, **options):
+    """
+    把整条音频渲染为帧序列，返回渲染的帧数
+    fmt='png' 时 output 为目录；fmt='raw' 时 output 为文件路径或 '-'（标准输出）
+    """
+    if options.get('mode', 'falling_notes') != 'waveform':
+        # 只有波形模式需要原始采样，避免向每个工作进程复制整条音频
+        features = {name: value for name, value in features.items() if name != 'y'}
+
+    n_frames = RenderTimeline(features['duration'], features['sr'], 1.0 / options.get('fps', 30)).n_ticks
+    chunk = PNG_CHUNK_FRAMES if fmt == 'png' else RAW_CHUNK_FRAMES
+    ranges = [(start, min(start + chunk, n_frames)) for start in range(0, n_frames, chunk)]
+    workers = workers or os.cpu_count() or 1
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(features, options)) as executor:
+        if fmt == 'png':
+            os.makedirs(output, exist_ok=True)
+            return sum(executor.map(_render_png, *zip(*ranges), [output] * len(ranges)))
+
+        stream = sys.stdout.buffer if output == '-' else open(output, 'wb')
+        try:
+            # 各区间并行渲染、按顺序写出；只保持有限个区间在途，
+            # 编码器（如 ffmpeg）读得慢时已渲染的帧不会随视频长度堆积在内存中
+            pending = deque()
+            for start, stop in ranges:
+                if len(pending) >= workers * 2:
+                    stream.write(pending.popleft().result())
+                pending.append(executor.submit(_render_raw, start, stop))
+            while pending:
+                stream.write(pending.popleft().result())
+        finally:
+            if stream is not sys.stdout.buffer:
+                stream.close()
+        return n_frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description='导出音乐可视化视频帧')
+    parser.add_argument('audio', help='音频文件')
+    parser.add_argument('-o', '--output', default='frames', help='PNG 输出目录，或原始视频流文件（- 为标准输出）')
+    parser.add_argument('--format', choices=('png', 'raw'), default='png', dest='fmt')
+    parser.add_argument('--mode', choices=MODES, default='falling_notes')
+    parser.add_argument('--color-scheme', choices=COLOR_SCHEMES, default='rainbow')
+    parser.add_argument('--fps', type=int, default=30)
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--seed', type=int, default=0, help='随机音符的种子')
+    parser.add_argument('--workers', type=int, default=None, help='渲染进程数（默认 CPU 核数）')
+    args = parser.parse_args()
+
+    features = analyze_file(args.audio)
+    frames = export_video(
+        features, args.output, fmt=args.fmt, workers=args.workers,
+        mode=args.mode, color_scheme=args.color_scheme, fps=args.fps,
+        width=args.width, height=args.height, seed=args.seed
+    )
+    print(f'已导出 {frames} 帧', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()